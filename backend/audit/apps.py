@@ -1,11 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class AuditConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'audit'
 
     def ready(self):
-        # Importa os signals para que eles sejam registrados quando o app carregar.
-        # Desabilitado temporariamente para evitar erros de transação se a tabela não existir.
-        # import audit.signals
-        pass
+        # Os registros são gravados após o commit, em um savepoint próprio (ver audit/utils.py),
+        # então uma falha na auditoria não afeta mais a transação de quem chamou.
+        if settings.AUDIT_ENABLED:
+            from .signals import connect_signals
+            connect_signals()
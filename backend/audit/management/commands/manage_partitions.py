@@ -0,0 +1,94 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name, schema_context
+
+from core.partitioning import (
+    PARTITIONED_MODELS,
+    add_months,
+    archive_partition,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+)
+from core.tenant_utils import get_tenants
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria as partições mensais futuras de AuditLog e StatusHistory e arquiva (JSONL.gz) '
+        'as partições mais antigas que o período de retenção.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', help='Processa apenas o schema informado.')
+        parser.add_argument(
+            '--ahead', type=int, default=settings.PARTITION_MONTHS_AHEAD,
+            help='Meses futuros com partição garantida.',
+        )
+        parser.add_argument(
+            '--retention', type=int, default=settings.PARTITION_RETENTION_MONTHS,
+            help='Meses mantidos no banco; partições anteriores são arquivadas (0 = não arquiva).',
+        )
+        parser.add_argument(
+            '--keep-detached', action='store_true',
+            help='Mantém as partições arquivadas como tabelas avulsas em vez de removê-las.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Apenas mostra o que seria feito.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Particionamento disponível apenas com PostgreSQL.')
+
+        atual = month_start(timezone.now())
+        limite = add_months(atual, -options['retention']) if options['retention'] > 0 else None
+
+        for schema_name, labels in self.targets(options['schema']):
+            with schema_context(schema_name):
+                for label in labels:
+                    model = apps.get_model(label)
+                    self.process(schema_name, model._meta.db_table, PARTITIONED_MODELS[label], atual, limite, options)
+
+    def targets(self, schema_name):
+        # AuditLog existe em todos os schemas (app compartilhado e de tenant); StatusHistory só nos tenants
+        public = get_public_schema_name()
+        if schema_name in (None, public):
+            yield public, ['audit.AuditLog']
+        if schema_name != public:
+            for tenant in get_tenants(schema_name):
+                yield tenant.schema_name, list(PARTITIONED_MODELS)
+
+    def process(self, schema_name, table, column, atual, limite, options):
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                self.stderr.write(f"[{schema_name}] {table} não é particionada (migrations pendentes?).")
+                return
+            existentes = list_partitions(cursor, table)
+            antigas = [mes for mes in existentes if limite and mes < limite]
+
+            if options['dry_run']:
+                faltando = [add_months(atual, n) for n in range(options['ahead'] + 1)]
+                faltando = [mes for mes in faltando if mes not in existentes]
+                self.stdout.write(
+                    f"[{schema_name}] {table}: criaria {', '.join(f'{m:%Y-%m}' for m in faltando) or 'nenhuma'}; "
+                    f"arquivaria {', '.join(f'{m:%Y-%m}' for m in antigas) or 'nenhuma'}."
+                )
+                return
+
+            with transaction.atomic():
+                criadas = ensure_partitions(cursor, table, column, options['ahead'])
+            for mes in criadas:
+                self.stdout.write(f"[{schema_name}] {table}: partição {mes:%Y-%m} criada.")
+
+            for mes in antigas:
+                # Uma transação por partição: se a exportação falhar, a partição continua anexada
+                with transaction.atomic():
+                    linhas = archive_partition(
+                        cursor, schema_name, table, mes, drop=not options['keep_detached']
+                    )
+                self.stdout.write(self.style.SUCCESS(
+                    f"[{schema_name}] {table}: {mes:%Y-%m} arquivada ({linhas} registros)."
+                ))
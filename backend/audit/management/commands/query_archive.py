@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.partitioning import PARTITIONED_MODELS, iter_archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Consulta (somente leitura) os registros arquivados pelo manage_partitions. '
+        'Imprime um JSON por linha.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', required=True, help='Schema do tenant (ou "public").')
+        parser.add_argument('--model', choices=list(PARTITIONED_MODELS), default='audit.AuditLog')
+        parser.add_argument('--start', help='Data/hora inicial (inclusive), ex: 2024-01-01.')
+        parser.add_argument('--end', help='Data/hora final (exclusive), ex: 2024-02-01.')
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='CAMPO=VALOR',
+            help='Filtra por igualdade de campo (pode repetir), ex: --filter action=DELETE.',
+        )
+        parser.add_argument('--limit', type=int, help='Número máximo de registros.')
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options['filter']:
+            campo, sep, valor = item.partition('=')
+            if not sep:
+                raise CommandError(f"Filtro inválido: '{item}' (use CAMPO=VALOR).")
+            filters[campo] = valor
+
+        table = apps.get_model(options['model'])._meta.db_table
+        registros = iter_archive(
+            options['schema'],
+            table,
+            PARTITIONED_MODELS[options['model']],
+            start=self.parse_moment(options['start']),
+            end=self.parse_moment(options['end']),
+            filters=filters,
+        )
+        for total, row in enumerate(registros, start=1):
+            self.stdout.write(json.dumps(row, ensure_ascii=False))
+            if options['limit'] and total >= options['limit']:
+                break
+
+    def parse_moment(self, value):
+        if not value:
+            return None
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f"Data inválida: '{value}'.")
+            moment = datetime.combine(day, time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
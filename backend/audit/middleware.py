@@ -1,21 +1,35 @@
-import threading
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 
-_thread_locals = threading.local()
+# Mantidos aqui por compatibilidade: o usuário e o IP vêm do contexto do request
+from core.request_context import get_current_ip, get_current_user  # noqa: F401
+from .utils import finish_request, start_request
 
-def get_current_user():
-    return getattr(_thread_locals, 'user', None)
-
-def get_current_ip():
-    return getattr(_thread_locals, 'ip', None)
 
 class AuditMiddleware:
+    """
+    Delimita o request para a auditoria: registros gerados fora de transação são
+    gravados juntos, ao final. Depende do RequestContextMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        _thread_locals.user = getattr(request, 'user', None)
-        _thread_locals.ip = request.META.get('REMOTE_ADDR')
-        
-        response = self.get_response(request)
-        
-        return response
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start_request()
+        try:
+            return self.get_response(request)
+        finally:
+            finish_request()
+
+    async def __acall__(self, request):
+        start_request()
+        try:
+            return await self.get_response(request)
+        finally:
+            await sync_to_async(finish_request)()
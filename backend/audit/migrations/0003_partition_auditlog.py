@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from core.partitioning import convert_to_partitioned
+
+
+def particionar(apps, schema_editor):
+    # Particionamento nativo só existe no PostgreSQL; em outros bancos a tabela fica como está
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        convert_to_partitioned(cursor, "audit_auditlog", "timestamp")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0002_auditlog_changes_encoder"),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,11 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 class AuditLog(models.Model):
+    # No PostgreSQL a tabela é particionada por mês em `timestamp` (ver core/partitioning.py)
     ACTION_CHOICES = (
         ('CREATE', 'Create'),
         ('UPDATE', 'Update'),
@@ -23,11 +25,18 @@ class AuditLog(models.Model):
     content_object = GenericForeignKey('content_type', 'object_id')
 
     # Store changes as JSON
-    changes = models.JSONField(null=True, blank=True)
+    changes = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
     description = models.TextField(blank=True)
 
     class Meta:
         ordering = ['-timestamp']
+        # Índices compostos que atendem os filtros da API (/api/audit/), já na ordem da listagem
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='audit_ts_idx'),
+            models.Index(fields=['user', '-timestamp'], name='audit_user_ts_idx'),
+            models.Index(fields=['action', '-timestamp'], name='audit_action_ts_idx'),
+            models.Index(fields=['content_type', 'object_id', '-timestamp'], name='audit_object_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.timestamp}"
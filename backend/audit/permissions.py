@@ -0,0 +1,17 @@
+from rest_framework.permissions import BasePermission
+from core.request_context import get_user_permissions
+
+
+class CanViewAudit(BasePermission):
+    """
+    Acesso aos registros de auditoria da empresa atual (gerenciar.auditoria).
+    """
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+
+        if request.user.is_superuser or request.user.role == 'dev':
+            return True
+
+        perms_dict = get_user_permissions(request.user, request.tenant)
+        return perms_dict.get('gerenciar', {}).get('auditoria', False)
@@ -0,0 +1,29 @@
+from rest_framework import serializers
+
+from .models import AuditLog
+
+
+class AuditLogSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True, allow_null=True)
+    content_type = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuditLog
+        fields = [
+            'id',
+            'timestamp',
+            'user',
+            'username',
+            'action',
+            'content_type',
+            'object_id',
+            'ip_address',
+            'changes',
+            'description',
+        ]
+
+    def get_content_type(self, obj):
+        # "app_label.model", o mesmo formato aceito pelo filtro
+        if obj.content_type_id is None:
+            return None
+        return f"{obj.content_type.app_label}.{obj.content_type.model}"
@@ -1,10 +1,6 @@
-import json
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from django.core.serializers.json import DjangoJSONEncoder
-from django.contrib.contenttypes.models import ContentType
-from .models import AuditLog
 from .middleware import get_current_user, get_current_ip
+from .utils import build_log, record
 
 # Defina aqui os models que você quer auditar
 # Evite auditar o próprio AuditLog para não criar loop infinito
@@ -13,52 +9,45 @@ from purchases.models import Processo, Arquivo
 
 AUDITED_MODELS = [CustomUser, Processo, Arquivo]
 
+# Campos cujo valor nunca vai para o log (apenas o fato de terem mudado)
+MASKED_FIELDS = {"password"}
+
 def get_changes(instance, created):
     if created:
         return {"action": "created"}
-    # Lógica simplificada para update. 
-    # Para diff detalhado, seria necessário capturar pre_save também.
-    return {"action": "updated", "data": str(instance)}
+    # Diferença real dos campos rastreados (FieldTrackerMixin), sem consultar o banco
+    fields = instance.tracked_changes()
+    for name in MASKED_FIELDS & fields.keys():
+        fields[name] = {"old": "***", "new": "***"}
+    return {"action": "updated", "fields": fields}
 
-@receiver(post_save)
 def audit_log_save(sender, instance, created, **kwargs):
-    if sender not in AUDITED_MODELS:
-        return
-
     user = get_current_user()
     if not user or not user.is_authenticated:
         return
 
+    changes = get_changes(instance, created)
+    if not created and not changes["fields"]:
+        # Nenhum campo rastreado mudou (ex: apenas last_login no login)
+        return
+
     action = 'CREATE' if created else 'UPDATE'
-    
-    try:
-        AuditLog.objects.create(
-            user=user,
-            action=action,
-            ip_address=get_current_ip(),
-            content_object=instance,
-            changes=json.loads(json.dumps(get_changes(instance, created), cls=DjangoJSONEncoder)),
-            description=f"{action} {sender.__name__} {instance}"
-        )
-    except Exception as e:
-        print(f"Error creating audit log: {e}")
+    # Criações e edições podem ser gravadas em segundo plano (AUDIT_ASYNC)
+    record(
+        [build_log(instance, action, user, get_current_ip(), changes)],
+        critical=False,
+    )
 
-@receiver(post_delete)
 def audit_log_delete(sender, instance, **kwargs):
-    if sender not in AUDITED_MODELS:
-        return
-
     user = get_current_user()
     if not user or not user.is_authenticated:
         return
 
-    try:
-        AuditLog.objects.create(
-            user=user,
-            action='DELETE',
-            ip_address=get_current_ip(),
-            content_object=instance,
-            description=f"DELETE {sender.__name__} {instance}"
-        )
-    except Exception as e:
-        print(f"Error creating audit log: {e}")
+    record([build_log(instance, 'DELETE', user, get_current_ip())])
+
+def connect_signals():
+    # Receivers conectados apenas aos models auditados, em vez de receber o post_save de todos
+    for model in AUDITED_MODELS:
+        label = model._meta.label_lower
+        post_save.connect(audit_log_save, sender=model, dispatch_uid=f"audit_save_{label}")
+        post_delete.connect(audit_log_delete, sender=model, dispatch_uid=f"audit_delete_{label}")
@@ -0,0 +1,36 @@
+"""
+Falha na gravação da auditoria (audit/utils.py): os registros perdidos são contados e
+registrados no log como erro. Não usa o banco.
+"""
+import contextlib
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import SimpleTestCase
+
+from audit import utils
+
+
+class WriteLogsTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(utils.transaction, "atomic", contextlib.nullcontext)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_falha_conta_os_registros_descartados(self):
+        antes = utils.dropped_logs()
+        with mock.patch.object(utils.AuditLog.objects, "bulk_create", side_effect=DatabaseError("tabela ausente")):
+            with self.assertLogs("audit.utils", level="ERROR") as logs:
+                utils.write_logs([object(), object(), object()])
+
+        self.assertEqual(utils.dropped_logs(), antes + 3)
+        self.assertIn("3 registros de auditoria", logs.output[0])
+        self.assertIn("tabela ausente", logs.output[0])
+
+    def test_gravacao_bem_sucedida_nao_conta(self):
+        antes = utils.dropped_logs()
+        with mock.patch.object(utils.AuditLog.objects, "bulk_create") as bulk_create:
+            utils.write_logs(["registro"])
+
+        bulk_create.assert_called_once_with(["registro"])
+        self.assertEqual(utils.dropped_logs(), antes)
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework import routers
+from .views import AuditLogViewSet
+
+router = routers.SimpleRouter()
+router.register(r"audit", AuditLogViewSet)
+
+urlpatterns = [
+    path("", include(router.urls)),
+]
@@ -0,0 +1,192 @@
+"""
+Gravação dos registros de auditoria (AuditLog).
+
+Os registros não são inseridos um a um no momento do evento:
+- dentro de uma transação, ficam no `audit_buffer` e são gravados com um único
+  bulk_create após o commit (descartados em caso de rollback);
+- fora de transação, durante um request, são acumulados e gravados ao final do
+  request (ver AuditMiddleware);
+- com AUDIT_ASYNC, os registros não críticos são entregues a uma thread em segundo
+  plano, que os grava agrupados por schema.
+"""
+import atexit
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, connection, transaction
+from django_tenants.utils import schema_context
+
+from core import request_context
+from core.buffers import OnCommitBuffer
+from .models import AuditLog
+
+
+def build_log(instance, action, user=None, ip_address=None, changes=None):
+    return AuditLog(
+        user=user,
+        action=action,
+        ip_address=ip_address,
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=str(instance.pk),
+        changes=changes,
+        description=f"{action} {type(instance).__name__} {instance}",
+    )
+
+
+logger = logging.getLogger(__name__)
+
+# Registros perdidos por falha na gravação, desde o início do processo
+_descartados = 0
+_descartados_lock = threading.Lock()
+
+
+def dropped_logs():
+    """Total de registros de auditoria descartados por falha na gravação (no processo)."""
+    return _descartados
+
+
+def write_logs(logs):
+    global _descartados
+    try:
+        # Savepoint: uma falha na auditoria não deve invalidar a transação de quem chamou.
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(logs)
+    except Exception:
+        with _descartados_lock:
+            _descartados += len(logs)
+            total = _descartados
+        logger.exception(
+            "Falha ao gravar %d registros de auditoria (schema %s); %d descartados desde o início do processo.",
+            len(logs), getattr(connection, 'schema_name', None), total,
+        )
+
+
+class AsyncAuditWriter:
+    """
+    Thread que grava os registros não críticos fora do request (AUDIT_ASYNC).
+    Se a fila estiver cheia, o registro é gravado na hora em vez de ser perdido.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, schema_name, logs):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((schema_name, logs))
+        except queue.Full:
+            self._write([(schema_name, logs)])
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            lotes = [self.queue.get()]
+            while len(lotes) < 100:
+                try:
+                    lotes.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(lotes)
+            close_old_connections()
+
+    def _write(self, lotes):
+        por_schema = defaultdict(list)
+        for schema_name, logs in lotes:
+            por_schema[schema_name].extend(logs)
+        for schema_name, logs in por_schema.items():
+            if schema_name:
+                with schema_context(schema_name):
+                    write_logs(logs)
+            else:
+                write_logs(logs)
+
+    def drain(self):
+        lotes = []
+        while True:
+            try:
+                lotes.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if lotes:
+            self._write(lotes)
+
+
+async_writer = AsyncAuditWriter(settings.AUDIT_ASYNC_QUEUE_SIZE)
+atexit.register(async_writer.drain)
+
+
+def _flush(items):
+    """
+    Recebe (registro, crítico) já no schema em que foram gerados.
+    """
+    imediatos = [log for log, critical in items if critical or not settings.AUDIT_ASYNC]
+    segundo_plano = [log for log, critical in items if not critical and settings.AUDIT_ASYNC]
+    if imediatos:
+        write_logs(imediatos)
+    if segundo_plano:
+        async_writer.submit(getattr(connection, 'schema_name', None), segundo_plano)
+
+
+audit_buffer = OnCommitBuffer("audit", _flush)
+
+
+def record(logs, critical=True):
+    """
+    Enfileira registros de auditoria. `critical=False` permite que sejam gravados em
+    segundo plano quando AUDIT_ASYNC estiver ativo.
+    """
+    context = request_context.current()
+    pending = context.audit_pending if context else None
+    in_atomic_block = transaction.get_connection().in_atomic_block
+    for log in logs:
+        if pending is not None and not in_atomic_block:
+            # Fora de transação, dentro de um request: gravado ao final do request
+            pending.append((getattr(connection, 'schema_name', None), log, critical))
+        else:
+            audit_buffer.add((log, critical))
+
+
+def start_request():
+    context = request_context.current()
+    if context is not None:
+        context.audit_pending = []
+
+
+def finish_request():
+    context = request_context.current()
+    if context is None:
+        return
+    pending, context.audit_pending = context.audit_pending, None
+    if not pending:
+        return
+    por_schema = defaultdict(list)
+    for schema_name, log, critical in pending:
+        por_schema[schema_name].append((log, critical))
+    for schema_name, items in por_schema.items():
+        if schema_name:
+            with schema_context(schema_name):
+                _flush(items)
+        else:
+            _flush(items)
+
+
+def bulk_log(instances, action, user=None, ip_address=None, changes=None, critical=True):
+    """
+    Registra a mesma ação para vários objetos.
+    Usado em operações em lote (bulk_create/bulk_update), que não disparam os signals.
+    """
+    logs = [build_log(instance, action, user, ip_address, changes) for instance in instances]
+    if logs:
+        record(logs, critical=critical)
+    return logs
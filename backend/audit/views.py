@@ -0,0 +1,131 @@
+import csv
+import json
+
+import django_filters
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from django_tenants.utils import schema_context
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated
+
+from .models import AuditLog
+from .permissions import CanViewAudit
+from .serializers import AuditLogSerializer
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Colunas da exportação (values_list, sem instanciar models)
+EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('user', 'user_id'),
+    ('username', 'user__username'),
+    ('action', 'action'),
+    ('app_label', 'content_type__app_label'),
+    ('model', 'content_type__model'),
+    ('object_id', 'object_id'),
+    ('ip_address', 'ip_address'),
+    ('changes', 'changes'),
+    ('description', 'description'),
+]
+
+
+class AuditLogFilter(django_filters.FilterSet):
+    # ?timestamp_after=2025-01-01&timestamp_before=2025-02-01
+    timestamp = django_filters.IsoDateTimeFromToRangeFilter()
+    content_type = django_filters.CharFilter(method='filter_content_type')
+
+    class Meta:
+        model = AuditLog
+        fields = ['user', 'action', 'object_id']
+
+    def filter_content_type(self, queryset, name, value):
+        # Aceita o id ou "app_label.model" (ex: purchases.processo)
+        if value.isdigit():
+            return queryset.filter(content_type_id=int(value))
+        app_label, _, model = value.lower().partition('.')
+        try:
+            content_type = ContentType.objects.get_by_natural_key(app_label, model)
+        except ContentType.DoesNotExist:
+            return queryset.none()
+        return queryset.filter(content_type_id=content_type.id)
+
+
+class AuditLogPagination(CursorPagination):
+    # Paginação por chave (timestamp): custo constante em qualquer página
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-timestamp', '-id')
+
+
+class Echo:
+    """Buffer de escrita que apenas devolve o valor (csv.writer em streaming)."""
+    def write(self, value):
+        return value
+
+
+class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Registros de auditoria da empresa atual. Cada empresa tem a sua própria tabela
+    (schema do tenant), então a consulta já fica restrita ao tenant do request.
+    """
+    queryset = AuditLog.objects.select_related('user', 'content_type')
+    serializer_class = AuditLogSerializer
+    permission_classes = [IsAuthenticated, CanViewAudit]
+    pagination_class = AuditLogPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AuditLogFilter
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exporta os registros filtrados em NDJSON (padrão) ou CSV (?formato=csv).
+        As linhas são lidas com cursor no servidor e enviadas conforme são lidas,
+        com memória constante mesmo para milhões de registros.
+        """
+        formato = request.query_params.get('formato', 'ndjson')
+        if formato not in ('ndjson', 'csv'):
+            raise ValidationError({'formato': "Use 'ndjson' ou 'csv'."})
+
+        queryset = (
+            self.filter_queryset(AuditLog.objects.all())
+            .order_by('-timestamp', '-id')
+            .values_list(*[campo for _, campo in EXPORT_FIELDS])
+        )
+        colunas = [nome for nome, _ in EXPORT_FIELDS]
+        # O corpo é gerado depois que a view retorna: fixa o schema do tenant atual
+        schema_name = connection.schema_name
+
+        def rows():
+            with schema_context(schema_name):
+                yield from queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        if formato == 'csv':
+            writer = csv.writer(Echo())
+            changes = colunas.index('changes')
+
+            def content():
+                yield writer.writerow(colunas)
+                for row in rows():
+                    row = list(row)
+                    row[changes] = json.dumps(row[changes], cls=DjangoJSONEncoder, ensure_ascii=False)
+                    yield writer.writerow(row)
+
+            content_type, extensao = 'text/csv; charset=utf-8', 'csv'
+        else:
+            def content():
+                for row in rows():
+                    yield json.dumps(dict(zip(colunas, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+            content_type, extensao = 'application/x-ndjson', 'ndjson'
+
+        response = StreamingHttpResponse(content(), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="auditoria-{schema_name}.{extensao}"'
+        return response
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from users.views import CookieTokenObtainPairView, CookieTokenRefreshView
+from core.views import CacheStatsView
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
 router = DefaultRouter()
@@ -16,8 +17,12 @@ urlpatterns = [
     path("auth/", include("users.urls")), # ex: /api/auth/users/, /api/auth/permissions/, /api/auth/logout/
     # Rotas de negócio (ex: /api/processos/, /api/arquivos/)
     path("", include("purchases.urls")),
+    # Auditoria da empresa atual (ex: /api/audit/, /api/audit/export/)
+    path("", include("audit.urls")),
     # Rotas de gerenciamento de tenants (ex: /api/empresas/)
     path("", include("tenants.urls")),
+    # Estatísticas do cache compartilhado (apenas superusuários)
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
     # Rotas de obtenção de token JWT (Legacy support or direct usage)
     path('token/', CookieTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', CookieTokenRefreshView.as_view(), name='token_refresh'),
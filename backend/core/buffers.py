@@ -0,0 +1,58 @@
+from functools import partial
+
+from django.db import transaction
+from django_tenants.utils import schema_context
+
+
+class OnCommitBuffer:
+    """
+    Acumula itens durante uma transação e os entrega de uma só vez à função `flush`
+    depois do commit (ex: um único bulk_create em vez de um INSERT por linha).
+
+    - Fora de um bloco atômico, o item é entregue imediatamente.
+    - Itens adicionados dentro de um savepoint ficam em um lote próprio, descartado
+      pelo Django caso o savepoint sofra rollback.
+    - O flush roda no mesmo schema (tenant) em que os itens foram adicionados.
+    """
+
+    def __init__(self, name, flush):
+        self.name = name
+        self.flush = flush
+
+    def add(self, item, using=None):
+        connection = transaction.get_connection(using)
+        schema_name = getattr(connection, "schema_name", None)
+
+        if not connection.in_atomic_block:
+            self._run([item], schema_name)
+            return
+
+        buffers = connection.__dict__.setdefault("_on_commit_buffers", {})
+        key = (self.name, schema_name, tuple(connection.savepoint_ids))
+        pending = buffers.get(key)
+
+        if pending is None or not self._is_registered(connection, pending[1]):
+            items = []
+            callback = partial(self._run_pending, connection, key, items, schema_name)
+            transaction.on_commit(callback, using=using, robust=True)
+            pending = buffers[key] = (items, callback)
+
+        pending[0].append(item)
+
+    @staticmethod
+    def _is_registered(connection, callback):
+        # Callbacks de transações/savepoints desfeitos são removidos pelo Django.
+        return any(entry[1] is callback for entry in connection.run_on_commit)
+
+    def _run_pending(self, connection, key, items, schema_name):
+        connection.__dict__.get("_on_commit_buffers", {}).pop(key, None)
+        self._run(items, schema_name)
+
+    def _run(self, items, schema_name):
+        if not items:
+            return
+        if schema_name:
+            with schema_context(schema_name):
+                self.flush(items)
+        else:
+            self.flush(items)
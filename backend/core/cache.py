@@ -0,0 +1,278 @@
+"""
+Camada de cache compartilhada (CACHES['default']: django-redis, ou locmem sem Redis).
+
+Chaves: make_key (KEY_FUNCTION) prefixa toda chave com o schema ativo e a versão do
+cache da empresa: "<prefixo>:<schema>:<versão da empresa>.<versão>:<chave>". Assim o
+mesmo nome de chave nunca é compartilhado entre empresas, e invalidate_tenant() descarta
+de uma vez todo o cache de uma empresa (as chaves antigas expiram sozinhas).
+
+Convenção de nomes: "<namespace>:<resto>" (ex: "dashboard:u7:ab12"). O namespace agrupa
+as estatísticas de acertos/falhas e a contagem de chaves (cache_stats).
+
+- get/set/delete: como django.core.cache.cache, registrando acertos e falhas;
+- memoize: decorator que guarda o retorno da função, com proteção contra "stampede"
+  (apenas um processo recalcula uma chave expirada; os demais aguardam o resultado).
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from core import request_context
+from core.redis_client import errors, get_redis, mark_unavailable
+
+VERSION_KEY = "__versao__"
+STATS_KEY = "cache:estatisticas"
+_MISSING = object()
+
+
+def _schema():
+    return getattr(connection, "schema_name", None) or "public"
+
+
+_local = threading.local()
+
+
+def _new_version(atual=None):
+    """
+    Versões são timestamps em microssegundos: uma versão recriada (chave expulsa do
+    Redis, Redis reiniciado) nunca repete uma anterior, o que reativaria chaves antigas
+    ainda não expiradas.
+    """
+    return max(time.time_ns() // 1000, (atual or 0) + 1)
+
+
+def _remember_version(schema, versao):
+    context = request_context.current()
+    if context is not None:
+        context.cache_versions = {**(context.cache_versions or {}), schema: versao}
+    else:
+        versoes = getattr(_local, "versions", None)
+        if versoes is None:
+            versoes = _local.versions = {}
+        versoes[schema] = (versao, time.monotonic() + settings.CACHE_VERSION_LOCAL_TTL)
+
+
+def tenant_version(schema):
+    """
+    Versão atual do cache da empresa: lida uma vez por request ou, fora de um request
+    (workers, management commands), guardada por thread durante CACHE_VERSION_LOCAL_TTL
+    segundos (uma invalidação feita em outro processo vale após esse prazo).
+    """
+    context = request_context.current()
+    if context is not None:
+        if context.cache_versions is not None and schema in context.cache_versions:
+            return context.cache_versions[schema]
+    else:
+        versao, expira = getattr(_local, "versions", {}).get(schema, (None, 0))
+        if versao is not None and time.monotonic() < expira:
+            return versao
+
+    versao = cache.get(VERSION_KEY)
+    if versao is None:
+        # Primeiro uso ou versão perdida: grava uma nova (add, atômico) e relê, já que
+        # outro processo pode ter gravado a sua antes
+        nova = _new_version()
+        if cache.add(VERSION_KEY, nova, None):
+            versao = nova
+        else:
+            versao = cache.get(VERSION_KEY) or nova
+    _remember_version(schema, versao)
+    return versao
+
+
+def make_key(key, key_prefix, version):
+    schema = _schema()
+    if key == VERSION_KEY:
+        # A própria versão fica fora do versionamento (evita recursão)
+        return f"{key_prefix}:{schema}:{key}"
+    return f"{key_prefix}:{schema}:{tenant_version(schema)}.{version}:{key}"
+
+
+def invalidate_tenant():
+    """Descarta todo o cache da empresa atual, trocando a sua versão."""
+    schema = _schema()
+    nova = _new_version(cache.get(VERSION_KEY))
+    cache.set(VERSION_KEY, nova, None)
+    _remember_version(schema, nova)
+    return nova
+
+
+# --- Estatísticas ---
+
+class _Stats:
+    """
+    Contadores por namespace, acumulados no processo e enviados ao Redis (HINCRBY) a
+    cada STATS_FLUSH_INTERVAL segundos. Sem Redis, ficam apenas no processo.
+    """
+
+    def __init__(self):
+        self.pendentes = Counter()
+        self.locais = Counter()
+        self.lock = threading.Lock()
+        self.ultimo_envio = time.monotonic()
+
+    def add(self, namespace, campo):
+        with self.lock:
+            self.pendentes[f"{namespace}:{campo}"] += 1
+            if time.monotonic() - self.ultimo_envio < settings.CACHE_STATS_FLUSH_INTERVAL:
+                return
+            lote, self.pendentes = self.pendentes, Counter()
+            self.ultimo_envio = time.monotonic()
+        self._flush(lote)
+
+    def _flush(self, lote):
+        client = get_redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for campo, n in lote.items():
+                    pipe.hincrby(STATS_KEY, campo, n)
+                pipe.execute()
+                return
+            except errors() as e:
+                mark_unavailable(e)
+        with self.lock:
+            self.locais.update(lote)
+
+    def read(self):
+        with self.lock:
+            totais = self.locais + self.pendentes
+        client = get_redis()
+        if client is not None:
+            try:
+                for campo, n in client.hgetall(STATS_KEY).items():
+                    totais[campo.decode()] += int(n)
+            except errors() as e:
+                mark_unavailable(e)
+        return totais
+
+
+_stats = _Stats()
+
+
+def namespace_of(key):
+    return key.split(":", 1)[0]
+
+
+def get(key, default=None):
+    valor = cache.get(key, _MISSING)
+    _stats.add(namespace_of(key), "hits" if valor is not _MISSING else "misses")
+    return default if valor is _MISSING else valor
+
+
+def set(key, value, timeout=None):
+    cache.set(key, value, timeout if timeout is not None else settings.CACHE_DEFAULT_TIMEOUT)
+
+
+def delete(key):
+    cache.delete(key)
+
+
+def _memo_key(namespace, func, args, kwargs):
+    assinatura = hashlib.md5(repr((args, sorted(kwargs.items()))).encode()).hexdigest()[:16]
+    return f"{namespace}:{func.__name__}:{assinatura}"
+
+
+def memoize(namespace, timeout=None, lock_timeout=30):
+    """
+    Guarda o retorno da função em "<namespace>:<função>:<hash dos argumentos>" (na
+    empresa atual). Os argumentos precisam ter um repr estável (ids, strings, números).
+    `func.invalidate(*args, **kwargs)` remove o valor guardado.
+
+    Proteção contra stampede: na falta da chave, apenas quem obtém a trava
+    (cache.add, atômico) executa a função; os demais aguardam até o valor aparecer ou
+    a trava ser liberada (ou expirar, após `lock_timeout` segundos).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _memo_key(namespace, func, args, kwargs)
+            valor = get(key, _MISSING)
+            if valor is not _MISSING:
+                return valor
+
+            lock_key = f"{key}:trava"
+            while True:
+                travado = cache.add(lock_key, 1, lock_timeout)
+                if travado is None:
+                    # Redis fora do ar (IGNORE_EXCEPTIONS): calcula sem cache
+                    return func(*args, **kwargs)
+                if travado:
+                    break
+                time.sleep(0.05)
+                valor = cache.get(key, _MISSING)
+                if valor is not _MISSING:
+                    return valor
+            try:
+                # Outro processo pode ter gravado o valor e liberado a trava nesse meio tempo
+                valor = cache.get(key, _MISSING)
+                if valor is _MISSING:
+                    valor = func(*args, **kwargs)
+                    set(key, valor, timeout)
+                return valor
+            finally:
+                cache.delete(lock_key)
+
+        wrapper.invalidate = lambda *args, **kwargs: delete(_memo_key(namespace, func, args, kwargs))
+        return wrapper
+    return decorator
+
+
+def _count_keys():
+    """
+    Chaves por (schema, namespace), sem as internas (versões e travas). Inclui chaves de
+    versões anteriores da empresa (após invalidate_tenant) até expirarem.
+    """
+    contagem = Counter()
+    prefixo = settings.CACHES["default"].get("KEY_PREFIX", "")
+
+    def contar(chave):
+        # "<prefixo>:<schema>:<versões>:<chave>"
+        partes = chave.split(":", 3)
+        if len(partes) < 4 or partes[3] == VERSION_KEY or partes[3].endswith(":trava"):
+            return
+        contagem[(partes[1], namespace_of(partes[3]))] += 1
+
+    if hasattr(cache, "_cache") and isinstance(cache._cache, dict):
+        # LocMemCache
+        for chave in list(cache._cache):
+            contar(chave)
+        return contagem
+
+    from django_redis import get_redis_connection
+
+    try:
+        client = get_redis_connection("default")
+        for chave in client.scan_iter(match=f"{prefixo}:*", count=1000):
+            contar(chave.decode())
+    except errors() as e:
+        mark_unavailable(e)
+    return contagem
+
+
+def cache_stats():
+    """Acertos, falhas e taxa de acerto por namespace, e chaves por empresa/namespace."""
+    totais = _stats.read()
+    namespaces = {}
+    for campo, n in totais.items():
+        namespace, _, tipo = campo.rpartition(":")
+        namespaces.setdefault(namespace, {"hits": 0, "misses": 0})[tipo] = n
+    for dados in namespaces.values():
+        total = dados["hits"] + dados["misses"]
+        dados["taxa_acerto"] = round(dados["hits"] / total, 4) if total else None
+
+    chaves = {}
+    for (schema, namespace), n in _count_keys().items():
+        chaves.setdefault(schema, {})[namespace] = n
+        namespaces.setdefault(namespace, {"hits": 0, "misses": 0, "taxa_acerto": None})
+    return {
+        "backend": settings.CACHES["default"]["BACKEND"],
+        "namespaces": namespaces,
+        "chaves": chaves,
+    }
@@ -1,14 +1,23 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django_tenants.middleware.main import TenantMainMiddleware
 from django_tenants.utils import get_tenant_model, get_public_schema_name
 from django.db import connection
 
+from core import request_context
+from users.tokens import tenant_from_request
+
 class TenantIdentificationMiddleware(TenantMainMiddleware):
     """
     Middleware customizado para selecionar o tenant.
     Prioridade:
-    1. Header 'X-Tenant-ID' (Frontend)
-    2. Subdomínio/Hostname (Navegador/Admin)
-    3. Fallback para Public (Segurança)
+    1. Claim 'tenant' do access token (users/tokens.py): definido no login ou na troca
+       de empresa, depois de verificado o vínculo do usuário. Se presente, o header
+       'X-Tenant-ID' é ignorado.
+    2. Header 'X-Tenant-ID' (Frontend, tokens sem empresa)
+    3. Subdomínio/Hostname (Navegador/Admin)
+    4. Fallback para Public (Segurança)
+
+    Empresas que não estão prontas (schema em criação ou com falha) não recebem requests.
     """
 
     def process_request(self, request):
@@ -23,23 +32,72 @@ class TenantIdentificationMiddleware(TenantMainMiddleware):
             return None
 
     def get_tenant(self, domain_model, hostname):
-        # 1. Tenta obter o tenant pelo Header (usado pelo frontend)
+        # 1. Empresa vinculada ao token (validado aqui apenas pela assinatura e validade)
+        tenant_schema_from_token = tenant_from_request(self.request)
+        if tenant_schema_from_token:
+            try:
+                return get_tenant_model().objects.get(
+                    schema_name=tenant_schema_from_token, status=get_tenant_model().Status.PRONTA
+                )
+            except get_tenant_model().DoesNotExist:
+                # Empresa desativada depois da emissão do token
+                return self.get_public_schema_tenant()
+
+        # 2. Tenta obter o tenant pelo Header (usado pelo frontend)
         tenant_schema_from_header = self.request.headers.get('X-Tenant-ID')
         if tenant_schema_from_header:
             try:
-                tenant = get_tenant_model().objects.get(schema_name=tenant_schema_from_header)
+                tenant = get_tenant_model().objects.get(
+                    schema_name=tenant_schema_from_header, status=get_tenant_model().Status.PRONTA
+                )
                 return tenant
             except get_tenant_model().DoesNotExist:
                 # O header especificou um tenant que não existe.
                 # A lógica prossegue para tentar pelo hostname.
                 pass
 
-        # 2. Se a lógica do header falhou, tenta pelo Hostname (comportamento padrão)
+        # 3. Se a lógica do header falhou, tenta pelo Hostname (comportamento padrão)
         try:
-            return super().get_tenant(domain_model, hostname)
+            tenant = super().get_tenant(domain_model, hostname)
+            if tenant.is_ready:
+                return tenant
         except domain_model.DoesNotExist:
             # Continua se o tenant não for encontrado pelo hostname
             pass
         
-        # 3. Fallback final para o schema público
-        return self.get_public_schema_tenant()
\ No newline at end of file
+        # 4. Fallback final para o schema público
+        return self.get_public_schema_tenant()
+
+
+class RequestContextMiddleware:
+    """
+    Ativa o contexto do request (core/request_context.py) e devolve o id do request
+    no cabeçalho X-Request-ID. Funciona em modo síncrono (WSGI) e assíncrono (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = request_context.activate(request)
+        try:
+            response = self.get_response(request)
+            response[request_context.REQUEST_ID_HEADER] = request_context.get_request_id()
+        finally:
+            request_context.deactivate(token)
+        return response
+
+    async def __acall__(self, request):
+        token = request_context.activate(request)
+        try:
+            response = await self.get_response(request)
+            response[request_context.REQUEST_ID_HEADER] = request_context.get_request_id()
+        finally:
+            request_context.deactivate(token)
+        return response
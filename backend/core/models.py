@@ -1 +1,103 @@
-from django.db import models
\ No newline at end of file
+from django.db import models
+from django.db.models import DEFERRED
+
+# (nome, attname, é FileField) dos campos rastreados, por model
+_tracked_attnames = {}
+
+
+class FieldTrackerMixin(models.Model):
+    """
+    Guarda os valores com que os campos listados em `tracked_fields` foram carregados do
+    banco, permitindo saber o que mudou antes/depois de um save sem um novo SELECT.
+
+    O snapshot é uma tupla (apenas os campos rastreados; FKs pelo id) refeita após cada
+    save() e refresh_from_db(). Os signals de post_save ainda enxergam as alterações,
+    pois o snapshot só é refeito depois deles.
+    """
+    tracked_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def _tracked_attnames(cls):
+        attnames = _tracked_attnames.get(cls)
+        if attnames is None:
+            fields = [cls._meta.get_field(name) for name in cls.tracked_fields]
+            attnames = _tracked_attnames[cls] = tuple(
+                (field.name, field.attname, isinstance(field, models.FileField)) for field in fields
+            )
+        return attnames
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked()
+        return instance
+
+    def _tracked_value(self, attname, is_file):
+        # Lido do __dict__ para não disparar o carregamento de campos adiados (only/defer)
+        value = self.__dict__.get(attname, DEFERRED)
+        if is_file and value is not DEFERRED:
+            value = getattr(value, "name", value)
+        return value
+
+    def _snapshot_tracked(self, only=None):
+        attnames = self._tracked_attnames()
+        current = tuple(self._tracked_value(attname, is_file) for _, attname, is_file in attnames)
+        loaded = self.__dict__.get("_tracked_loaded")
+        if only is None or loaded is None:
+            self._tracked_loaded = current
+        else:
+            only = set(only)
+            self._tracked_loaded = tuple(
+                new if (name in only or attname in only) else old
+                for (name, attname, _), old, new in zip(attnames, loaded, current)
+            )
+
+    @property
+    def tracker_loaded(self):
+        """Indica se há valores carregados do banco para comparar."""
+        return self.__dict__.get("_tracked_loaded") is not None
+
+    def _tracked_pairs(self):
+        loaded = self.__dict__.get("_tracked_loaded")
+        for i, (name, attname, is_file) in enumerate(self._tracked_attnames()):
+            old = loaded[i] if loaded is not None else DEFERRED
+            yield name, old, self._tracked_value(attname, is_file)
+
+    def changed_fields(self):
+        """
+        Campos rastreados alterados desde o carregamento. Sem snapshot (objeto não
+        carregado do banco), todos os campos com valor são considerados alterados.
+        """
+        return [
+            name for name, old, new in self._tracked_pairs()
+            if new is not DEFERRED and (old is DEFERRED or old != new)
+        ]
+
+    def has_changed(self, name):
+        return name in self.changed_fields()
+
+    def old_value(self, name):
+        for field_name, old, _ in self._tracked_pairs():
+            if field_name == name:
+                return None if old is DEFERRED else old
+        raise ValueError(f"Campo '{name}' não é rastreado em {type(self).__name__}.")
+
+    def tracked_changes(self):
+        """{campo: {"old": valor anterior, "new": valor atual}} dos campos alterados."""
+        changed = set(self.changed_fields())
+        return {
+            name: {"old": None if old is DEFERRED else old, "new": new}
+            for name, old, new in self._tracked_pairs()
+            if name in changed
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_tracked(fields)
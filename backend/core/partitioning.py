@@ -0,0 +1,275 @@
+"""
+Particionamento mensal (PostgreSQL, PARTITION BY RANGE) das tabelas de histórico que
+crescem sem limite em cada schema: AuditLog e StatusHistory.
+
+- convert_to_partitioned: usada nas migrations; recria a tabela como particionada
+  mantendo dados, índices e FKs (no banco, a PK passa a ser (id, coluna de data)).
+- ensure_partitions: cria as partições dos próximos meses (comando 'manage_partitions').
+- archive_partition: exporta uma partição antiga para JSONL compactado (gzip) e a
+  desanexa da tabela.
+- iter_archive: leitura (somente leitura) dos períodos já arquivados.
+
+Todas as funções operam no schema atual (search_path do tenant).
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Model -> coluna usada como chave de partição
+PARTITIONED_MODELS = {
+    "audit.AuditLog": "timestamp",
+    "purchases.StatusHistory": "data_mudanca",
+}
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, n):
+    years, index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def _as_datetime(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _exists(cursor, name):
+    cursor.execute(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = current_schema() AND c.relname = %s",
+        [name],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def is_partitioned(cursor, table):
+    return _exists(cursor, table) == "p"
+
+
+def list_partitions(cursor, table):
+    """
+    Meses (date do dia 1) que possuem partição, em ordem. A partição padrão é ignorada.
+    """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE n.nspname = current_schema() AND p.relname = %s",
+        [table],
+    )
+    prefixo = f"{table}_p"
+    meses = []
+    for (nome,) in cursor.fetchall():
+        sufixo = nome[len(prefixo):]
+        if nome.startswith(prefixo) and len(sufixo) == 6 and sufixo.isdigit():
+            meses.append(date(int(sufixo[:4]), int(sufixo[4:]), 1))
+    return sorted(meses)
+
+
+def create_partition(cursor, table, column, month):
+    """
+    Cria a partição do mês. Linhas do período que tenham caído na partição padrão
+    (ex: partição criada com atraso) são movidas para a nova partição.
+    Retorna False se ela já existia.
+    """
+    qn = cursor.db.ops.quote_name
+    nome = partition_name(table, month)
+    if _exists(cursor, nome):
+        return False
+
+    inicio, fim = _bound(month), _bound(add_months(month, 1))
+    default = default_partition_name(table)
+    pendentes = False
+    if _exists(cursor, default):
+        cursor.execute(
+            f"SELECT 1 FROM {qn(default)} WHERE {qn(column)} >= {inicio} AND {qn(column)} < {fim} LIMIT 1"
+        )
+        pendentes = cursor.fetchone() is not None
+    if not pendentes:
+        cursor.execute(
+            f"CREATE TABLE {qn(nome)} PARTITION OF {qn(table)} FOR VALUES FROM ({inicio}) TO ({fim})"
+        )
+        return True
+
+    cursor.execute(f"CREATE TABLE {qn(nome)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH movidas AS (DELETE FROM {qn(default)} WHERE {qn(column)} >= {inicio} AND {qn(column)} < {fim} "
+        f"RETURNING *) INSERT INTO {qn(nome)} SELECT * FROM movidas"
+    )
+    cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(nome)} FOR VALUES FROM ({inicio}) TO ({fim})")
+    return True
+
+
+def ensure_partitions(cursor, table, column, months_ahead=3, today=None):
+    """
+    Garante as partições do mês atual até `months_ahead` meses à frente.
+    Retorna os meses criados.
+    """
+    atual = month_start(today or datetime.now(dt_timezone.utc))
+    criados = []
+    for n in range(months_ahead + 1):
+        mes = add_months(atual, n)
+        if create_partition(cursor, table, column, mes):
+            criados.append(mes)
+    return criados
+
+
+def convert_to_partitioned(cursor, table, column, months_ahead=3):
+    """
+    Recria `table` como tabela particionada por mês em `column`, copiando os dados.
+    Usada nas migrations (executadas em cada schema); não faz nada se a tabela já for
+    particionada.
+    """
+    if is_partitioned(cursor, table):
+        return
+    qn = cursor.db.ops.quote_name
+    legado = f"{table}_legado"
+
+    # Definições que serão recriadas na nova tabela com os mesmos nomes
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table]
+    )
+    pk_name = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+        [table],
+    )
+    indexes = [indexdef for nome, indexdef in cursor.fetchall() if nome != pk_name]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+
+    # Próximo id da sequência (identity) atual
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequencia = cursor.fetchone()[0]
+    cursor.execute(f"SELECT last_value, is_called FROM {sequencia}")
+    last_value, is_called = cursor.fetchone()
+    proximo_id = last_value + 1 if is_called else last_value
+
+    cursor.execute(f"SELECT min({qn(column)}) FROM {qn(table)}")
+    mais_antigo = cursor.fetchone()[0]
+
+    cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legado)}")
+    cursor.execute(
+        f"CREATE TABLE {qn(table)} (LIKE {qn(legado)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE ({qn(column)})"
+    )
+    cursor.execute(f"CREATE TABLE {qn(default_partition_name(table))} PARTITION OF {qn(table)} DEFAULT")
+
+    atual = month_start(datetime.now(dt_timezone.utc))
+    mes = month_start(mais_antigo) if mais_antigo else atual
+    while mes <= add_months(atual, months_ahead):
+        create_partition(cursor, table, column, mes)
+        mes = add_months(mes, 1)
+
+    cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legado)}")
+    cursor.execute(f"DROP TABLE {qn(legado)}")
+
+    # A chave de partição precisa fazer parte da PK
+    cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(pk_name)} PRIMARY KEY (id, {qn(column)})")
+    sequencia = f"{table}_id_seq"
+    cursor.execute(f"CREATE SEQUENCE {qn(sequencia)} OWNED BY {qn(table)}.id")
+    cursor.execute("SELECT setval(%s, %s, false)", [sequencia, proximo_id])
+    cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequencia}'::regclass)")
+    for indexdef in indexes:
+        cursor.execute(indexdef)
+    for nome, definicao in foreign_keys:
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(nome)} {definicao}")
+
+
+def archive_dir(schema_name, table):
+    return os.path.join(settings.PARTITION_ARCHIVE_ROOT, schema_name, table)
+
+
+def archive_partition(cursor, schema_name, table, month, drop=True):
+    """
+    Exporta a partição do mês para <PARTITION_ARCHIVE_ROOT>/<schema>/<tabela>/<AAAA-MM>.jsonl.gz
+    e a desanexa da tabela (removendo-a, se `drop`). Retorna a quantidade de linhas.
+    A leitura usa um cursor no servidor, com memória constante.
+    """
+    qn = cursor.db.ops.quote_name
+    nome = partition_name(table, month)
+    destino_dir = archive_dir(schema_name, table)
+    os.makedirs(destino_dir, exist_ok=True)
+    destino = os.path.join(destino_dir, f"{month:%Y-%m}.jsonl.gz")
+    temporario = f"{destino}.tmp"
+
+    linhas = 0
+    with cursor.db.chunked_cursor() as leitura, gzip.open(temporario, "wt", encoding="utf-8") as f:
+        leitura.execute(f"SELECT * FROM {qn(nome)}")
+        colunas = [col[0] for col in leitura.description]
+        while True:
+            lote = leitura.fetchmany(2000)
+            if not lote:
+                break
+            for row in lote:
+                f.write(json.dumps(dict(zip(colunas, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+                f.write("\n")
+            linhas += len(lote)
+    os.replace(temporario, destino)
+
+    cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(nome)}")
+    if drop:
+        cursor.execute(f"DROP TABLE {qn(nome)}")
+    return linhas
+
+
+def archived_months(schema_name, table):
+    pasta = archive_dir(schema_name, table)
+    if not os.path.isdir(pasta):
+        return []
+    meses = []
+    for nome in os.listdir(pasta):
+        if nome.endswith(".jsonl.gz"):
+            ano, _, mes = nome[: -len(".jsonl.gz")].partition("-")
+            meses.append(date(int(ano), int(mes), 1))
+    return sorted(meses)
+
+
+def iter_archive(schema_name, table, column, start=None, end=None, filters=None):
+    """
+    Lê os registros arquivados (somente leitura) de `start` (inclusive) a `end`
+    (exclusive), datetimes com fuso. `filters` compara campos da linha com valores
+    em texto.
+    """
+    filters = filters or {}
+    for mes in archived_months(schema_name, table):
+        if start and _as_datetime(add_months(mes, 1)) <= start:
+            continue
+        if end and _as_datetime(mes) >= end:
+            continue
+        caminho = os.path.join(archive_dir(schema_name, table), f"{mes:%Y-%m}.jsonl.gz")
+        with gzip.open(caminho, "rt", encoding="utf-8") as f:
+            for linha in f:
+                row = json.loads(linha)
+                momento = datetime.fromisoformat(row[column])
+                if start and momento < start:
+                    continue
+                if end and momento >= end:
+                    continue
+                if any(str(row.get(campo)) != valor for campo, valor in filters.items()):
+                    continue
+                yield row
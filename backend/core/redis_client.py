@@ -0,0 +1,51 @@
+"""
+Conexão com o Redis compartilhado pelos workers (REDIS_URL).
+
+O Redis é opcional: sem REDIS_URL, ou com o servidor fora do ar, get_redis() retorna
+None e quem usa deve cair no comportamento local (por processo). Depois de uma falha
+de conexão, novas tentativas só são feitas após REDIS_RETRY_INTERVAL segundos, para
+que um Redis indisponível não adicione o timeout de conexão a cada request.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - o pacote está no requirements.txt
+    redis = None
+
+_client = None
+_lock = threading.Lock()
+_unavailable_until = 0.0
+
+
+def get_redis():
+    """Cliente Redis (thread-safe, com pool de conexões) ou None se indisponível."""
+    global _client
+    if redis is None or not settings.REDIS_URL or time.monotonic() < _unavailable_until:
+        return None
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+    return _client
+
+
+def mark_unavailable(error):
+    """Chamado por quem recebeu um erro do Redis: suspende o uso por um intervalo."""
+    global _unavailable_until
+    with _lock:
+        if time.monotonic() >= _unavailable_until:
+            print(f"Redis indisponível ({error}); usando o fallback local por {settings.REDIS_RETRY_INTERVAL}s.")
+        _unavailable_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
+
+
+def errors():
+    """Exceções do cliente que indicam Redis indisponível (para usar em `except`)."""
+    return (redis.RedisError,) if redis is not None else ()
@@ -0,0 +1,141 @@
+"""
+Contexto do request em andamento (usuário, IP, tenant, id do request e permissões),
+guardado em um ContextVar.
+
+Diferente de um threading.local, cada request enxerga apenas o seu contexto tanto em
+workers síncronos (WSGI, gthread) quanto no ASGI, onde vários requests compartilham a
+mesma thread (views síncronas rodam via sync_to_async na thread única do
+thread_sensitive) ou a mesma event loop (tasks diferentes).
+
+O contexto é ativado pelo RequestContextMiddleware (core/middleware.py). Fora de um
+request (management commands, workers) as funções get_* retornam None.
+"""
+import contextvars
+import re
+import uuid
+from contextlib import contextmanager
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_current = contextvars.ContextVar("request_context", default=None)
+
+
+class RequestContext:
+    """
+    Dados do request atual. O objeto é mutável e compartilhado por todo o request:
+    alterações feitas em código síncrono executado via sync_to_async (que roda em uma
+    cópia do contexto) continuam visíveis para o restante do request.
+    """
+    __slots__ = (
+        "request", "ip", "request_id", "user_override", "audit_pending", "cache_versions", "_permissions",
+    )
+
+    def __init__(self, request=None, ip=None, request_id=None, user=None):
+        self.request = request
+        self.ip = ip
+        self.request_id = request_id or uuid.uuid4().hex
+        self.user_override = user
+        # Registros de auditoria gravados ao final do request (ver audit.utils)
+        self.audit_pending = None
+        # Versão do cache de cada empresa já lida neste request (ver core.cache)
+        self.cache_versions = None
+        self._permissions = None
+
+    @property
+    def user(self):
+        if self.user_override is not None:
+            return self.user_override
+        # Lido do request no momento do uso: a autenticação JWT do DRF só define
+        # request.user dentro da view, depois dos middlewares
+        return getattr(self.request, "user", None)
+
+    @property
+    def tenant(self):
+        return getattr(self.request, "tenant", None)
+
+    def permissions(self, user, tenant):
+        # Calculadas uma vez por request (várias permission classes consultam o mesmo dicionário)
+        from users.models import UserPermission
+
+        key = (user.pk, getattr(tenant, "pk", None))
+        if self._permissions is None or self._permissions[0] != key:
+            self._permissions = (key, UserPermission.get_user_permissions_dict(user, tenant))
+        return self._permissions[1]
+
+
+def _request_id_from(request):
+    # Reaproveita o id enviado pelo proxy (Nginx) se for um valor seguro para logs
+    request_id = request.headers.get(REQUEST_ID_HEADER, "")
+    return request_id if _REQUEST_ID_RE.match(request_id) else None
+
+
+def activate(request):
+    """Ativa o contexto do request; retorna o token usado em deactivate()."""
+    context = RequestContext(
+        request=request,
+        ip=request.META.get("REMOTE_ADDR"),
+        request_id=_request_id_from(request),
+    )
+    return _current.set(context)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def use_context(**kwargs):
+    """
+    Ativa um contexto avulso (ex: em um management command que age em nome de um
+    usuário): `with use_context(user=sistema): ...`.
+    """
+    token = _current.set(RequestContext(**kwargs))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def get_current_user():
+    context = _current.get()
+    return context.user if context else None
+
+
+def get_current_ip():
+    context = _current.get()
+    return context.ip if context else None
+
+
+def get_current_tenant():
+    context = _current.get()
+    return context.tenant if context else None
+
+
+def get_request_id():
+    context = _current.get()
+    return context.request_id if context else None
+
+
+def get_user_permissions(user, tenant):
+    """
+    Mesmo retorno de UserPermission.get_user_permissions_dict, reaproveitado durante o
+    request. O dicionário é compartilhado: não o altere.
+    """
+    context = _current.get()
+    if context is None or user is None or not user.is_authenticated:
+        from users.models import UserPermission
+
+        return UserPermission.get_user_permissions_dict(user, tenant)
+    return context.permissions(user, tenant)
+
+
+def forget_user_permissions():
+    """Descarta as permissões guardadas no request atual (após alterá-las no banco)."""
+    context = _current.get()
+    if context is not None:
+        context._permissions = None
@@ -101,6 +101,8 @@ DATABASE_ROUTERS = (
 MIDDLEWARE = [
     # 'django_tenants.middleware.main.TenantMainMiddleware', # Removido para usar a versão customizada abaixo
     'core.middleware.TenantIdentificationMiddleware',
+    # Usuário, IP, tenant e id do request em contextvars (seguro também no ASGI)
+    'core.middleware.RequestContextMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -113,6 +115,12 @@ MIDDLEWARE = [
 ]
 ROOT_URLCONF = "core.urls"
 
+# Schema modelo (não é uma empresa), mantido migrado e clonado na criação de cada empresa
+TENANT_TEMPLATE_SCHEMA = os.environ.get("TENANT_TEMPLATE_SCHEMA", "tenant_template")
+
+# 'migrate' sem --schema só migra empresas prontas (ver tenants/migration_executor.py)
+GET_EXECUTOR_FUNCTION = "tenants.migration_executor.get_ready_tenants_executor"
+
 # Configuração para identificar o tenant via cabeçalho HTTP
 TENANT_IDENTIFIER_CLASS = 'django_tenants.middleware.identificators.HeaderIdentificator'
 TENANT_IDENTIFIER_HEADER = 'X-Tenant-ID'
@@ -185,6 +193,85 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# --- Miniaturas e prévias de arquivos ---
+# Geradas pelo worker 'generate_previews' e armazenadas por hash de conteúdo.
+# Pastas iniciadas por "." são ignoradas pelo sync_files.
+PREVIEWS_DIRNAME = ".previews"
+PREVIEWS_ROOT = MEDIA_ROOT / PREVIEWS_DIRNAME
+PREVIEWS_URL = f"{MEDIA_URL}{PREVIEWS_DIRNAME}/"
+PREVIEW_THUMBNAIL_SIZE = (320, 320)
+PREVIEW_WEB_SIZE = (1600, 1600)
+
+# --- Sincronização incremental (sync_files --incremental) ---
+# Impressões digitais (mtime/tamanho) de cada diretório já listado; fica fora do
+# MEDIA_ROOT para não ser tratada como conteúdo do volume montado.
+SYNC_STATE_DIR = os.environ.get("SYNC_STATE_DIR", BASE_DIR / ".sync_state")
+
+# --- Auditoria ---
+# Registros acumulados por transação/request e gravados com um único bulk_create.
+AUDIT_ENABLED = os.environ.get("AUDIT_ENABLED", "True").lower() == "true"
+# Criações e edições gravadas por uma thread em segundo plano (exclusões continuam síncronas).
+AUDIT_ASYNC = os.environ.get("AUDIT_ASYNC", "False").lower() == "true"
+AUDIT_ASYNC_QUEUE_SIZE = 10000
+
+# --- Registros de uso (LogUso) ---
+# Dias mantidos antes da remoção pelo comando 'purge_usage_logs'.
+LOG_USO_RETENTION_DAYS = int(os.environ.get("LOG_USO_RETENTION_DAYS", "365"))
+
+# --- Resumo do Dashboard entre empresas (/api/dashboard/empresas/) ---
+# Schemas calculados em paralelo (threads, cada uma com sua conexão), tempo de espera
+# por empresa antes de devolvê-la como 'pendente' e validade do cache por empresa.
+DASHBOARD_MAX_WORKERS = int(os.environ.get("DASHBOARD_MAX_WORKERS", "4"))
+DASHBOARD_TENANT_TIMEOUT = 10
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get("DASHBOARD_CACHE_TIMEOUT", "300"))
+
+# --- Particionamento do histórico (AuditLog e StatusHistory) ---
+# Partições mensais mantidas pelo comando 'manage_partitions'. As partições mais antigas
+# que a retenção são exportadas para JSONL.gz em PARTITION_ARCHIVE_ROOT e removidas do banco.
+PARTITION_MONTHS_AHEAD = 3
+PARTITION_RETENTION_MONTHS = int(os.environ.get("PARTITION_RETENTION_MONTHS", "24"))
+PARTITION_ARCHIVE_ROOT = os.environ.get("PARTITION_ARCHIVE_ROOT", BASE_DIR / "archive")
+
+# --- Redis (opcional) ---
+# Compartilhado pelos workers gunicorn e servidores (ex: contadores dos throttles).
+# Sem REDIS_URL, ou com o Redis fora do ar, cada processo usa o seu estado local.
+REDIS_URL = os.environ.get("REDIS_URL")
+REDIS_SOCKET_TIMEOUT = 0.5
+# Segundos sem tentar o Redis depois de uma falha de conexão
+REDIS_RETRY_INTERVAL = 30
+
+# --- Cache (core/cache.py) ---
+# django-redis quando há Redis (com falhas tratadas como cache vazio); sem Redis, locmem
+# por processo. As chaves são prefixadas com o schema e a versão do cache da empresa.
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "compras",
+            "KEY_FUNCTION": "core.cache.make_key",
+            "OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+                "SOCKET_CONNECT_TIMEOUT": REDIS_SOCKET_TIMEOUT,
+                "SOCKET_TIMEOUT": REDIS_SOCKET_TIMEOUT,
+                "IGNORE_EXCEPTIONS": True,
+            },
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "KEY_FUNCTION": "core.cache.make_key",
+        }
+    }
+CACHE_DEFAULT_TIMEOUT = 300
+# Intervalo (s) de envio dos contadores de acertos/falhas de cada processo ao Redis
+CACHE_STATS_FLUSH_INTERVAL = 5
+# Segundos em que a versão do cache de cada empresa fica guardada por thread fora de um
+# request (workers, management commands); dentro de um request ela é lida uma única vez
+CACHE_VERSION_LOCAL_TTL = 5
+
 # --- Configurações do Django REST Framework e JWT ---
 
 REST_FRAMEWORK = {
@@ -193,10 +280,18 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Contadores compartilhados no Redis (janela deslizante), com fallback para o cache
+    # local. Sem DEFAULT_THROTTLE_CLASSES: os throttles são declarados em cada view.
     "DEFAULT_THROTTLE_RATES": {
-        "anon": "5/minute",
-        "user": "1000/day",
-        "login": "5/minute", # Throttle especifico para login
+        # Tentativas de login por IP + usuário, e por IP (vários usuários)
+        "login": os.environ.get("THROTTLE_LOGIN_RATE", "5/minute"),
+        "login_ip": os.environ.get("THROTTLE_LOGIN_IP_RATE", "60/minute"),
+        # Renovação de token e troca de empresa, por usuário
+        "token_refresh": os.environ.get("THROTTLE_REFRESH_RATE", "30/minute"),
+        "tenant_switch": os.environ.get("THROTTLE_TENANT_SWITCH_RATE", "20/minute"),
+        # Opcionais (users.throttles.AnonRateThrottle / TenantUserRateThrottle)
+        "anon": os.environ.get("THROTTLE_ANON_RATE", "60/minute"),
+        "user": os.environ.get("THROTTLE_USER_RATE", "600/minute"),
     },
 }
 
@@ -214,9 +309,14 @@ SIMPLE_JWT = {
     # Tempo de vida do token de atualização (refresh token)
     "REFRESH_TOKEN_LIFETIME": timedelta(hours=1),
     "ROTATE_REFRESH_TOKENS": True,
+    # O token usado na renovação é revogado (users/token_blacklist.py, sem tabela no banco)
     "BLACKLIST_AFTER_ROTATION": True,
 }
 
+# Onde ficam os JTIs de refresh tokens revogados (rotação e logout), pelo tempo de vida
+# restante de cada token. MemoryBlacklist (por processo) serve para testes.
+TOKEN_BLACKLIST_BACKEND = "users.token_blacklist.RedisBlacklist"
+
 # --- Configurações de CORS (Cross-Origin Resource Sharing) ---
 CORS_ALLOW_CREDENTIALS = True
 
@@ -0,0 +1,25 @@
+from django_tenants.utils import get_tenant_model, get_public_schema_name, tenant_context
+
+
+def get_tenants(schema_name=None):
+    """
+    Retorna as empresas (tenants) prontas que possuem dados próprios, ignorando o schema
+    público. Se `schema_name` for informado, restringe a busca a esse schema.
+    """
+    TenantModel = get_tenant_model()
+    tenants = TenantModel.objects.exclude(schema_name=get_public_schema_name()).filter(
+        status=TenantModel.Status.PRONTA
+    )
+    if schema_name:
+        tenants = tenants.filter(schema_name=schema_name)
+    return tenants.order_by("schema_name")
+
+
+def iter_tenants(schema_name=None):
+    """
+    Itera pelas empresas ativando o schema de cada uma durante a iteração.
+    Usado pelos workers (management commands) que processam filas por tenant.
+    """
+    for tenant in get_tenants(schema_name):
+        with tenant_context(tenant):
+            yield tenant
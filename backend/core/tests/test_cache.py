@@ -0,0 +1,56 @@
+"""
+Versão do cache por empresa (core/cache.py): criação com add() quando a versão não
+existe e cópia por thread fora de um request. Usa o LocMemCache dos testes.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core import cache as tenant_cache
+from core.cache import VERSION_KEY, invalidate_tenant, tenant_version
+
+
+class TenantVersionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        tenant_cache._local.versions = {}
+
+    def test_versao_ausente_e_gravada_com_timestamp(self):
+        antes = time.time_ns() // 1000
+        versao = tenant_version("public")
+        self.assertGreaterEqual(versao, antes)
+        self.assertEqual(cache.get(VERSION_KEY), versao)
+
+    def test_versao_perdida_nao_reativa_chaves_antigas(self):
+        cache.set("dashboard:teste", "antigo")
+        cache.delete(VERSION_KEY)
+        tenant_cache._local.versions = {}
+        self.assertIsNone(cache.get("dashboard:teste"))
+
+    @override_settings(CACHE_VERSION_LOCAL_TTL=60)
+    def test_versao_guardada_por_thread_fora_do_request(self):
+        versao = tenant_version("public")
+        cache.set(VERSION_KEY, versao + 10, None)
+        self.assertEqual(tenant_version("public"), versao)
+
+        # Outra thread ainda não guardou a versão: lê a atual
+        resultado = []
+        thread = threading.Thread(target=lambda: resultado.append(tenant_version("public")))
+        thread.start()
+        thread.join()
+        self.assertEqual(resultado, [versao + 10])
+
+    @override_settings(CACHE_VERSION_LOCAL_TTL=0)
+    def test_versao_relida_apos_o_prazo(self):
+        versao = tenant_version("public")
+        cache.set(VERSION_KEY, versao + 10, None)
+        self.assertEqual(tenant_version("public"), versao + 10)
+
+    @override_settings(CACHE_VERSION_LOCAL_TTL=60)
+    def test_invalidacao_vale_na_hora_para_a_propria_thread(self):
+        cache.set("dashboard:teste", "antigo")
+        versao = tenant_version("public")
+        self.assertGreater(invalidate_tenant(), versao)
+        self.assertIsNone(cache.get("dashboard:teste"))
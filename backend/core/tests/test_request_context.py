@@ -0,0 +1,153 @@
+"""
+Isolamento do contexto do request (core/request_context.py) entre requests
+simultâneos: threads (WSGI/gthread) e tarefas na mesma event loop (ASGI), inclusive
+código síncrono executado via sync_to_async. Não usa o banco.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from core import request_context
+from core.middleware import RequestContextMiddleware
+
+TOTAL = 24
+
+
+def _snapshot():
+    user = request_context.get_current_user()
+    tenant = request_context.get_current_tenant()
+    return {
+        "user": getattr(user, "pk", None),
+        "ip": request_context.get_current_ip(),
+        "tenant": getattr(tenant, "schema_name", None),
+        "request_id": request_context.get_request_id(),
+    }
+
+
+def _request(n):
+    request = RequestFactory().get(
+        "/api/teste/", REMOTE_ADDR=f"10.0.0.{n}", HTTP_X_REQUEST_ID=f"req-{n}"
+    )
+    # Definidos pelos middlewares de tenant e autenticação em um request real
+    request.user = SimpleNamespace(pk=n, is_authenticated=True)
+    request.tenant = SimpleNamespace(schema_name=f"empresa{n}")
+    return request
+
+
+def _json(response):
+    return json.loads(response.content)
+
+
+def _expected(n):
+    return {"user": n, "ip": f"10.0.0.{n}", "tenant": f"empresa{n}", "request_id": f"req-{n}"}
+
+
+class RequestContextThreadTests(SimpleTestCase):
+    def test_requests_simultaneos_em_threads_nao_se_misturam(self):
+        barreira = threading.Barrier(TOTAL)
+
+        def view(request):
+            antes = _snapshot()
+            # Todos os requests estão em andamento ao mesmo tempo neste ponto
+            barreira.wait(timeout=10)
+            time.sleep(0.01)
+            return JsonResponse({"antes": antes, "depois": _snapshot()})
+
+        middleware = RequestContextMiddleware(view)
+
+        def executar(n):
+            response = middleware(_request(n))
+            # Depois do request, a thread não guarda nada do contexto
+            return n, response, request_context.current()
+
+        with ThreadPoolExecutor(max_workers=TOTAL) as executor:
+            resultados = list(executor.map(executar, range(1, TOTAL + 1)))
+
+        for n, response, restante in resultados:
+            dados = _json(response)
+            self.assertEqual(dados["antes"], _expected(n))
+            self.assertEqual(dados["depois"], _expected(n))
+            self.assertEqual(response[request_context.REQUEST_ID_HEADER], f"req-{n}")
+            self.assertIsNone(restante)
+
+    def test_contexto_limpo_apos_excecao_na_view(self):
+        def view(request):
+            raise RuntimeError("falha")
+
+        with self.assertRaises(RuntimeError):
+            RequestContextMiddleware(view)(_request(1))
+        self.assertIsNone(request_context.current())
+        self.assertIsNone(request_context.get_current_user())
+
+    def test_request_id_invalido_e_substituido(self):
+        request = _request(1)
+        request.META["HTTP_X_REQUEST_ID"] = "id com espaço\n"
+        response = RequestContextMiddleware(lambda r: JsonResponse(_snapshot()))(request)
+        self.assertNotEqual(_json(response)["request_id"], "id com espaço\n")
+        self.assertEqual(response[request_context.REQUEST_ID_HEADER], _json(response)["request_id"])
+
+
+class RequestContextAsyncTests(SimpleTestCase):
+    async def test_requests_simultaneos_na_mesma_event_loop_nao_se_misturam(self):
+        @sync_to_async
+        def codigo_sincrono():
+            # Views síncronas no ASGI: todas rodam na mesma thread (thread_sensitive)
+            return _snapshot(), threading.get_ident()
+
+        async def view(request):
+            antes = _snapshot()
+            await asyncio.sleep(0.01)
+            sincrono, thread = await codigo_sincrono()
+            await asyncio.sleep(0)
+            return JsonResponse({"antes": antes, "sincrono": sincrono, "depois": _snapshot(), "thread": thread})
+
+        middleware = RequestContextMiddleware(view)
+
+        async def executar(n):
+            response = await middleware(_request(n))
+            return n, response, request_context.current()
+
+        resultados = await asyncio.gather(*(executar(n) for n in range(1, TOTAL + 1)))
+
+        threads = set()
+        for n, response, restante in resultados:
+            dados = _json(response)
+            self.assertEqual(dados["antes"], _expected(n))
+            self.assertEqual(dados["sincrono"], _expected(n))
+            self.assertEqual(dados["depois"], _expected(n))
+            self.assertEqual(response[request_context.REQUEST_ID_HEADER], f"req-{n}")
+            self.assertIsNone(restante)
+            threads.add(dados["thread"])
+        # Os requests compartilharam a mesma thread e ainda assim não se misturaram
+        self.assertEqual(len(threads), 1)
+        self.assertIsNone(request_context.current())
+
+    async def test_alteracoes_em_sync_to_async_continuam_visiveis_no_request(self):
+        @sync_to_async
+        def marcar():
+            request_context.current().audit_pending = ["registro"]
+
+        async def view(request):
+            await marcar()
+            return JsonResponse({"pendentes": request_context.current().audit_pending})
+
+        response = await RequestContextMiddleware(view)(_request(1))
+        self.assertEqual(_json(response), {"pendentes": ["registro"]})
+
+
+class UseContextTests(SimpleTestCase):
+    def test_use_context_restaura_o_contexto_anterior(self):
+        sistema = SimpleNamespace(pk=99, is_authenticated=True)
+        with request_context.use_context(user=sistema):
+            self.assertIs(request_context.get_current_user(), sistema)
+            with request_context.use_context(ip="127.0.0.1"):
+                self.assertIsNone(request_context.get_current_user())
+            self.assertIs(request_context.get_current_user(), sistema)
+        self.assertIsNone(request_context.current())
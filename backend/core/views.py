@@ -0,0 +1,21 @@
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.cache import cache_stats
+
+
+class IsSuperUser(BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.is_superuser)
+
+
+class CacheStatsView(APIView):
+    """
+    Acertos/falhas por namespace do cache (somados entre os workers via Redis) e a
+    quantidade de chaves por empresa e namespace. Apenas superusuários.
+    """
+    permission_classes = [IsSuperUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(cache_stats())
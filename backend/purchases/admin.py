@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Processo, Arquivo, LogUso, CRDII, StatusHistory
+from .models import Processo, Arquivo, LogUso, CRDII, StatusHistory, RemocaoArquivo
 
 @admin.register(CRDII)
 class CRDIIAdmin(admin.ModelAdmin):
@@ -32,3 +32,10 @@ class StatusHistoryAdmin(admin.ModelAdmin):
     list_filter = ('usuario', 'status_novo')
     search_fields = ('processo__nome',)
     readonly_fields = ('processo', 'usuario', 'status_anterior', 'status_novo', 'data_mudanca')
+
+@admin.register(RemocaoArquivo)
+class RemocaoArquivoAdmin(admin.ModelAdmin):
+    list_display = ('caminho', 'status', 'tentativas', 'data_criacao', 'data_processamento')
+    list_filter = ('status',)
+    search_fields = ('caminho',)
+    readonly_fields = ('caminho', 'tentativas', 'erro', 'data_criacao', 'data_processamento')
@@ -0,0 +1,335 @@
+"""
+Métricas do Dashboard.
+
+- compute_stats: métricas de uma empresa, calculadas no schema atual (usada pelo
+  DashboardStatsView).
+- cross_tenant_summary: as mesmas métricas para todas as empresas visíveis ao usuário,
+  calculadas em paralelo (um schema por thread, com limite de threads) e guardadas em
+  cache por empresa. Uma empresa lenta não atrasa as outras: se o cálculo passar de
+  DASHBOARD_TENANT_TIMEOUT ela volta como 'pendente' e o resultado fica no cache para
+  a próxima consulta.
+"""
+import hashlib
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Count, F, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from core import cache
+from core.request_context import get_user_permissions
+from . import storage_usage
+from .models import Processo, StatusHistory
+
+FILTER_PARAMS = ('year', 'month', 'crdii', 'tipo')
+
+
+def _sees_everything(user):
+    return user.is_superuser or user.role in ["dev"]
+
+
+def compute_stats(user, tenant, year=None, month=None, crdii=None, tipo=None):
+    """
+    Calcula as métricas do Dashboard no schema atual. Cada bloco é independente: um
+    erro em um deles é registrado e o bloco volta com o valor padrão.
+    """
+    # Inicializa variáveis com valores padrão seguros
+    stats = {
+        'total_processos': 0, 'concluidos': 0, 'em_andamento': 0,
+        'parcial': 0, 'arquivados': 0, 'cancelados': 0
+    }
+    tempo_medio_dias = 0
+    top_crdiis = []
+    stagnant_count = 0
+    top_users = []
+    recent_activity = []
+    chart_data = []
+    storage = {}
+
+    # 1. Preparação do QuerySet Base
+    qs = Processo.objects.all()
+
+    if not _sees_everything(user):
+        permissions_dict = get_user_permissions(user, tenant)
+        allowed_ids = permissions_dict.get('allowed_crdii', [])
+        qs = qs.filter(Q(crdii__id__in=allowed_ids) | Q(crdii__isnull=True))
+
+    if tipo:
+        qs = qs.filter(tipo=tipo)
+
+    if year:
+        qs = qs.filter(data_criacao__year=year)
+    if month:
+        qs = qs.filter(data_criacao__month=month)
+    if crdii:
+        qs = qs.filter(crdii__id=crdii)
+
+    # 2. Estatísticas Gerais (Counts)
+    try:
+        stats = qs.aggregate(
+            total_processos=Count('id'),
+            concluidos=Count('id', filter=Q(status='concluido')),
+            em_andamento=Count('id', filter=Q(status='nao_concluido')),
+            parcial=Count('id', filter=Q(status='parcial')),
+            arquivados=Count('id', filter=Q(status='arquivado')),
+            cancelados=Count('id', filter=Q(status='cancelado'))
+        )
+    except Exception:
+        print("Erro ao calcular stats gerais")
+        traceback.print_exc()
+
+    # 3. Tempo Médio
+    try:
+        avg_time_qs = qs.filter(
+            status=Processo.Status.CONCLUIDO,
+            data_concluido__isnull=False
+        )
+        avg_time = avg_time_qs.annotate(
+            duration=F('data_concluido') - F('data_criacao')
+        ).aggregate(media=Avg('duration'))['media']
+        tempo_medio_dias = avg_time.days if avg_time else 0
+    except Exception:
+        print("Erro ao calcular tempo médio")
+        traceback.print_exc()
+
+    # 4. Top 5 CRDIIs
+    try:
+        top_crdiis_qs = qs.values('crdii__nome').annotate(
+            total=Count('id')
+        ).order_by('-total')[:5]
+        top_crdiis = [
+            {'name': item['crdii__nome'] or 'Sem CRDII', 'total': item['total']}
+            for item in top_crdiis_qs
+        ]
+    except Exception:
+        print("Erro ao calcular top CRDIIs")
+        traceback.print_exc()
+
+    # 5. Processos Estagnados
+    try:
+        thirty_days_ago = timezone.now() - timedelta(days=30)
+        stagnant_qs = qs.filter(
+            Q(status=Processo.Status.NAO_CONCLUIDO, data_em_andamento__lt=thirty_days_ago) |
+            Q(status=Processo.Status.PARCIAL, data_parcial__lt=thirty_days_ago)
+        )
+        stagnant_count = stagnant_qs.count()
+    except Exception:
+        print("Erro ao calcular estagnados")
+        traceback.print_exc()
+
+    # 6. Top Usuários
+    try:
+        top_users_qs = qs.values('criado_por__username').annotate(
+            total=Count('id')
+        ).order_by('-total')[:5]
+        top_users = [
+            {'username': item['criado_por__username'] or 'Desconhecido', 'total': item['total']}
+            for item in top_users_qs
+        ]
+    except Exception:
+        print("Erro ao calcular top usuários")
+        traceback.print_exc()
+
+    # 7. Atividade Recente
+    try:
+        recent_qs = StatusHistory.objects.filter(processo__in=qs).select_related('usuario', 'processo').order_by('-data_mudanca')[:20]
+        recent_activity = [
+            {
+                'id': h.id,
+                'usuario': h.usuario.username if h.usuario else 'Sistema',
+                'processo': f"{h.processo.nome}",
+                'status_novo': h.get_status_novo_display(),
+                'data': h.data_mudanca
+            }
+            for h in recent_qs
+        ]
+    except Exception:
+        print("Erro ao calcular atividade recente")
+        traceback.print_exc()
+
+    # 8. Uso de disco da empresa (contadores incrementais, sem varrer o disco)
+    try:
+        storage = storage_usage.get_usage()
+        storage['cota'] = getattr(tenant, 'cota_armazenamento', None)
+    except Exception:
+        print("Erro ao calcular uso de disco")
+        traceback.print_exc()
+
+    # 9. Gráfico de Evolução
+    try:
+        if year:
+            evolution_qs = qs
+            label_format = "%b"
+        else:
+            evolution_qs = qs.filter(data_criacao__gte=timezone.now() - timedelta(days=365))
+            label_format = "%b/%Y"
+        evolution_data = (
+            evolution_qs.annotate(month=TruncMonth('data_criacao'))
+            .values('month')
+            .annotate(
+                criados=Count('id'),
+                concluidos=Count('id', filter=Q(status='concluido'))
+            )
+            .order_by('month')
+        )
+        chart_data = [
+            {
+                "name": item['month'].strftime(label_format) if item['month'] else "N/A",
+                "criados": item['criados'],
+                "concluidos": item['concluidos']
+            }
+            for item in evolution_data
+        ]
+    except Exception:
+        print("Erro ao calcular gráfico")
+        traceback.print_exc()
+
+    return {
+        'stats': stats,
+        'extra_stats': {
+            'tempo_medio_dias': tempo_medio_dias,
+            'top_crdiis': top_crdiis,
+            'stagnant_count': stagnant_count,
+            'top_users': top_users,
+            'recent_activity': recent_activity,
+            'storage': storage,
+        },
+        'chart_data': chart_data
+    }
+
+
+# --- Resumo entre empresas ---
+
+_executor = None
+_executor_lock = threading.Lock()
+# Cálculos em andamento por (schema, chave): consultas simultâneas reaproveitam o mesmo
+_inflight = {}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DASHBOARD_MAX_WORKERS, thread_name_prefix="dashboard"
+            )
+        return _executor
+
+
+def cache_key(user, filters):
+    # Superusuários enxergam a empresa inteira e compartilham a mesma entrada. A chave é
+    # prefixada com o schema da empresa pelo core.cache.
+    escopo = "todos" if _sees_everything(user) else f"u{user.pk}"
+    assinatura = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()[:12]
+    return f"dashboard:{escopo}:{assinatura}"
+
+
+def _compute_for_tenant(key, tenant, user, filters):
+    try:
+        with schema_context(tenant.schema_name):
+            dados = compute_stats(user, tenant, **filters)
+            resultado = {'dados': dados, 'calculado_em': timezone.now()}
+            cache.set(key, resultado, settings.DASHBOARD_CACHE_TIMEOUT)
+        return resultado
+    finally:
+        # Threads do pool não passam pelo request_finished: fecha a conexão aqui
+        connection.close()
+        with _executor_lock:
+            _inflight.pop((tenant.schema_name, key), None)
+
+
+def _submit(key, tenant, user, filters):
+    executor = _get_executor()
+    inflight_key = (tenant.schema_name, key)
+    with _executor_lock:
+        future = _inflight.get(inflight_key)
+        if future is None:
+            future = executor.submit(_compute_for_tenant, key, tenant, user, filters)
+            _inflight[inflight_key] = future
+        return future
+
+
+def visible_tenants(user):
+    """Empresas prontas do usuário em que ele pode ver o Dashboard."""
+    from core.tenant_utils import get_tenants
+    from users.models import UserPermission
+
+    tenants = get_tenants()
+    if _sees_everything(user):
+        return list(tenants)
+    candidatas = list(tenants.filter(users=user))
+    # Permissões resolvidas (perfil + ajustes do usuário), não os campos do registro
+    registros = {
+        perm.tenant_id: perm
+        for perm in UserPermission.objects.filter(
+            user=user, tenant__in=candidatas
+        ).annotate(profile_versao=F('profile__versao'))
+    }
+    return [
+        tenant for tenant in candidatas
+        if UserPermission.resolve_permissions(user, registros.get(tenant.pk)).get('page_dashboard')
+    ]
+
+
+def cross_tenant_summary(user, filters, refresh=False):
+    """
+    Métricas do Dashboard de cada empresa visível ao usuário e os totais somados.
+    `filters` aceita as chaves de FILTER_PARAMS. Com `refresh`, ignora o cache.
+    """
+    tenants = visible_tenants(user)
+
+    resultados = {}
+    pendentes = {}
+    key = cache_key(user, filters)
+    for tenant in tenants:
+        cached = None
+        if not refresh:
+            with schema_context(tenant.schema_name):
+                cached = cache.get(key)
+        if cached is not None:
+            resultados[tenant.pk] = {'status': 'ok', 'cache': True, **cached}
+        else:
+            pendentes[tenant.pk] = _submit(key, tenant, user, filters)
+
+    if pendentes:
+        wait(pendentes.values(), timeout=settings.DASHBOARD_TENANT_TIMEOUT)
+    for tenant_id, future in pendentes.items():
+        if not future.done():
+            # Continua em segundo plano; o resultado fica no cache
+            resultados[tenant_id] = {'status': 'pendente'}
+        elif future.exception() is not None:
+            erro = future.exception()
+            print(f"Erro ao calcular o Dashboard da empresa {tenant_id}: {erro}")
+            resultados[tenant_id] = {'status': 'erro', 'erro': str(erro)}
+        else:
+            resultados[tenant_id] = {'status': 'ok', 'cache': False, **future.result()}
+
+    empresas = []
+    totais = dict.fromkeys(
+        ('total_processos', 'concluidos', 'em_andamento', 'parcial', 'arquivados', 'cancelados',
+         'stagnant_count', 'storage_bytes'),
+        0,
+    )
+    for tenant in tenants:
+        resultado = resultados[tenant.pk]
+        empresas.append({'id': tenant.pk, 'nome': tenant.nome, 'schema_name': tenant.schema_name, **resultado})
+        if resultado['status'] != 'ok':
+            continue
+        dados = resultado['dados']
+        for campo, valor in dados['stats'].items():
+            totais[campo] += valor or 0
+        totais['stagnant_count'] += dados['extra_stats']['stagnant_count']
+        totais['storage_bytes'] += dados['extra_stats']['storage'].get('bytes', 0)
+
+    return {
+        'totais': totais,
+        'empresas': empresas,
+        'completo': all(r['status'] == 'ok' for r in resultados.values()),
+    }
@@ -0,0 +1,78 @@
+"""
+Remoção física de arquivos e limpeza de diretórios vazios, usada pelo worker
+'process_file_deletions'.
+"""
+import os
+
+from django.conf import settings
+
+
+def _media_root():
+    return os.path.abspath(settings.MEDIA_ROOT)
+
+
+def absolute_path(caminho):
+    """
+    Resolve o caminho relativo salvo no banco, recusando qualquer coisa fora do MEDIA_ROOT.
+    """
+    media_root = _media_root()
+    path = os.path.abspath(os.path.join(media_root, caminho))
+    if os.path.commonpath([media_root, path]) != media_root or path == media_root:
+        raise ValueError(f"Caminho fora do MEDIA_ROOT: {caminho}")
+    return path
+
+
+def remove_file(caminho):
+    """
+    Remove o arquivo físico. Um arquivo já inexistente é considerado removido.
+    Retorna o diretório onde o arquivo estava.
+    """
+    path = absolute_path(caminho)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return os.path.dirname(path)
+
+
+def tenant_root(schema_name):
+    """Pasta da empresa: MEDIA_ROOT/<schema>."""
+    return absolute_path(schema_name)
+
+
+def prune_directories(directories, schema_name):
+    """
+    Remove os diretórios vazios (e seus pais que ficarem vazios) até a pasta da empresa
+    (MEDIA_ROOT/<schema>), que nunca é removida; diretórios fora dela são ignorados.
+    Tenta cada diretório uma única vez mesmo que vários arquivos estivessem nele.
+    Retorna a lista de diretórios removidos.
+    """
+    root = tenant_root(schema_name)
+    pending = {os.path.abspath(d) for d in directories}
+    visited = set()
+    removed = []
+
+    while pending:
+        # Do mais profundo para o mais raso: os filhos precisam sair antes dos pais.
+        directory = max(pending, key=lambda d: d.count(os.sep))
+        pending.discard(directory)
+        visited.add(directory)
+
+        if directory == root or os.path.commonpath([root, directory]) != root:
+            continue
+        try:
+            # os.rmdir só remove se estiver vazio
+            os.rmdir(directory)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Diretório não está vazio: os pais também não estarão.
+            continue
+        else:
+            removed.append(directory)
+
+        parent = os.path.dirname(directory)
+        if parent not in visited:
+            pending.add(parent)
+
+    return removed
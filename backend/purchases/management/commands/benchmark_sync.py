@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from purchases.sync import DbSnapshot, DirCache, build_plan, scan_tree
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a varredura e a comparacao do sync_files em uma arvore sintetica '
+        '(TIPO/CRDII/PROCESSO/arquivo de uma empresa), sem acessar o banco de dados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=200000, help='Total de arquivos gerados.')
+        parser.add_argument('--files-per-processo', type=int, default=50)
+        parser.add_argument('--processos-per-crdii', type=int, default=100)
+        parser.add_argument('--novos', type=float, default=0.01, help='Fracao de arquivos ausentes do "banco".')
+        parser.add_argument('--path', help='Diretorio da arvore (padrao: temporario, removido ao final).')
+        parser.add_argument('--keep', action='store_true', help='Mantem a arvore gerada.')
+
+    def handle(self, *args, **options):
+        root = options['path'] or tempfile.mkdtemp(prefix='benchmark_sync_')
+        try:
+            inicio = time.monotonic()
+            self.build_tree(root, options)
+            self.stdout.write(f"Arvore com {options['files']} arquivos gerada em {time.monotonic() - inicio:.1f}s ({root}).")
+
+            cache = DirCache()
+            inicio = time.monotonic()
+            tree = scan_tree(root, 'benchmark/', cache)
+            tempo_scan = time.monotonic() - inicio
+            cache.commit()
+
+            # Segunda passada com o cache (modo --incremental) e uma pasta alterada
+            primeira = next(iter(tree.arquivos))
+            open(os.path.join(root, os.path.dirname(primeira).partition('/')[2], 'novo.pdf'), 'wb').close()
+            inicio = time.monotonic()
+            scan_tree(root, 'benchmark/', cache)
+            tempo_incremental = time.monotonic() - inicio
+
+            snapshot = self.build_snapshot(tree, options['novos'])
+
+            inicio = time.monotonic()
+            plan = build_plan(tree, snapshot, 'benchmark')
+            tempo_plano = time.monotonic() - inicio
+
+            processos = len(tree.processos)
+            crdiis = len(tree.crdiis)
+            self.stdout.write(
+                f"Varredura incremental: {tempo_incremental:.2f}s "
+                f"({cache.listados} pastas listadas, {cache.reaproveitados} reaproveitadas)."
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Varredura (os.scandir): {tempo_scan:.2f}s | plano (em memoria): {tempo_plano:.3f}s | "
+                f"{len(plan.criar['arquivos'])} arquivos a criar."
+            ))
+            # O loop antigo fazia um exists() por arquivo e um get_or_create por pasta
+            self.stdout.write(
+                f"Consultas por varredura: antes ~{len(tree.arquivos) + processos + crdiis + 3}, "
+                f"agora 4 leituras + lotes de escrita."
+            )
+        finally:
+            if not options['keep'] and not options['path']:
+                shutil.rmtree(root, ignore_errors=True)
+
+    def build_tree(self, root, options):
+        total = options['files']
+        por_processo = options['files_per_processo']
+        por_crdii = options['processos_per_crdii']
+        for i in range(total):
+            processo = i // por_processo
+            crdii = processo // por_crdii
+            pasta = os.path.join(root, "COMPRAS", f"CRDII {crdii}", f"P.{processo}")
+            if i % por_processo == 0:
+                os.makedirs(pasta, exist_ok=True)
+            with open(os.path.join(pasta, f"arquivo_{i}.pdf"), 'wb'):
+                pass
+
+    def build_snapshot(self, tree, fracao_novos):
+        """
+        Simula o estado do banco a partir da propria arvore, omitindo uma fracao dos arquivos.
+        """
+        crdiis = {key: (pk, key) for pk, key in enumerate(tree.crdiis, start=1)}
+        processos = {
+            (crdiis[crdii_key][0], processo_key): pk
+            for pk, (crdii_key, processo_key) in enumerate(tree.processos, start=1)
+        }
+        passo = int(1 / fracao_novos) if fracao_novos else 0
+        arquivos = {
+            caminho.lower(): (pk, processos[(crdiis[crdii_key][0], processo_key)], caminho)
+            for pk, (caminho, (crdii_key, processo_key, _, _)) in enumerate(tree.arquivos.items(), start=1)
+            if not passo or pk % passo
+        }
+        return DbSnapshot(crdiis, processos, arquivos)
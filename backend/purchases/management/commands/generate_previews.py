@@ -0,0 +1,55 @@
+import time
+from django.core.management.base import BaseCommand
+from core.tenant_utils import iter_tenants
+from purchases.models import Arquivo
+from purchases.previews import process_arquivo
+
+
+class Command(BaseCommand):
+    help = 'Gera miniaturas e previas (imagens e PDFs) para os arquivos pendentes de todas as empresas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Processa a fila uma vez e encerra.')
+        parser.add_argument('--interval', type=int, default=30, help='Segundos entre varreduras da fila.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Arquivos processados por lote.')
+        parser.add_argument('--schema', help='Processa apenas o schema informado.')
+        parser.add_argument('--retry-failed', action='store_true', help='Recoloca na fila os arquivos que falharam.')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Iniciando o worker de previas...")
+
+        if options['retry_failed']:
+            for tenant in iter_tenants(options['schema']):
+                reenfileirados = Arquivo.objects.filter(
+                    preview_status=Arquivo.PreviewStatus.FALHOU
+                ).update(preview_status=Arquivo.PreviewStatus.PENDENTE)
+                if reenfileirados:
+                    self.stdout.write(f"[{tenant.schema_name}] {reenfileirados} arquivos recolocados na fila.")
+
+        while True:
+            total = 0
+            for tenant in iter_tenants(options['schema']):
+                total += self.process_tenant(tenant, options['batch_size'])
+
+            if options['once']:
+                break
+            if not total:
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Worker de previas finalizado."))
+
+    def process_tenant(self, tenant, batch_size):
+        pendentes = list(
+            Arquivo.objects.filter(preview_status=Arquivo.PreviewStatus.PENDENTE)
+            .only('id', 'arquivo', 'content_hash')
+            .order_by('id')[:batch_size]
+        )
+        resultados = {}
+        for arquivo in pendentes:
+            status = process_arquivo(arquivo)
+            resultados[status] = resultados.get(status, 0) + 1
+
+        if pendentes:
+            resumo = ", ".join(f"{status}: {count}" for status, count in resultados.items())
+            self.stdout.write(f"[{time.ctime()}] [{tenant.schema_name}] {len(pendentes)} arquivos processados ({resumo}).")
+        return len(pendentes)
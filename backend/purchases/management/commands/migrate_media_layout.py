@@ -0,0 +1,135 @@
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.tenant_utils import iter_tenants
+from purchases.models import Arquivo
+from purchases.media_layout import LAYOUT_CHOICES, target_path
+from purchases.file_removal import absolute_path, prune_directories
+
+
+class Command(BaseCommand):
+    help = (
+        'Move os arquivos de uma empresa para outro layout de pastas (ver Empresa.media_layout) '
+        'e atualiza os caminhos no banco. Pode ser interrompido e executado novamente.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', required=True, choices=[c[0] for c in LAYOUT_CHOICES], help='Layout de destino.')
+        parser.add_argument('--schema', help='Migra apenas o schema informado.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas mostra o plano de movimentacao.')
+        parser.add_argument('--workers', type=int, default=8, help='Threads usadas para mover os arquivos.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Arquivos movidos e atualizados por lote.')
+        parser.add_argument('--show', type=int, default=20, help='Quantidade de movimentacoes exibidas no dry-run.')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers deve ser pelo menos 1.")
+
+        for tenant in iter_tenants(options['schema']):
+            inicio = time.monotonic()
+            if options['dry_run']:
+                self.report_plan(tenant, options)
+                continue
+
+            if tenant.media_layout != options['to']:
+                # Uploads novos já vão para o layout de destino enquanto os antigos são movidos
+                tenant.media_layout = options['to']
+                tenant.save(update_fields=['media_layout'])
+
+            movidos, falhas = self.migrate_tenant(tenant, options)
+            self.stdout.write(self.style.SUCCESS(
+                f"[{tenant.schema_name}] {movidos} arquivos movidos, {falhas} falhas "
+                f"em {time.monotonic() - inicio:.1f}s."
+            ))
+
+    def iter_plan(self, tenant, layout, batch_size):
+        """
+        Gera lotes de (arquivo, caminho_atual, caminho_destino) apenas para os arquivos
+        que ainda não estão no destino; por isso a migração é retomável.
+        """
+        ultimo_id = 0
+        while True:
+            lote = list(
+                Arquivo.objects.select_related('processo__crdii')
+                .filter(id__gt=ultimo_id).order_by('id')[:batch_size]
+            )
+            if not lote:
+                return
+            ultimo_id = lote[-1].id
+            plano = []
+            for arquivo in lote:
+                destino = target_path(layout, tenant.schema_name, arquivo)
+                if arquivo.arquivo.name != destino:
+                    plano.append((arquivo, arquivo.arquivo.name, destino))
+            if plano:
+                yield plano
+
+    def report_plan(self, tenant, options):
+        total = total_bytes = 0
+        for plano in self.iter_plan(tenant, options['to'], options['batch_size']):
+            for arquivo, origem, destino in plano:
+                if total < options['show']:
+                    self.stdout.write(f"  {origem} -> {destino}")
+                total += 1
+                total_bytes += arquivo.tamanho or 0
+        self.stdout.write(
+            f"[{tenant.schema_name}] Plano ({tenant.media_layout} -> {options['to']}): "
+            f"{total} arquivos, {total_bytes / 1024 ** 2:.1f} MB a mover."
+        )
+
+    def migrate_tenant(self, tenant, options):
+        movidos = falhas = 0
+        diretorios = set()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for plano in self.iter_plan(tenant, options['to'], options['batch_size']):
+                resultados = executor.map(
+                    lambda item: self.move_file(item[1], item[2], item[0].tamanho), plano
+                )
+
+                atualizados = []
+                for (arquivo, origem, _), (destino, erro) in zip(plano, resultados):
+                    if erro:
+                        falhas += 1
+                        self.stderr.write(f"  Falha ao mover {origem}: {erro}")
+                        continue
+                    arquivo.arquivo.name = destino
+                    atualizados.append(arquivo)
+                    diretorios.add(os.path.dirname(absolute_path(origem)))
+
+                with transaction.atomic():
+                    Arquivo.objects.bulk_update(atualizados, ['arquivo'])
+                movidos += len(atualizados)
+                self.stdout.write(f"[{tenant.schema_name}] {movidos} arquivos movidos...")
+
+        prune_directories(diretorios, tenant.schema_name)
+        return movidos, falhas
+
+    def move_file(self, origem, destino, tamanho=None):
+        """
+        Move um arquivo e retorna (caminho_final, erro). Executado nas threads do pool.
+        """
+        try:
+            origem_abs = absolute_path(origem)
+            destino_abs = absolute_path(destino)
+
+            if not os.path.exists(origem_abs):
+                if os.path.exists(destino_abs) and tamanho in (None, os.path.getsize(destino_abs)):
+                    # Já movido em uma execução anterior interrompida antes do update no banco
+                    return destino, None
+                return None, "arquivo de origem nao encontrado"
+
+            if os.path.exists(destino_abs):
+                # Nunca sobrescreve: gera um nome livre, como no upload
+                destino = default_storage.get_available_name(destino)
+                destino_abs = absolute_path(destino)
+
+            os.makedirs(os.path.dirname(destino_abs), exist_ok=True)
+            shutil.move(origem_abs, destino_abs)
+            return destino, None
+        except Exception as e:
+            return None, str(e)
@@ -0,0 +1,85 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.tenant_utils import iter_tenants
+from purchases.models import RemocaoArquivo
+from purchases.file_removal import remove_file, prune_directories
+
+
+class Command(BaseCommand):
+    help = 'Remove do disco os arquivos excluidos do banco e limpa os diretorios que ficarem vazios.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Processa a fila uma vez e encerra.')
+        parser.add_argument('--interval', type=int, default=30, help='Segundos entre varreduras da fila.')
+        parser.add_argument('--batch-size', type=int, default=200, help='Remocoes processadas por lote.')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Tentativas antes de marcar a remocao como falha.')
+        parser.add_argument('--keep-days', type=int, default=30, help='Dias que remocoes concluidas ficam registradas.')
+        parser.add_argument('--schema', help='Processa apenas o schema informado.')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Iniciando o worker de remocao de arquivos...")
+
+        while True:
+            total = 0
+            for tenant in iter_tenants(options['schema']):
+                total += self.process_tenant(tenant, options)
+
+            if options['once']:
+                break
+            if not total:
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Worker de remocao de arquivos finalizado."))
+
+    def process_tenant(self, tenant, options):
+        concluidos = falhas = 0
+
+        with transaction.atomic():
+            # skip_locked permite rodar mais de um worker sem processar o mesmo lote
+            jobs = list(
+                RemocaoArquivo.objects.select_for_update(skip_locked=True)
+                .filter(status=RemocaoArquivo.Status.PENDENTE)
+                .order_by('id')[:options['batch_size']]
+            )
+            if not jobs:
+                self.purge_old_jobs(options['keep_days'])
+                return 0
+
+            now = timezone.now()
+            directories = set()
+            for job in jobs:
+                job.tentativas += 1
+                job.data_processamento = now
+                try:
+                    directories.add(remove_file(job.caminho))
+                except Exception as e:
+                    job.erro = str(e)
+                    if job.tentativas >= options['max_attempts']:
+                        job.status = RemocaoArquivo.Status.FALHOU
+                    falhas += 1
+                else:
+                    job.status = RemocaoArquivo.Status.CONCLUIDO
+                    job.erro = ""
+                    concluidos += 1
+
+            RemocaoArquivo.objects.bulk_update(
+                jobs, ['status', 'tentativas', 'erro', 'data_processamento']
+            )
+
+        removidos = prune_directories(directories, tenant.schema_name)
+
+        self.stdout.write(
+            f"[{time.ctime()}] [{tenant.schema_name}] {concluidos} arquivos removidos, "
+            f"{falhas} falhas, {len(removidos)} diretorios vazios removidos."
+        )
+        # Falhas que ainda serão retentadas não contam, para o worker aguardar o intervalo.
+        return concluidos
+
+    def purge_old_jobs(self, keep_days):
+        limite = timezone.now() - timedelta(days=keep_days)
+        RemocaoArquivo.objects.filter(
+            status=RemocaoArquivo.Status.CONCLUIDO, data_processamento__lt=limite
+        ).delete()
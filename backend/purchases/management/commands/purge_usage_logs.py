@@ -0,0 +1,58 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.tenant_utils import iter_tenants
+from purchases.models import LogUso
+
+
+class Command(BaseCommand):
+    help = 'Remove os registros de uso (LogUso) mais antigos que o periodo de retencao, em lotes pequenos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Executa uma limpeza e encerra.')
+        parser.add_argument('--interval', type=int, default=86400, help='Segundos entre limpezas.')
+        parser.add_argument(
+            '--days', type=int, default=settings.LOG_USO_RETENTION_DAYS,
+            help='Dias que os registros ficam guardados.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Registros removidos por lote.')
+        parser.add_argument('--pause', type=float, default=0.1, help='Segundos de pausa entre lotes.')
+        parser.add_argument('--schema', help='Processa apenas o schema informado.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta os registros expirados.')
+
+    def handle(self, *args, **options):
+        while True:
+            limite = timezone.now() - timedelta(days=options['days'])
+            for tenant in iter_tenants(options['schema']):
+                if options['dry_run']:
+                    total = LogUso.objects.filter(data_hora__lt=limite).count()
+                    self.stdout.write(f"[{tenant.schema_name}] {total} registros seriam removidos.")
+                    continue
+                total = self.purge(limite, options['batch_size'], options['pause'])
+                if total:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"[{tenant.schema_name}] {total} registros anteriores a {limite:%d/%m/%Y} removidos."
+                    ))
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def purge(self, limite, batch_size, pause):
+        # Cada lote é um DELETE curto (autocommit) pelos ids mais antigos, usando o índice
+        # de data_hora: nenhuma transação longa segura bloqueios na tabela.
+        total = 0
+        while True:
+            ids = list(
+                LogUso.objects.filter(data_hora__lt=limite)
+                .order_by('data_hora', 'id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return total
+            LogUso.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            if pause:
+                time.sleep(pause)
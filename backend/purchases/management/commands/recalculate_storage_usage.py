@@ -0,0 +1,42 @@
+import os
+from django.core.management.base import BaseCommand
+from core.tenant_utils import iter_tenants
+from purchases.models import Arquivo
+from purchases import storage_usage
+
+
+class Command(BaseCommand):
+    help = 'Registra o tamanho dos arquivos sem tamanho e recalcula os contadores de uso de disco.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', help='Processa apenas o schema informado.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Arquivos atualizados por lote.')
+
+    def handle(self, *args, **options):
+        for tenant in iter_tenants(options['schema']):
+            atualizados = self.fill_missing_sizes(options['batch_size'])
+            total_bytes, total_arquivos = storage_usage.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f"[{tenant.schema_name}] {atualizados} tamanhos registrados; "
+                f"uso total: {total_bytes / 1024 ** 2:.1f} MB em {total_arquivos} arquivos."
+            ))
+
+    def fill_missing_sizes(self, batch_size):
+        atualizados = 0
+        ultimo_id = 0
+        while True:
+            lote = list(
+                Arquivo.objects.filter(tamanho__isnull=True, id__gt=ultimo_id)
+                .only('id', 'arquivo').order_by('id')[:batch_size]
+            )
+            if not lote:
+                return atualizados
+            for arquivo in lote:
+                try:
+                    arquivo.tamanho = os.path.getsize(arquivo.arquivo.path)
+                except OSError:
+                    # Arquivo ausente no disco: conta como zero (o sync_files remove o registro)
+                    arquivo.tamanho = 0
+            Arquivo.objects.bulk_update(lote, ['tamanho'])
+            atualizados += len(lote)
+            ultimo_id = lote[-1].id
@@ -1,14 +1,68 @@
-import os
+import json
+import sys
 import time
-from django.core.management.base import BaseCommand
+import traceback
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import connections
+from core.tenant_utils import get_tenants
 from users.models import CustomUser
-from purchases.models import Processo, CRDII, Arquivo
+from purchases.sync import DirtyDirs, init_worker, sync_tenant, watch
 
 class Command(BaseCommand):
-    help = 'Sincroniza arquivos e pastas do diretorio de midia com o banco de dados.'
+    help = (
+        'Sincroniza arquivos e pastas do diretorio de midia com o banco de dados, '
+        'empresa por empresa (MEDIA_ROOT/<schema>).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Executa uma unica varredura e sai.')
+        parser.add_argument('--interval', type=int, default=900, help='Segundos entre varreduras.')
+        parser.add_argument('--schema', help='Sincroniza apenas o schema informado.')
+        parser.add_argument(
+            '--parallel', type=int, default=1,
+            help='Quantidade de empresas sincronizadas ao mesmo tempo (processos separados).'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Registros criados/removidos por transacao.')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Lista novamente apenas os diretorios alterados desde a ultima varredura (ver SYNC_STATE_DIR).'
+        )
+        parser.add_argument(
+            '--full-interval', type=int, default=6 * 3600,
+            help='No modo incremental, segundos entre varreduras completas de seguranca.'
+        )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Reage a eventos do sistema de arquivos (inotify, requer watchdog). Implica --incremental.'
+        )
+        parser.add_argument('--debounce', type=float, default=2.0, help='Segundos aguardados apos um evento no modo --watch.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas calcula e exibe o plano, sem alterar o banco.')
+        parser.add_argument('--show', type=int, default=20, help='Itens de cada lista exibidos no dry-run.')
+        parser.add_argument('--json', metavar='ARQUIVO', help="Grava os planos em JSON ('-' para a saida padrao).")
+        parser.add_argument(
+            '--max-delete-fraction', type=float, default=0.1,
+            help='Recusa aplicar o plano de uma empresa que removeria mais que esta fracao de CRDIIs, processos ou arquivos.'
+        )
+        parser.add_argument(
+            '--min-delete', type=int, default=10,
+            help='Quantidade de exclusoes sempre permitida, independente da fracao.'
+        )
+        parser.add_argument('--force', action='store_true', help='Aplica o plano mesmo acima do limite de exclusoes.')
 
     def handle(self, *args, **options):
+        if options['parallel'] < 1:
+            raise CommandError("--parallel deve ser pelo menos 1.")
+        if options['dry_run'] and options['watch']:
+            raise CommandError("--dry-run nao pode ser usado com --watch.")
+        options['incremental'] = options['incremental'] or options['watch']
+        options['once'] = options['once'] or options['dry_run']
+        if options['json'] == '-':
+            # A saida padrao fica reservada para o JSON; o log vai para stderr
+            self.stdout = self.stderr
+
         self.stdout.write("Iniciando o servico de sincronizacao de arquivos...")
 
         try:
@@ -17,7 +71,7 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR(
                 "Usuario 'sistema' nao encontrado. Por favor, crie este usuario no Django Admin para continuar."
             ))
-            
+
             self.stdout.write("Criando usuario 'sistema' padrao...")
             system_user = CustomUser.objects.create_user(
                 username='sistema',
@@ -28,84 +82,119 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS("Usuario 'sistema' criado."))
 
 
-        media_root = settings.MEDIA_ROOT
-
-        while True:
-            self.stdout.write(f"[{time.ctime()}] Executando varredura...")
-            
-            # Conjuntos para rastrear itens encontrados no sistema de arquivos
-            crdiis_no_disco = set()
-            processos_no_disco = set() 
-            arquivos_no_disco = set()
-
-            for crdii_name in os.listdir(media_root):
-                crdii_path = os.path.join(media_root, crdii_name)
-                if os.path.isdir(crdii_path):
-                    crdii_obj, created = CRDII.objects.get_or_create(
-                        nome__iexact=crdii_name,
-                        defaults={'nome': crdii_name.upper()}
-                    )
-                    if created:
-                        self.stdout.write(self.style.SUCCESS(f"CRDII criado: {crdii_obj.nome}"))
-                    crdiis_no_disco.add(crdii_obj.nome)
-
-                    for processo_name in os.listdir(crdii_path):
-                        processo_path = os.path.join(crdii_path, processo_name)
-                        if os.path.isdir(processo_path):
-                            processo_obj, created = Processo.objects.get_or_create(
-                                nome__iexact=processo_name, # type: ignore
-                                crdii=crdii_obj,
-                                defaults={
-                                    'nome': processo_name.upper(),
-                                    'criado_por': system_user,
-                                    'status': Processo.Status.NAO_CONCLUIDO
-                                }
-                            )
-                            if created:
-                                self.stdout.write(self.style.SUCCESS(f"  Processo criado: {processo_obj.nome}")) # type: ignore
-                            processos_no_disco.add((crdii_obj.nome, processo_obj.nome))
-
-                            for file_name in os.listdir(processo_path):
-                                file_path = os.path.join(processo_path, file_name)
-                                if os.path.isfile(file_path):
-                                    relative_path = os.path.relpath(file_path, media_root)
-                                    arquivos_no_disco.add(relative_path)
-
-                                    # Verifica se o arquivo j├í existe no banco de dados (case-insensitive)
-                                    if not Arquivo.objects.filter(arquivo__iexact=relative_path).exists():
-                                        Arquivo.objects.create(
-                                            processo=processo_obj,
-                                            nome_original=file_name,
-                                            nome_atual=file_name,
-                                            arquivo=relative_path,
-                                            criado_por=system_user
-                                        )
-                                        self.stdout.write(self.style.SUCCESS(f"    Arquivo sincronizado: {file_name}"))
-
-            # 1. Limpa CRDIIs
-            crdiis_no_db = set(CRDII.objects.values_list('nome', flat=True))
-            crdiis_para_remover = crdiis_no_db - crdiis_no_disco
-            if crdiis_para_remover:
-                removidos, _ = CRDII.objects.filter(nome__in=crdiis_para_remover).delete()
-                self.stdout.write(self.style.WARNING(f"Removidos {removidos} CRDIIs orfaos do banco de dados."))
-
-            # 2. Limpa Processos 
-            processos_no_db = set(Processo.objects.select_related('crdii').values_list('crdii__nome', 'nome'))
-            processos_para_remover = processos_no_db - processos_no_disco
-            if processos_para_remover:
-                count = 0
-                for crdii_nome, processo_nome in processos_para_remover:
-                    deletados, _ = Processo.objects.filter(crdii__nome=crdii_nome, nome=processo_nome).delete()
-                    count += deletados
-                if count > 0:
-                    self.stdout.write(self.style.WARNING(f"Removidos {count} Processos orfaos do banco de dados."))
-
-            # 3. Limpa Arquivos orfaos
-            arquivos_no_db = set(Arquivo.objects.values_list('arquivo', flat=True))
-            arquivos_para_remover = arquivos_no_db - arquivos_no_disco
-            if arquivos_para_remover:
-                arquivos_removidos, _ = Arquivo.objects.filter(arquivo__in=arquivos_para_remover).delete()
-                self.stdout.write(self.style.WARNING(f"Removidos {arquivos_removidos} registros de arquivos orfao do banco de dados."))
-
-            self.stdout.write(f"[{time.ctime()}] Varredura concluida. Proxima execucao em 15 minutos.")
-            time.sleep(900) # 15 minutos
+        dirty = observer = None
+        if options['watch']:
+            dirty = DirtyDirs()
+            try:
+                observer = watch(settings.MEDIA_ROOT, dirty)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+        try:
+            while True:
+                # Eventos do watchdog agrupados por empresa: "<schema>/TIPO/..." -> "TIPO/..."
+                por_empresa = defaultdict(set)
+                if dirty is not None:
+                    for rel_dir in dirty.pop_all():
+                        schema, _, resto = rel_dir.partition('/')
+                        if schema:
+                            por_empresa[schema].add(resto)
+
+                self.run_pass(system_user.id, por_empresa, options)
+                if options['once']:
+                    break
+                if dirty is None:
+                    time.sleep(options['interval'])
+                elif dirty.event.wait(timeout=options['interval']):
+                    # Agrupa rajadas de eventos (ex: upload de varios arquivos) em uma passada
+                    time.sleep(options['debounce'])
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def run_pass(self, system_user_id, dirty, options):
+        inicio = time.monotonic()
+        schemas = list(get_tenants(options['schema']).values_list('schema_name', flat=True))
+        self.stdout.write(f"[{time.ctime()}] Executando varredura de {len(schemas)} empresa(s)...")
+
+        resultados = []
+        if options['parallel'] == 1 or len(schemas) == 1:
+            for schema in schemas:
+                try:
+                    resultados.append(sync_tenant(schema, system_user_id, options, dirty.get(schema, ())))
+                    self.report(resultados[-1], options)
+                except Exception:
+                    self.report_error(schema)
+        else:
+            # Os processos filhos nao podem herdar conexoes abertas
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['parallel'], initializer=init_worker) as executor:
+                futures = {
+                    schema: executor.submit(sync_tenant, schema, system_user_id, options, dirty.get(schema, ()))
+                    for schema in schemas
+                }
+                for schema, future in futures.items():
+                    try:
+                        resultados.append(future.result())
+                        self.report(resultados[-1], options)
+                    except Exception:
+                        self.report_error(schema)
+
+        if options['json']:
+            self.write_json([m['plano'] for m in resultados if 'plano' in m], options['json'])
+
+        self.stdout.write(f"[{time.ctime()}] Varredura concluida em {time.monotonic() - inicio:.1f}s.")
+
+    def report(self, m, options):
+        tipo = 'completa' if m['completa'] else 'incremental'
+        resumo = (
+            f"[{m['schema']}] {tipo}: {m['tempo_total']:.1f}s "
+            f"(disco {m['tempo_varredura']:.1f}s, banco {m['tempo_banco']:.1f}s), "
+            f"{m['arquivos_no_disco']} arquivos, {m['pastas_listadas']} pastas listadas, "
+            f"{m['pastas_reaproveitadas']} reaproveitadas"
+        )
+        if not m['alterado']:
+            self.stdout.write(f"{resumo}; nenhuma pasta alterada.")
+            return
+        self.stdout.write(resumo)
+        if 'recusado' in m:
+            self.stderr.write(self.style.ERROR(f"  Plano NAO aplicado: {m['recusado']}"))
+
+        verbo_criar = 'a sincronizar' if not m['aplicado'] else 'sincronizados'
+        verbo_remover = 'a remover' if not m['aplicado'] else 'removidos'
+        for entidade in ('crdiis', 'processos', 'arquivos'):
+            criados = m['resumo']['criar'][entidade]
+            removidos = m['resumo']['remover'][entidade]
+            existentes = m['resumo']['existentes'][entidade]
+            if criados:
+                self.stdout.write(self.style.SUCCESS(f"  {criados} {entidade} {verbo_criar}."))
+            if removidos:
+                self.stdout.write(self.style.WARNING(
+                    f"  {removidos} de {existentes} {entidade} orfaos {verbo_remover} do banco de dados."
+                ))
+
+        if options['dry_run']:
+            self.show_plan(m['plano'], options['show'])
+
+    def show_plan(self, plano, limite):
+        for acao, sinal in (('criar', '+'), ('remover', '-')):
+            for entidade, itens in plano[acao].items():
+                for item in itens[:limite]:
+                    descricao = item.get('caminho') or item.get('descricao') or item.get('nome')
+                    self.stdout.write(f"    {sinal} {entidade}: {descricao}")
+                if len(itens) > limite:
+                    self.stdout.write(f"    ... e mais {len(itens) - limite} {entidade}")
+
+    def write_json(self, planos, destino):
+        if destino == '-':
+            json.dump(planos, sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+            return
+        with open(destino, 'w', encoding='utf-8') as f:
+            json.dump(planos, f, ensure_ascii=False, indent=2)
+        self.stdout.write(f"Plano gravado em {destino}.")
+
+    def report_error(self, schema):
+        self.stderr.write(self.style.ERROR(f"[{schema}] Erro na sincronizacao:"))
+        self.stderr.write(traceback.format_exc())
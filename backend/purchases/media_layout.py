@@ -0,0 +1,44 @@
+"""
+Estratégias de organização dos arquivos dentro do MEDIA_ROOT, escolhidas por empresa
+(campo Empresa.media_layout):
+
+- nomes: empresa/TIPO/crdii_nome/processo_nome/arquivo (legado, legível no disco, mas
+  depende de nomes que podem mudar e cria diretórios enormes em processos grandes).
+- ids:   empresa/ids/<hash do processo>/<processo_id>/<hash do arquivo>/arquivo
+  (caminho estável, com fan-out de 256 diretórios por nível).
+"""
+import hashlib
+import os
+
+LAYOUT_NOMES = "nomes"
+LAYOUT_IDS = "ids"
+
+LAYOUT_CHOICES = [
+    (LAYOUT_NOMES, "Por nomes (TIPO/CRDII/Processo)"),
+    (LAYOUT_IDS, "Por IDs com fan-out"),
+]
+
+# Diretório raiz (dentro da pasta da empresa) dos arquivos no layout por IDs
+IDS_DIRNAME = "ids"
+
+# Pasta usada no layout por nomes para processos sem CRDII
+SEM_CRDII_DIRNAME = "sem-crdii"
+
+
+def _shard(value):
+    return hashlib.sha1(str(value).encode("utf-8")).hexdigest()[:2]
+
+
+def build_path(layout, tenant_name, processo, filename):
+    if layout == LAYOUT_IDS:
+        return f"{tenant_name}/{IDS_DIRNAME}/{_shard(processo.id)}/{processo.id}/{_shard(filename)}/{filename}"
+
+    crdii_nome = processo.crdii.nome if processo.crdii else SEM_CRDII_DIRNAME
+    return f"{tenant_name}/{processo.tipo}/{crdii_nome}/{processo.nome}/{filename}"
+
+
+def target_path(layout, tenant_name, arquivo):
+    """
+    Caminho de destino de um arquivo já salvo, mantendo o nome do arquivo em disco.
+    """
+    return build_path(layout, tenant_name, arquivo.processo, os.path.basename(arquivo.arquivo.name))
@@ -1,11 +1,10 @@
-from .request_utils import set_current_user
-
-
 class CurrentUserMiddleware:
+    """
+    Mantido por compatibilidade: o usuário atual agora vem do contexto do request
+    (core.middleware.RequestContextMiddleware), lido no momento do uso.
+    """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        set_current_user(request.user if request.user.is_authenticated else None)
-        response = self.get_response(request)
-        return response
+        return self.get_response(request)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("purchases", "0004_processo_tipo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="arquivo",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="arquivo",
+            name="preview_status",
+            field=models.CharField(
+                choices=[
+                    ("pendente", "Pendente"),
+                    ("pronto", "Pronto"),
+                    ("indisponivel", "Indisponível"),
+                    ("falhou", "Falhou"),
+                ],
+                db_index=True,
+                default="pendente",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("purchases", "0005_arquivo_previews"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RemocaoArquivo",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("caminho", models.CharField(max_length=500)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pendente", "Pendente"),
+                            ("concluido", "Concluído"),
+                            ("falhou", "Falhou"),
+                        ],
+                        default="pendente",
+                        max_length=16,
+                    ),
+                ),
+                ("tentativas", models.PositiveSmallIntegerField(default=0)),
+                ("erro", models.TextField(blank=True)),
+                ("data_criacao", models.DateTimeField(auto_now_add=True)),
+                ("data_processamento", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Remoção de Arquivo",
+                "verbose_name_plural": "Remoções de Arquivos",
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="purchases_r_status_05fd44_idx"
+                    )
+                ],
+            },
+        ),
+    ]
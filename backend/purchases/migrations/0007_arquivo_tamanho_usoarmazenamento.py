@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("purchases", "0006_remocaoarquivo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="arquivo",
+            name="tamanho",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="UsoArmazenamento",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "escopo",
+                    models.CharField(
+                        choices=[
+                            ("empresa", "Empresa"),
+                            ("crdii", "CRDII"),
+                            ("processo", "Processo"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("objeto_id", models.BigIntegerField(default=0)),
+                ("crdii_id", models.BigIntegerField(blank=True, null=True)),
+                ("bytes", models.BigIntegerField(default=0)),
+                ("arquivos", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Uso de Armazenamento",
+                "verbose_name_plural": "Usos de Armazenamento",
+                "unique_together": {("escopo", "objeto_id")},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("purchases", "0008_partition_statushistory"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loguso",
+            index=models.Index(fields=["-data_hora", "-id"], name="loguso_data_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loguso",
+            index=models.Index(
+                fields=["usuario", "-data_hora"], name="loguso_usuario_data_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loguso",
+            index=models.Index(
+                fields=["acao", "-data_hora"], name="loguso_acao_data_idx"
+            ),
+        ),
+    ]
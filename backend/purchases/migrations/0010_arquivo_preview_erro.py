@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("purchases", "0009_loguso_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="arquivo",
+            name="preview_erro",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
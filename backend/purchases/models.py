@@ -4,6 +4,9 @@ from django.utils.text import slugify
 from django.utils import timezone
 from django.db import connection
 
+from core.models import FieldTrackerMixin
+from . import media_layout
+
 
 def get_upload_path(instance, filename):
     # 1. Identifica a empresa atual (Tenant)
@@ -14,13 +17,11 @@ def get_upload_path(instance, filename):
         # Fallback caso esteja rodando fora do contexto de tenant (ex: shell público)
         tenant_name = "public"
 
-    # 2. Monta os nomes das subpastas
-    crdii_nome = instance.processo.crdii.nome if instance.processo.crdii else "sem-crdii"
-    processo_nome = instance.processo.nome
-    tipo_processo = instance.processo.tipo
-    
-    # 3. Retorna o caminho completo: empresa/TIPO/crdii/processo/arquivo
-    return f"{tenant_name}/{tipo_processo}/{crdii_nome}/{processo_nome}/{filename}"
+    # 2. Cada empresa escolhe o layout das pastas (ver purchases/media_layout.py)
+    layout = getattr(getattr(connection, "tenant", None), "media_layout", None) or media_layout.LAYOUT_NOMES
+
+    # 3. Retorna o caminho completo, ex: empresa/TIPO/crdii/processo/arquivo
+    return media_layout.build_path(layout, tenant_name, instance.processo, filename)
 
 
 class CRDII(models.Model):
@@ -36,7 +37,7 @@ class CRDII(models.Model):
         return self.nome
 
 
-class Processo(models.Model):
+class Processo(FieldTrackerMixin, models.Model):
     class Status(models.TextChoices):
         NAO_CONCLUIDO = "nao_concluido", "Em Andamento"
         CONCLUIDO = "concluido", "Concluído"
@@ -44,6 +45,9 @@ class Processo(models.Model):
         ARQUIVADO = "arquivado", "Arquivado"
         CANCELADO = "cancelado", "Cancelado"
 
+    # Comparados sem novo SELECT nos signals e na auditoria (ver FieldTrackerMixin)
+    tracked_fields = ("nome", "status", "tipo", "crdii")
+
     id = models.BigAutoField(primary_key=True)
 
     crdii = models.ForeignKey(
@@ -96,7 +100,15 @@ class Processo(models.Model):
         return f"{self.nome} ({self.id})"
 
 
-class Arquivo(models.Model):
+class Arquivo(FieldTrackerMixin, models.Model):
+    class PreviewStatus(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        PRONTO = "pronto", "Pronto"
+        INDISPONIVEL = "indisponivel", "Indisponível"
+        FALHOU = "falhou", "Falhou"
+
+    tracked_fields = ("nome_atual", "processo", "arquivo", "tamanho")
+
     id = models.BigAutoField(primary_key=True)
     processo = models.ForeignKey(
         Processo, on_delete=models.CASCADE, related_name="arquivos"
@@ -115,8 +127,21 @@ class Arquivo(models.Model):
         null=True,
     )
     arquivo = models.FileField(upload_to=get_upload_path)
+    # Tamanho em bytes, registrado no upload e no sync (base da contabilização de uso)
+    tamanho = models.BigIntegerField(null=True, blank=True)
     data_upload = models.DateTimeField(auto_now_add=True)
 
+    # Miniatura e prévia geradas em segundo plano (ver purchases/previews.py)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    preview_status = models.CharField(
+        max_length=16,
+        choices=PreviewStatus.choices,
+        default=PreviewStatus.PENDENTE,
+        db_index=True,
+    )
+    # Motivo da última falha (ou da prévia indisponível por falta do arquivo)
+    preview_erro = models.TextField(blank=True, default="")
+
     criado_por = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         related_name="arquivos_criados",
@@ -140,6 +165,14 @@ class LogUso(models.Model):
     detalhe = models.TextField(blank=True)
     data_hora = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Atendem a listagem paginada (/api/logs/), os filtros e a limpeza por data
+        indexes = [
+            models.Index(fields=['-data_hora', '-id'], name='loguso_data_idx'),
+            models.Index(fields=['usuario', '-data_hora'], name='loguso_usuario_data_idx'),
+            models.Index(fields=['acao', '-data_hora'], name='loguso_acao_data_idx'),
+        ]
+
     def __str__(self):
         return f"{self.usuario} - {self.acao}"
 
@@ -150,6 +183,7 @@ class LogUso(models.Model):
 
 
 class StatusHistory(models.Model):
+    # No PostgreSQL a tabela é particionada por mês em `data_mudanca` (ver core/partitioning.py)
     id = models.BigAutoField(primary_key=True)
     processo = models.ForeignKey(Processo, related_name='status_history', on_delete=models.CASCADE)
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
@@ -164,3 +198,62 @@ class StatusHistory(models.Model):
 
     def __str__(self):
         return f'Processo {self.processo.id}: {self.status_anterior} -> {self.status_novo}'
+
+
+class RemocaoArquivo(models.Model):
+    """
+    Fila de remoção física de arquivos. Os registros são criados após o commit da
+    exclusão de um Arquivo e processados pelo worker 'process_file_deletions'.
+    """
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        CONCLUIDO = "concluido", "Concluído"
+        FALHOU = "falhou", "Falhou"
+
+    id = models.BigAutoField(primary_key=True)
+    # Caminho relativo ao MEDIA_ROOT, o mesmo valor salvo em Arquivo.arquivo
+    caminho = models.CharField(max_length=500)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    erro = models.TextField(blank=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_processamento = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['status', 'id'])]
+        verbose_name = "Remoção de Arquivo"
+        verbose_name_plural = "Remoções de Arquivos"
+
+    def __str__(self):
+        return f"{self.caminho} ({self.status})"
+
+
+class UsoArmazenamento(models.Model):
+    """
+    Contadores de uso de disco, atualizados de forma incremental a cada criação e
+    exclusão de Arquivo (ver purchases/storage_usage.py). Existe uma linha para a
+    empresa (tenant), uma por CRDII e uma por processo.
+    """
+    class Escopo(models.TextChoices):
+        EMPRESA = "empresa", "Empresa"
+        CRDII = "crdii", "CRDII"
+        PROCESSO = "processo", "Processo"
+
+    id = models.BigAutoField(primary_key=True)
+    escopo = models.CharField(max_length=16, choices=Escopo.choices)
+    # ID do CRDII ou do processo; 0 para a empresa
+    objeto_id = models.BigIntegerField(default=0)
+    # Para linhas de processo: CRDII ao qual o processo pertence (permite descontar
+    # o uso do CRDII mesmo depois que o processo foi excluído)
+    crdii_id = models.BigIntegerField(null=True, blank=True)
+    bytes = models.BigIntegerField(default=0)
+    arquivos = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('escopo', 'objeto_id')
+        verbose_name = "Uso de Armazenamento"
+        verbose_name_plural = "Usos de Armazenamento"
+
+    def __str__(self):
+        return f"{self.escopo} {self.objeto_id}: {self.bytes} bytes"
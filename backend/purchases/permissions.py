@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission
-from users.models import UserPermission
+from core.request_context import get_user_permissions
 
 class HasPermission(BasePermission):
     """
@@ -17,7 +17,7 @@ class HasPermission(BasePermission):
             return True
 
         # Busca as permissões do usuário para este tenant
-        perms_dict = UserPermission.get_user_permissions_dict(request.user, request.tenant)
+        perms_dict = get_user_permissions(request.user, request.tenant)
         
         # Retorna o valor da permissão específica
         return perms_dict.get(self.codename, False)
@@ -31,5 +31,5 @@ class CanViewStatusHistory(BasePermission):
         if request.user.is_superuser or request.user.role == 'dev':
             return True
 
-        perms_dict = UserPermission.get_user_permissions_dict(request.user, request.tenant)
+        perms_dict = get_user_permissions(request.user, request.tenant)
         return perms_dict.get('view_status_history', False)
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Geração de miniaturas (PNG) e prévias web (JPEG) para os arquivos dos processos.
+
+Os derivados são gravados em PREVIEWS_ROOT usando o hash SHA-256 do conteúdo
+como chave, então arquivos idênticos (reenvios, cópias entre processos) são
+processados uma única vez. A geração roda fora do request, pelo worker
+'generate_previews'.
+"""
+import hashlib
+import os
+import traceback
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # O rasterizador de PDF é opcional; sem ele, PDFs ficam sem prévia.
+    pdfium = None
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+PDF_EXTENSIONS = {".pdf"}
+
+THUMBNAIL_NAME = "thumb.png"
+PREVIEW_NAME = "preview.jpg"
+
+# Resolução usada para rasterizar a primeira página do PDF (72 dpi * escala).
+PDF_RENDER_SCALE = 2
+
+
+def compute_content_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _relative_dir(content_hash):
+    # Dois níveis de fan-out evitam diretórios enormes no volume montado.
+    return os.path.join(content_hash[:2], content_hash)
+
+
+def derivative_paths(content_hash):
+    base = os.path.join(settings.PREVIEWS_ROOT, _relative_dir(content_hash))
+    return os.path.join(base, THUMBNAIL_NAME), os.path.join(base, PREVIEW_NAME)
+
+
+def derivative_urls(content_hash):
+    base = f"{settings.PREVIEWS_URL}{content_hash[:2]}/{content_hash}/"
+    return f"{base}{THUMBNAIL_NAME}", f"{base}{PREVIEW_NAME}"
+
+
+def is_supported(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return True
+    return extension in PDF_EXTENSIONS and pdfium is not None
+
+
+def render_first_page(path):
+    """
+    Retorna uma imagem PIL (RGB) da primeira página do arquivo.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        document = pdfium.PdfDocument(path)
+        try:
+            page = document[0]
+            image = page.render(scale=PDF_RENDER_SCALE).to_pil()
+            page.close()
+        finally:
+            document.close()
+    else:
+        with Image.open(path) as source:
+            source.seek(0)  # GIF/TIFF com vários quadros: usa o primeiro
+            image = ImageOps.exif_transpose(source)
+            image.load()
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def _save_atomic(image, destination, **save_kwargs):
+    # Grava em arquivo temporário e renomeia, para que o nginx nunca sirva um arquivo pela metade.
+    tmp_path = f"{destination}.tmp"
+    image.save(tmp_path, **save_kwargs)
+    os.replace(tmp_path, destination)
+
+
+def generate_derivatives(source_path, content_hash):
+    """
+    Gera miniatura e prévia para o conteúdo informado, reaproveitando o cache em disco.
+    """
+    thumb_path, preview_path = derivative_paths(content_hash)
+    if os.path.isfile(thumb_path) and os.path.isfile(preview_path):
+        return thumb_path, preview_path
+
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+    image = render_first_page(source_path)
+
+    preview = image.copy()
+    preview.thumbnail(settings.PREVIEW_WEB_SIZE, Image.Resampling.LANCZOS)
+    _save_atomic(preview, preview_path, format="JPEG", quality=82, optimize=True, progressive=True)
+
+    image.thumbnail(settings.PREVIEW_THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+    _save_atomic(image, thumb_path, format="PNG", optimize=True)
+
+    return thumb_path, preview_path
+
+
+def process_arquivo(arquivo):
+    """
+    Processa um Arquivo pendente e retorna o novo preview_status. O motivo de uma falha
+    fica em preview_erro (exibido na API e no admin), além do traceback no log do worker.
+    Atualiza o registro via queryset para não disparar signals de save.
+    """
+    from .models import Arquivo
+
+    status = Arquivo.PreviewStatus.INDISPONIVEL
+    erro = ""
+    content_hash = arquivo.content_hash
+
+    try:
+        path = arquivo.arquivo.path
+        if os.path.isfile(path):
+            if not content_hash:
+                content_hash = compute_content_hash(path)
+            if is_supported(path):
+                generate_derivatives(path, content_hash)
+                status = Arquivo.PreviewStatus.PRONTO
+        else:
+            erro = f"Arquivo não encontrado: {arquivo.arquivo.name}"
+    except Exception as e:
+        traceback.print_exc()
+        status = Arquivo.PreviewStatus.FALHOU
+        erro = f"{type(e).__name__}: {e}"
+
+    Arquivo.objects.filter(pk=arquivo.pk).update(
+        content_hash=content_hash,
+        preview_status=status,
+        preview_erro=erro,
+    )
+    return status
@@ -1,11 +1,13 @@
-import threading
-
-_thread_locals = threading.local()
+# Mantido por compatibilidade: o usuário atual vem de core.request_context
+from core import request_context
 
 
 def set_current_user(user):
-    _thread_locals.user = user
+    context = request_context.current()
+    if context is not None:
+        context.user_override = user
 
 
 def get_current_user():
-    return getattr(_thread_locals, "user", None)
+    user = request_context.get_current_user()
+    return user if user is not None and user.is_authenticated else None
@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from .models import Processo, Arquivo, LogUso, CRDII
 from .models import StatusHistory
+from .previews import derivative_urls
 
 
 class CRDIISerializer(serializers.ModelSerializer):
@@ -13,6 +14,8 @@ class CRDIISerializer(serializers.ModelSerializer):
 class ArquivoSerializer(serializers.ModelSerializer):
     criado_por = serializers.CharField(source="criado_por.username", read_only=True)
     arquivo_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Arquivo
@@ -24,9 +27,15 @@ class ArquivoSerializer(serializers.ModelSerializer):
             "document_type",
             "arquivo",
             "arquivo_url",
+            "tamanho",
+            "thumbnail_url",
+            "preview_url",
+            "preview_status",
+            "preview_erro",
             "data_upload",
             "criado_por",
         ]
+        read_only_fields = ["preview_status", "preview_erro", "tamanho"]
 
     def get_arquivo_url(self, obj):
         request = self.context.get("request")
@@ -34,11 +43,35 @@ class ArquivoSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.arquivo.url)
         return None
 
+    def get_thumbnail_url(self, obj):
+        # Enquanto a miniatura não fica pronta, o frontend mostra o ícone padrão.
+        request = self.context.get("request")
+        if obj.preview_status != Arquivo.PreviewStatus.PRONTO or not request:
+            return None
+        return request.build_absolute_uri(derivative_urls(obj.content_hash)[0])
+
+    def get_preview_url(self, obj):
+        # Enquanto a prévia é gerada, cai para o arquivo original.
+        request = self.context.get("request")
+        if obj.preview_status != Arquivo.PreviewStatus.PRONTO or not request:
+            return self.get_arquivo_url(obj)
+        return request.build_absolute_uri(derivative_urls(obj.content_hash)[1])
+
     def create(self, validated_data):
         user = self.context["request"].user
+        validated_data["tamanho"] = validated_data["arquivo"].size
         arquivo = Arquivo.objects.create(**validated_data, criado_por=user)
         return arquivo
 
+    def update(self, instance, validated_data):
+        if "arquivo" in validated_data:
+            # Conteúdo novo: a prévia antiga não vale mais.
+            # (os contadores de uso são ajustados no post_save, ver signals.py)
+            instance.content_hash = ""
+            instance.preview_status = Arquivo.PreviewStatus.PENDENTE
+            validated_data["tamanho"] = validated_data["arquivo"].size
+        return super().update(instance, validated_data)
+
 
 class ProcessoSerializer(serializers.ModelSerializer):
     arquivos = ArquivoSerializer(many=True, read_only=True)
@@ -2,8 +2,9 @@ from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils.text import slugify
 from django.utils import timezone
-from .models import Processo, CRDII, StatusHistory, Arquivo
-import os
+from core.buffers import OnCommitBuffer
+from .models import Processo, CRDII, StatusHistory, Arquivo, RemocaoArquivo
+from . import storage_usage
 
 @receiver(pre_save, sender=CRDII)
 def pre_save_crdii(sender, instance, **kwargs):
@@ -37,18 +38,11 @@ def pre_save_processo(sender, instance, **kwargs):
         instance.slug = base_slug
 
     # 3. Gerenciamento de Datas por Status
+    # O valor anterior vem do snapshot feito ao carregar o objeto (FieldTrackerMixin),
+    # sem um novo SELECT a cada save.
     is_new = instance._state.adding
-    status_changed = False
-    
-    if not is_new:
-        try:
-            old_instance = Processo.objects.get(pk=instance.pk)
-            if instance.status != old_instance.status:
-                status_changed = True
-        except Processo.DoesNotExist:
-            # Caso raro onde o objeto está marcado como não novo mas não existe no banco
-            pass
-    
+    status_changed = not is_new and instance.has_changed('status')
+
     # Atualiza a data correspondente se for um novo processo ou se o status mudou
     if is_new or status_changed:
         now = timezone.now()
@@ -73,31 +67,43 @@ def pre_save_processo(sender, instance, **kwargs):
         instance.data_em_andamento = instance.data_criacao or timezone.now()
 
 
+@receiver(post_save, sender=Processo)
+def post_save_processo(sender, instance, created, **kwargs):
+    # Processo movido de CRDII: transfere o uso de disco
+    if not created and instance.tracker_loaded and instance.has_changed('crdii'):
+        storage_usage.move_processo(instance.pk, instance.old_value('crdii'), instance.crdii_id)
+
+
+@receiver(post_save, sender=Arquivo)
+def post_save_arquivo(sender, instance, created, **kwargs):
+    # Uploads em lote (bulk_create) chamam storage_usage.record_created diretamente.
+    if created:
+        storage_usage.record_created([instance])
+        return
+
+    # Conteúdo trocado ou arquivo movido de processo: atualiza os contadores de uso
+    if instance.tracker_loaded and {'processo', 'tamanho'} & set(instance.changed_fields()):
+        antes = Arquivo(processo_id=instance.old_value('processo'), tamanho=instance.old_value('tamanho'))
+        storage_usage.record_deleted([antes])
+        storage_usage.record_created([instance])
+
+
+def _enqueue_file_removals(caminhos):
+    RemocaoArquivo.objects.bulk_create([RemocaoArquivo(caminho=caminho) for caminho in caminhos])
+
+
+# Exclusões em cascata (ex: um processo com centenas de arquivos) geram um único
+# INSERT na fila, feito apenas se a transação for confirmada.
+file_removal_buffer = OnCommitBuffer("file_removal", _enqueue_file_removals)
+
+
 @receiver(post_delete, sender=Arquivo)
 def auto_delete_file_on_delete(sender, instance, **kwargs):
     """
-    Deleta o arquivo físico quando o registro no banco é excluído.
-    Também remove diretórios vazios recursivamente.
+    Agenda a remoção do arquivo físico quando o registro no banco é excluído.
+    A remoção (e a limpeza de diretórios vazios) é feita pelo worker
+    'process_file_deletions', fora do request.
     """
+    storage_usage.record_deleted([instance])
     if instance.arquivo:
-        try:
-            if os.path.isfile(instance.arquivo.path):
-                os.remove(instance.arquivo.path)
-                
-                # Tentar remover diretórios vazios
-                directory = os.path.dirname(instance.arquivo.path)
-                
-                # Vamos tentar subir até 3 níveis (Processo -> CRDII -> Tenant)
-                # Ou parar quando encontrar um diretório não vazio
-                for _ in range(3): 
-                    try:
-                        # os.rmdir só remove se estiver vazio
-                        os.rmdir(directory)
-                        # Se funcionou, sobe um nível para tentar remover o pai
-                        directory = os.path.dirname(directory)
-                    except OSError:
-                        # Diretório não está vazio ou outro erro, para a recursão
-                        break
-        except Exception as e:
-            # Log de erro silencioso para não quebrar a transação do banco
-            print(f"Erro ao deletar arquivo físico: {e}")
+        file_removal_buffer.add(instance.arquivo.name)
@@ -0,0 +1,173 @@
+"""
+Contabilização incremental de uso de disco por empresa, CRDII e processo.
+
+Criações e exclusões de Arquivo geram deltas (processo_id, bytes, arquivos) que são
+acumulados durante a transação e aplicados no commit com poucos UPDATEs
+(um por empresa/CRDII/processo afetado), em vez de varrer o disco com `du`.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+
+from core.buffers import OnCommitBuffer
+from .models import Arquivo, Processo, UsoArmazenamento
+
+Escopo = UsoArmazenamento.Escopo
+EMPRESA_ID = 0
+
+
+def _apply_deltas(deltas):
+    """
+    Aplica os deltas acumulados. Cada item é (processo_id, bytes, arquivos).
+    """
+    por_processo = defaultdict(lambda: [0, 0])
+    for processo_id, size, count in deltas:
+        por_processo[processo_id][0] += size
+        por_processo[processo_id][1] += count
+
+    processo_ids = list(por_processo)
+    # O CRDII vem da própria linha de contadores do processo (que sobrevive à exclusão
+    # do processo) ou, para processos ainda sem contadores, da tabela de processos.
+    crdii_por_processo = dict(
+        UsoArmazenamento.objects.filter(escopo=Escopo.PROCESSO, objeto_id__in=processo_ids)
+        .values_list('objeto_id', 'crdii_id')
+    )
+    faltantes = [pid for pid in processo_ids if pid not in crdii_por_processo]
+    if faltantes:
+        crdii_por_processo.update(
+            Processo.objects.filter(id__in=faltantes).values_list('id', 'crdii_id')
+        )
+
+    totais = defaultdict(lambda: [0, 0])
+    parents = {}
+    for processo_id, (size, count) in por_processo.items():
+        crdii_id = crdii_por_processo.get(processo_id)
+        chaves = [(Escopo.EMPRESA, EMPRESA_ID), (Escopo.PROCESSO, processo_id)]
+        if crdii_id:
+            chaves.append((Escopo.CRDII, crdii_id))
+        parents[processo_id] = crdii_id
+        for chave in chaves:
+            totais[chave][0] += size
+            totais[chave][1] += count
+
+    with transaction.atomic():
+        UsoArmazenamento.objects.bulk_create(
+            [
+                UsoArmazenamento(
+                    escopo=escopo,
+                    objeto_id=objeto_id,
+                    crdii_id=parents.get(objeto_id) if escopo == Escopo.PROCESSO else None,
+                )
+                for escopo, objeto_id in totais
+            ],
+            ignore_conflicts=True,
+        )
+        for (escopo, objeto_id), (size, count) in totais.items():
+            if size or count:
+                UsoArmazenamento.objects.filter(escopo=escopo, objeto_id=objeto_id).update(
+                    bytes=F('bytes') + size, arquivos=F('arquivos') + count
+                )
+        # Processos excluídos deixam de ter arquivos: remove as linhas zeradas
+        UsoArmazenamento.objects.filter(
+            escopo=Escopo.PROCESSO, objeto_id__in=processo_ids, arquivos__lte=0
+        ).exclude(objeto_id__in=Processo.objects.filter(id__in=processo_ids).values('id')).delete()
+
+
+usage_buffer = OnCommitBuffer("storage_usage", _apply_deltas)
+
+
+def record_created(arquivos):
+    for arquivo in arquivos:
+        usage_buffer.add((arquivo.processo_id, arquivo.tamanho or 0, 1))
+
+
+def record_deleted(arquivos):
+    for arquivo in arquivos:
+        usage_buffer.add((arquivo.processo_id, -(arquivo.tamanho or 0), -1))
+
+
+def move_processo(processo_id, crdii_anterior_id, crdii_novo_id):
+    """
+    Transfere o uso de um processo entre CRDIIs quando ele é movido.
+    """
+    uso = UsoArmazenamento.objects.filter(escopo=Escopo.PROCESSO, objeto_id=processo_id).first()
+    if uso is None:
+        return
+    with transaction.atomic():
+        if crdii_anterior_id:
+            UsoArmazenamento.objects.filter(escopo=Escopo.CRDII, objeto_id=crdii_anterior_id).update(
+                bytes=F('bytes') - uso.bytes, arquivos=F('arquivos') - uso.arquivos
+            )
+        if crdii_novo_id:
+            UsoArmazenamento.objects.get_or_create(escopo=Escopo.CRDII, objeto_id=crdii_novo_id)
+            UsoArmazenamento.objects.filter(escopo=Escopo.CRDII, objeto_id=crdii_novo_id).update(
+                bytes=F('bytes') + uso.bytes, arquivos=F('arquivos') + uso.arquivos
+            )
+        UsoArmazenamento.objects.filter(pk=uso.pk).update(crdii_id=crdii_novo_id)
+
+
+def get_usage(escopo=Escopo.EMPRESA, objeto_id=EMPRESA_ID):
+    uso = UsoArmazenamento.objects.filter(escopo=escopo, objeto_id=objeto_id).first()
+    return {'bytes': uso.bytes if uso else 0, 'arquivos': uso.arquivos if uso else 0}
+
+
+def check_quota(request):
+    """
+    Verificação barata de cota, feita antes de ler o corpo da requisição (nenhum byte
+    do upload é gravado). Usa o Content-Length como estimativa do tamanho enviado.
+    Retorna uma mensagem de erro ou None.
+    """
+    tenant = getattr(connection, 'tenant', None)
+    cota = getattr(tenant, 'cota_armazenamento', None)
+    if not cota:
+        return None
+
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+
+    usado = get_usage()['bytes']
+    if usado + content_length > cota:
+        return (
+            f"Cota de armazenamento da empresa excedida "
+            f"({usado / 1024 ** 2:.1f} MB usados de {cota / 1024 ** 2:.1f} MB)."
+        )
+    return None
+
+
+def rebuild():
+    """
+    Recalcula todos os contadores a partir da tabela de arquivos (usado na carga
+    inicial e como verificação periódica de consistência).
+    """
+    linhas = (
+        Arquivo.objects.values('processo_id', 'processo__crdii_id')
+        .annotate(total=Sum('tamanho'), quantidade=Count('id'))
+    )
+    totais = defaultdict(lambda: [0, 0])
+    parents = {}
+    for linha in linhas:
+        size, count = linha['total'] or 0, linha['quantidade']
+        chaves = [(Escopo.EMPRESA, EMPRESA_ID), (Escopo.PROCESSO, linha['processo_id'])]
+        if linha['processo__crdii_id']:
+            chaves.append((Escopo.CRDII, linha['processo__crdii_id']))
+        parents[linha['processo_id']] = linha['processo__crdii_id']
+        for chave in chaves:
+            totais[chave][0] += size
+            totais[chave][1] += count
+
+    with transaction.atomic():
+        UsoArmazenamento.objects.all().delete()
+        UsoArmazenamento.objects.bulk_create([
+            UsoArmazenamento(
+                escopo=escopo,
+                objeto_id=objeto_id,
+                crdii_id=parents.get(objeto_id) if escopo == Escopo.PROCESSO else None,
+                bytes=size,
+                arquivos=count,
+            )
+            for (escopo, objeto_id), (size, count) in totais.items()
+        ])
+    return totais.get((Escopo.EMPRESA, EMPRESA_ID), [0, 0])
@@ -0,0 +1,583 @@
+"""
+Reconciliação entre o diretório de mídia e o banco, usada pelo comando 'sync_files'.
+
+Cada empresa tem sua pasta dentro do MEDIA_ROOT (MEDIA_ROOT/<schema>), com a estrutura
+gerada por media_layout.build_path:
+
+- TIPO/CRDII/PROCESSO/arquivo (layout por nomes; "sem-crdii" para processos sem CRDII);
+- CRDII/PROCESSO/arquivo (pastas legadas, anteriores ao nível do TIPO, tratadas como COMPRAS);
+- ids/... (layout por IDs: os caminhos são gerenciados pelo sistema, a varredura apenas
+  confirma que os arquivos continuam no disco).
+
+Em vez de consultar o banco para cada pasta e arquivo encontrados, o estado do banco
+é carregado uma única vez (DbSnapshot), a árvore é percorrida com os.scandir
+(DiskTree) e a diferença entre os dois é aplicada com bulk_create e exclusões em lote.
+
+No modo incremental, o DirCache guarda a impressão digital de cada diretório e só as
+pastas alteradas desde a última passada são listadas novamente.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from django_tenants.utils import schema_context
+
+from .models import Arquivo, CRDII, Processo, RemocaoArquivo
+from . import storage_usage
+from .media_layout import IDS_DIRNAME, SEM_CRDII_DIRNAME
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Opcional: sem o watchdog, o modo --watch fica indisponível.
+    FileSystemEventHandler = object
+    Observer = None
+
+
+TIPOS = {tipo for tipo, _ in Processo._meta.get_field('tipo').choices}
+TIPO_PADRAO = Processo._meta.get_field('tipo').default
+
+
+def _key(nome):
+    # Nomes de CRDII e processo são comparados sem diferenciar maiúsculas (como o nome__iexact antigo)
+    return nome.upper()
+
+
+def _crdii_key(nome):
+    return None if nome.lower() == SEM_CRDII_DIRNAME else _key(nome)
+
+
+class DiskTree:
+    """
+    Estrutura encontrada na pasta de uma empresa. Os caminhos dos arquivos são relativos
+    ao MEDIA_ROOT (começam pelo `prefix`, a pasta da empresa), como em Arquivo.arquivo.
+    """
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.crdiis = {}        # chave do CRDII -> nome da pasta
+        self.processos = {}     # (chave do CRDII ou None, chave do processo) -> (nome da pasta, tipo)
+        self.arquivos = {}      # caminho -> (chave do CRDII, chave do processo, nome do arquivo, tamanho)
+        self.arquivos_ids = {}  # caminho -> tamanho (layout por IDs)
+
+    def add_processo(self, crdii_nome, processo_nome, tipo):
+        crdii_key, processo_key = _crdii_key(crdii_nome), _key(processo_nome)
+        if crdii_key is not None:
+            self.crdiis.setdefault(crdii_key, crdii_nome)
+        self.processos.setdefault((crdii_key, processo_key), (processo_nome, tipo))
+        return crdii_key, processo_key
+
+
+class DirCache:
+    """
+    Impressões digitais (mtime, tamanho) dos diretórios já listados e o conteúdo de cada um,
+    persistidas entre execuções. Um diretório só é listado de novo quando a impressão muda
+    (criar, remover ou renomear uma entrada altera o mtime da pasta que a contém); os
+    demais são apenas consultados com stat e o conteúdo anterior é reaproveitado.
+    """
+    VERSION = 1
+
+    def __init__(self, dirs=None, ultima_completa=0):
+        self.dirs = dirs or {}
+        self.ultima_completa = ultima_completa
+        self.novos = {}
+        self.listados = 0
+        self.reaproveitados = 0
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get('version') != cls.VERSION:
+            return cls()
+        return cls(data.get('dirs'), data.get('ultima_completa', 0))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'ultima_completa': self.ultima_completa, 'dirs': self.dirs}, f)
+        os.replace(tmp_path, path)
+
+    def start(self):
+        self.novos = {}
+        self.listados = self.reaproveitados = 0
+
+    def invalidate(self, rel_paths):
+        for rel_path in rel_paths:
+            self.dirs.pop(rel_path, None)
+
+    def list_dir(self, abs_path, rel_path):
+        """
+        Retorna (subpastas, [(arquivo, tamanho), ...]) do diretório.
+        """
+        try:
+            # O stat vem antes da listagem: uma alteração entre os dois é vista na próxima passada
+            st = os.stat(abs_path)
+        except FileNotFoundError:
+            return [], []
+        fingerprint = [st.st_mtime_ns, st.st_size]
+        entry = self.dirs.get(rel_path)
+        if entry and entry['fp'] == fingerprint:
+            self.reaproveitados += 1
+        else:
+            self.listados += 1
+            entry = {'fp': fingerprint, 'dirs': [], 'files': []}
+            with os.scandir(abs_path) as entries:
+                for e in entries:
+                    if e.is_dir(follow_symlinks=False):
+                        # Pastas ocultas (ex: .previews) sao geradas pelo sistema
+                        if not e.name.startswith('.'):
+                            entry['dirs'].append(e.name)
+                    elif e.is_file(follow_symlinks=False):
+                        entry['files'].append([e.name, e.stat(follow_symlinks=False).st_size])
+        self.novos[rel_path] = entry
+        return entry['dirs'], entry['files']
+
+    @property
+    def changed(self):
+        return bool(self.listados) or self.novos.keys() != self.dirs.keys()
+
+    def commit(self):
+        self.dirs, self.novos = self.novos, {}
+
+
+def _scan_crdii(tree, cache, root, rel_dir, crdii_nome, tipo):
+    processo_dirs, _ = cache.list_dir(os.path.join(root, rel_dir), rel_dir)
+    for processo_nome in processo_dirs:
+        processo_rel = f"{rel_dir}/{processo_nome}"
+        crdii_key, processo_key = tree.add_processo(crdii_nome, processo_nome, tipo)
+        _, files = cache.list_dir(os.path.join(root, processo_rel), processo_rel)
+        for file_name, size in files:
+            tree.arquivos[f"{tree.prefix}{processo_rel}/{file_name}"] = (crdii_key, processo_key, file_name, size)
+
+
+def _scan_ids(tree, cache, root, rel_dir, depth=0):
+    # ids/<hash>/<processo_id>/<hash>/arquivo
+    dirs, files = cache.list_dir(os.path.join(root, rel_dir), rel_dir)
+    if depth == 3:
+        for file_name, size in files:
+            tree.arquivos_ids[f"{tree.prefix}{rel_dir}/{file_name}"] = size
+        return
+    for nome in dirs:
+        _scan_ids(tree, cache, root, f"{rel_dir}/{nome}", depth + 1)
+
+
+def scan_tree(root, prefix='', cache=None):
+    """
+    Percorre a pasta de uma empresa (`root`). Sem cache, todos os diretórios são listados.
+    As chaves do cache são relativas a `root`.
+    """
+    cache = cache if cache is not None else DirCache()
+    cache.start()
+    tree = DiskTree(prefix)
+    top_dirs, _ = cache.list_dir(root, '')
+    for nome in top_dirs:
+        if nome == IDS_DIRNAME:
+            _scan_ids(tree, cache, root, nome)
+        elif nome.upper() in TIPOS:
+            crdii_dirs, _ = cache.list_dir(os.path.join(root, nome), nome)
+            for crdii_nome in crdii_dirs:
+                _scan_crdii(tree, cache, root, f"{nome}/{crdii_nome}", crdii_nome, nome.upper())
+        else:
+            # Pasta legada, sem o nível do TIPO
+            _scan_crdii(tree, cache, root, nome, nome, TIPO_PADRAO)
+    return tree
+
+
+def watch(media_root, dirty):
+    """
+    Observa o MEDIA_ROOT (inotify em discos locais) e registra em `dirty` os diretórios
+    alterados. Volumes de rede (rclone) geralmente não geram eventos: nesses casos vale
+    apenas a varredura incremental periódica.
+    """
+    if Observer is None:
+        raise RuntimeError("O modo --watch requer o pacote 'watchdog'.")
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            for path in (event.src_path, getattr(event, 'dest_path', '')):
+                if not path:
+                    continue
+                rel_path = os.path.relpath(os.fsdecode(path), media_root).replace(os.sep, '/')
+                if rel_path == '.':
+                    dirty.add('')
+                    continue
+                partes = rel_path.split('/')
+                # Fora do MEDIA_ROOT ou dentro de pastas ocultas (.previews)
+                if partes[0] == '..' or any(p.startswith('.') for p in partes):
+                    continue
+                dirty.add('/'.join(partes[:-1]))
+                if event.is_directory:
+                    dirty.add(rel_path)
+
+    observer = Observer()
+    observer.schedule(Handler(), str(media_root), recursive=True)
+    observer.start()
+    return observer
+
+
+class DirtyDirs:
+    """
+    Conjunto de diretórios alterados, compartilhado com a thread do watchdog.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs = set()
+        self.event = threading.Event()
+
+    def add(self, rel_dir):
+        with self._lock:
+            self._dirs.add(rel_dir)
+        self.event.set()
+
+    def pop_all(self):
+        with self._lock:
+            dirs, self._dirs = self._dirs, set()
+        self.event.clear()
+        return dirs
+
+
+class DbSnapshot:
+    """
+    Estado do banco carregado com poucas consultas, indexado para comparação em memória.
+    """
+
+    def __init__(self, crdiis, processos, arquivos, slugs=(), remocoes_pendentes=()):
+        self.crdiis = crdiis            # chave do CRDII -> (id, nome)
+        self.processos = processos      # (id do CRDII ou None, chave do processo) -> id
+        self.arquivos = arquivos        # caminho em minúsculas -> (id, id do processo, caminho)
+        self.slugs = set(slugs)
+        self.remocoes_pendentes = {c.lower() for c in remocoes_pendentes}
+
+    @classmethod
+    def load(cls):
+        crdiis = {_key(nome): (pk, nome) for pk, nome in CRDII.objects.values_list('id', 'nome')}
+        processos = {}
+        slugs = []
+        for pk, crdii_id, nome, slug in Processo.objects.values_list('id', 'crdii_id', 'nome', 'slug').iterator(chunk_size=5000):
+            processos[(crdii_id, _key(nome))] = pk
+            slugs.append(slug)
+        arquivos = {
+            caminho.lower(): (pk, processo_id, caminho)
+            for pk, processo_id, caminho in Arquivo.objects.values_list('id', 'processo_id', 'arquivo').iterator(chunk_size=5000)
+        }
+        remocoes = RemocaoArquivo.objects.filter(
+            status=RemocaoArquivo.Status.PENDENTE
+        ).values_list('caminho', flat=True)
+        return cls(crdiis, processos, arquivos, slugs, remocoes)
+
+
+class DeletionLimitExceeded(Exception):
+    pass
+
+
+class SyncPlan:
+    """
+    Alterações necessárias para o banco refletir o disco, calculadas sem acessar o banco.
+    Pode ser exibido (dry-run), serializado em JSON e aplicado separadamente (apply_plan).
+    """
+    ENTIDADES = ('crdiis', 'processos', 'arquivos')
+
+    def __init__(self, schema=''):
+        self.schema = schema
+        # crdiis: nome da pasta | processos: (chave do CRDII ou None, nome da pasta, tipo)
+        # arquivos: (chave do CRDII, chave do processo, nome do arquivo, caminho, tamanho)
+        self.criar = {entidade: [] for entidade in self.ENTIDADES}
+        # (id, descrição) de cada registro a remover
+        self.remover = {entidade: [] for entidade in self.ENTIDADES}
+        # Registros existentes no banco, base para a fração de exclusões
+        self.existentes = {entidade: 0 for entidade in self.ENTIDADES}
+
+    @property
+    def vazio(self):
+        return not any(self.criar.values()) and not any(self.remover.values())
+
+    def resumo(self):
+        return {
+            'criar': {entidade: len(itens) for entidade, itens in self.criar.items()},
+            'remover': {entidade: len(itens) for entidade, itens in self.remover.items()},
+            'existentes': dict(self.existentes),
+        }
+
+    def check_deletions(self, max_fraction, min_count=0):
+        """
+        Lança DeletionLimitExceeded se alguma entidade perderia mais que `max_fraction` dos
+        seus registros (ex: volume rclone desmontado). Até `min_count` exclusões são sempre
+        permitidas, para que empresas pequenas não fiquem bloqueadas.
+        """
+        for entidade in self.ENTIDADES:
+            remover, existentes = len(self.remover[entidade]), self.existentes[entidade]
+            if remover > min_count and remover > max_fraction * existentes:
+                raise DeletionLimitExceeded(
+                    f"{remover} de {existentes} {entidade} seriam removidos "
+                    f"(limite {max_fraction:.0%}). Use --force para aplicar mesmo assim."
+                )
+
+    def to_dict(self):
+        return {
+            'schema': self.schema,
+            'resumo': self.resumo(),
+            'criar': {
+                'crdiis': [{'nome': nome} for nome in self.criar['crdiis']],
+                'processos': [
+                    {'crdii': crdii_key, 'nome': nome, 'tipo': tipo}
+                    for crdii_key, nome, tipo in self.criar['processos']
+                ],
+                'arquivos': [
+                    {'caminho': caminho, 'tamanho': size}
+                    for _, _, _, caminho, size in self.criar['arquivos']
+                ],
+            },
+            'remover': {
+                entidade: [{'id': pk, 'descricao': descricao} for pk, descricao in itens]
+                for entidade, itens in self.remover.items()
+            },
+        }
+
+
+def build_plan(tree, snapshot, schema=''):
+    """
+    Compara disco e banco sem acessar o banco.
+
+    Apenas registros de arquivos dentro da pasta varrida (tree.prefix) são removidos.
+    Processos e CRDIIs só são removidos quando perderam todos os seus arquivos: os
+    criados pelo sistema ainda não têm pasta até o primeiro upload (e no layout por IDs
+    nunca têm pasta com o nome), e não devem ser apagados por isso.
+
+    Diferença intencional em relação ao sync_files original, que apagava todo processo
+    ou CRDII sem pasta com o mesmo nome: processos sem nenhum arquivo no banco e CRDIIs
+    sem processos removidos são mantidos.
+    """
+    plan = SyncPlan(schema)
+    prefix = tree.prefix.lower()
+
+    # Arquivos
+    caminhos_no_disco = {caminho.lower() for caminho in tree.arquivos_ids}
+    for caminho, (crdii_key, processo_key, file_name, size) in tree.arquivos.items():
+        caminho_lower = caminho.lower()
+        if caminho_lower in snapshot.remocoes_pendentes:
+            # Excluído do banco, aguardando o worker de remoção: não deve ser recriado
+            continue
+        caminhos_no_disco.add(caminho_lower)
+        if caminho_lower not in snapshot.arquivos:
+            plan.criar['arquivos'].append((crdii_key, processo_key, file_name, caminho, size))
+
+    com_arquivos = set()
+    mantidos = set()  # processos com ao menos um arquivo que continua existindo
+    for caminho_lower, (pk, processo_id, caminho) in snapshot.arquivos.items():
+        com_arquivos.add(processo_id)
+        if not caminho_lower.startswith(prefix):
+            mantidos.add(processo_id)
+            continue
+        plan.existentes['arquivos'] += 1
+        if caminho_lower in caminhos_no_disco:
+            mantidos.add(processo_id)
+        else:
+            plan.remover['arquivos'].append((pk, caminho))
+
+    # CRDIIs novos
+    plan.criar['crdiis'] = [nome for key, nome in tree.crdiis.items() if key not in snapshot.crdiis]
+
+    # Processos
+    processos_no_disco = set()
+    for (crdii_key, processo_key), (nome, tipo) in tree.processos.items():
+        if crdii_key is not None and crdii_key not in snapshot.crdiis:
+            plan.criar['processos'].append((crdii_key, nome, tipo))
+            continue
+        crdii_id = snapshot.crdiis[crdii_key][0] if crdii_key is not None else None
+        processos_no_disco.add((crdii_id, processo_key))
+        if (crdii_id, processo_key) not in snapshot.processos:
+            plan.criar['processos'].append((crdii_key, nome, tipo))
+
+    processos_por_crdii = defaultdict(int)
+    removidos_por_crdii = defaultdict(int)
+    for (crdii_id, processo_key), pk in snapshot.processos.items():
+        processos_por_crdii[crdii_id] += 1
+        if (crdii_id, processo_key) in processos_no_disco:
+            continue
+        if pk in com_arquivos and pk not in mantidos:
+            plan.remover['processos'].append((pk, processo_key))
+            removidos_por_crdii[crdii_id] += 1
+    plan.existentes['processos'] = len(snapshot.processos)
+
+    # CRDIIs sem pasta cujos processos foram todos removidos
+    plan.remover['crdiis'] = [
+        (pk, nome) for key, (pk, nome) in snapshot.crdiis.items()
+        if key not in tree.crdiis and removidos_por_crdii[pk] and removidos_por_crdii[pk] == processos_por_crdii[pk]
+    ]
+    plan.existentes['crdiis'] = len(snapshot.crdiis)
+
+    return plan
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _unique_slug(base, slugs):
+    slug, n = base, 2
+    while slug in slugs:
+        slug = f"{base}-{n}"
+        n += 1
+    slugs.add(slug)
+    return slug
+
+
+def apply_plan(plan, snapshot, system_user_id, batch_size=1000, max_delete_fraction=None, min_delete=0):
+    """
+    Aplica o plano em lotes, cada um em sua própria transação.
+    Com `max_delete_fraction`, nada é aplicado se o plano remover registros demais.
+    Retorna a quantidade de registros criados/removidos por entidade.
+    """
+    if max_delete_fraction is not None:
+        plan.check_deletions(max_delete_fraction, min_delete)
+
+    # 1. Exclusões (dos filhos para os pais, pois Processo protege o CRDII)
+    for model, entidade in ((Arquivo, 'arquivos'), (Processo, 'processos'), (CRDII, 'crdiis')):
+        ids = [pk for pk, _ in plan.remover[entidade]]
+        for chunk in _chunks(ids, batch_size):
+            with transaction.atomic():
+                model.objects.filter(id__in=chunk).delete()
+
+    # 2. CRDIIs novos (bulk_create não dispara o pre_save: nome e slug são montados aqui)
+    crdiis = dict(snapshot.crdiis)
+    crdiis[None] = (None, None)
+    novos = [CRDII(nome=nome.upper(), slug=slugify(nome.lower())) for nome in plan.criar['crdiis']]
+    for chunk in _chunks(novos, batch_size):
+        with transaction.atomic():
+            for crdii in CRDII.objects.bulk_create(chunk):
+                crdiis[_key(crdii.nome)] = (crdii.pk, crdii.nome)
+
+    # 3. Processos novos
+    processos = dict(snapshot.processos)
+    slugs = set(snapshot.slugs)
+    now = timezone.now()
+    novos = []
+    for crdii_key, nome, tipo in plan.criar['processos']:
+        crdii_id, crdii_nome = crdiis[crdii_key]
+        nome = nome.upper()
+        novos.append(Processo(
+            crdii_id=crdii_id,
+            nome=nome,
+            slug=_unique_slug(slugify(f"{crdii_nome} {nome}" if crdii_nome else nome), slugs),
+            tipo=tipo,
+            criado_por_id=system_user_id,
+            status=Processo.Status.NAO_CONCLUIDO,
+            data_em_andamento=now,
+        ))
+    for chunk in _chunks(novos, batch_size):
+        with transaction.atomic():
+            for processo in Processo.objects.bulk_create(chunk):
+                processos[(processo.crdii_id, _key(processo.nome))] = processo.pk
+
+    # 4. Arquivos novos
+    novos = []
+    for crdii_key, processo_key, file_name, caminho, size in plan.criar['arquivos']:
+        crdii_id = crdiis[crdii_key][0]
+        novos.append(Arquivo(
+            processo_id=processos[(crdii_id, processo_key)],
+            nome_original=file_name,
+            nome_atual=file_name,
+            arquivo=caminho,
+            tamanho=size,
+            criado_por_id=system_user_id,
+        ))
+    for chunk in _chunks(novos, batch_size):
+        with transaction.atomic():
+            storage_usage.record_created(Arquivo.objects.bulk_create(chunk))
+
+    resultado = {}
+    for entidade in plan.ENTIDADES:
+        resultado[f'{entidade}_criados'] = len(plan.criar[entidade])
+        resultado[f'{entidade}_removidos'] = len(plan.remover[entidade])
+    return resultado
+
+
+def state_path(schema_name):
+    return os.path.join(settings.SYNC_STATE_DIR, f"{schema_name}.json")
+
+
+def init_worker():
+    # Processos do pool iniciados com 'spawn' precisam configurar o Django
+    django.setup()
+
+
+def sync_tenant(schema_name, system_user_id, options, dirty=()):
+    """
+    Sincroniza a pasta de uma empresa (MEDIA_ROOT/<schema>) com o seu schema.
+    Executado no processo principal ou em um processo do pool; retorna as métricas da passada
+    (e o plano serializado, se `options['dry_run']` ou `options['json']`).
+    `dirty` são diretórios (relativos à pasta da empresa) alterados segundo o watchdog.
+    """
+    inicio = time.monotonic()
+    root = os.path.join(settings.MEDIA_ROOT, schema_name)
+    path = state_path(schema_name)
+    incremental = options['incremental'] and not options['dry_run']
+
+    cache = DirCache.load(path) if incremental else DirCache()
+    completa = not incremental or time.time() - cache.ultima_completa >= options['full_interval']
+    if completa:
+        # Na varredura completa todos os diretórios são listados (o cache é refeito)
+        cache = DirCache()
+    else:
+        cache.invalidate(dirty)
+
+    tree = scan_tree(root, f"{schema_name}/", cache)
+    metricas = {
+        'schema': schema_name,
+        'completa': completa,
+        'arquivos_no_disco': len(tree.arquivos) + len(tree.arquivos_ids),
+        'pastas_listadas': cache.listados,
+        'pastas_reaproveitadas': cache.reaproveitados,
+        'tempo_varredura': time.monotonic() - inicio,
+        'tempo_banco': 0.0,
+        'alterado': completa or cache.changed,
+        'aplicado': False,
+    }
+    if not metricas['alterado']:
+        metricas['tempo_total'] = time.monotonic() - inicio
+        return metricas
+
+    with schema_context(schema_name):
+        etapa = time.monotonic()
+        snapshot = DbSnapshot.load()
+        plan = build_plan(tree, snapshot, schema_name)
+        metricas['resumo'] = plan.resumo()
+        if options['dry_run'] or options['json']:
+            metricas['plano'] = plan.to_dict()
+        if not options['dry_run']:
+            try:
+                apply_plan(
+                    plan, snapshot, system_user_id,
+                    batch_size=options['batch_size'],
+                    max_delete_fraction=None if options['force'] else options['max_delete_fraction'],
+                    min_delete=options['min_delete'],
+                )
+                metricas['aplicado'] = True
+            except DeletionLimitExceeded as e:
+                metricas['recusado'] = str(e)
+        metricas['tempo_banco'] = time.monotonic() - etapa
+
+    if incremental and metricas['aplicado']:
+        # O estado só é gravado depois de aplicado: se algo falhar (ou o plano for recusado),
+        # a próxima passada lista tudo de novo
+        cache.commit()
+        if completa:
+            cache.ultima_completa = time.time()
+        cache.save(path)
+
+    metricas['tempo_total'] = time.monotonic() - inicio
+    return metricas
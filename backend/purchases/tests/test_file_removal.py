@@ -0,0 +1,49 @@
+"""
+Limpeza de diretórios vazios do process_file_deletions (purchases/file_removal.py) num
+MEDIA_ROOT temporário. Não usa o banco.
+"""
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from purchases.file_removal import prune_directories
+
+
+class PruneDirectoriesTests(SimpleTestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.media_root = temp.name
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _makedirs(self, *partes):
+        path = os.path.join(self.media_root, *partes)
+        os.makedirs(path)
+        return path
+
+    def test_para_na_pasta_da_empresa(self):
+        processo = self._makedirs("empresa1", "processos", "Obra A", "P1")
+
+        removidos = prune_directories([processo], "empresa1")
+
+        self.assertEqual(len(removidos), 3)
+        self.assertTrue(os.path.isdir(os.path.join(self.media_root, "empresa1")))
+        self.assertTrue(os.path.isdir(self.media_root))
+
+    def test_nao_remove_diretorios_de_outra_empresa(self):
+        outra = self._makedirs("empresa2", "processos")
+
+        self.assertEqual(prune_directories([outra], "empresa1"), [])
+        self.assertTrue(os.path.isdir(outra))
+
+    def test_mantem_diretorios_com_arquivos(self):
+        obra = self._makedirs("empresa1", "processos", "Obra A")
+        processo = self._makedirs("empresa1", "processos", "Obra A", "P1")
+        with open(os.path.join(obra, "outro.pdf"), "w"):
+            pass
+
+        self.assertEqual(prune_directories([processo], "empresa1"), [processo])
+        self.assertTrue(os.path.isdir(obra))
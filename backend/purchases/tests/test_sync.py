@@ -0,0 +1,175 @@
+"""
+Cálculo do plano do sync_files (purchases/sync.py) sem banco: DiskTree e DbSnapshot
+montados em memória.
+"""
+from django.test import SimpleTestCase
+
+from purchases.sync import (
+    DbSnapshot,
+    DeletionLimitExceeded,
+    DiskTree,
+    SyncPlan,
+    TIPO_PADRAO,
+    build_plan,
+)
+
+PREFIX = "empresa/"
+
+
+def _tree(*arquivos, crdii="Obra A", processo="P1", tipo=TIPO_PADRAO):
+    """Árvore com um processo e os arquivos indicados (nomes de arquivo)."""
+    tree = DiskTree(PREFIX)
+    crdii_key, processo_key = tree.add_processo(crdii, processo, tipo)
+    for nome in arquivos:
+        caminho = f"{PREFIX}{tipo}/{crdii}/{processo}/{nome}"
+        tree.arquivos[caminho] = (crdii_key, processo_key, nome, 10)
+    return tree
+
+
+def _snapshot(crdiis=0, processos_por_crdii=1, arquivos_por_processo=1, extra_arquivos=(), **kwargs):
+    """
+    Banco com `crdiis` CRDIIs ("C0", "C1", ...), cada um com processos ("P0", ...) e
+    arquivos dentro da pasta da empresa.
+    """
+    snap_crdiis, snap_processos, snap_arquivos = {}, {}, {}
+    processo_id = arquivo_id = 0
+    for c in range(crdiis):
+        nome = f"C{c}"
+        snap_crdiis[nome] = (c + 1, nome)
+        for p in range(processos_por_crdii):
+            processo_id += 1
+            snap_processos[(c + 1, f"P{p}")] = processo_id
+            for a in range(arquivos_por_processo):
+                arquivo_id += 1
+                caminho = f"{PREFIX}{TIPO_PADRAO}/{nome}/P{p}/arquivo{a}.pdf"
+                snap_arquivos[caminho.lower()] = (arquivo_id, processo_id, caminho)
+    for caminho, processo in extra_arquivos:
+        arquivo_id += 1
+        snap_arquivos[caminho.lower()] = (arquivo_id, processo, caminho)
+    return DbSnapshot(snap_crdiis, snap_processos, snap_arquivos, **kwargs)
+
+
+class BuildPlanCreateTests(SimpleTestCase):
+    def test_banco_vazio_cria_crdii_processo_e_arquivos(self):
+        plan = build_plan(_tree("a.pdf", "b.pdf"), _snapshot(), "empresa")
+
+        self.assertEqual(plan.criar["crdiis"], ["Obra A"])
+        self.assertEqual(plan.criar["processos"], [("OBRA A", "P1", TIPO_PADRAO)])
+        self.assertEqual(
+            sorted(caminho for *_, caminho, _ in plan.criar["arquivos"]),
+            [f"{PREFIX}{TIPO_PADRAO}/Obra A/P1/a.pdf", f"{PREFIX}{TIPO_PADRAO}/Obra A/P1/b.pdf"],
+        )
+        self.assertFalse(any(plan.remover.values()))
+
+    def test_crdii_existente_cria_apenas_processo_e_arquivo(self):
+        plan = build_plan(_tree("a.pdf", crdii="c0", processo="NOVO"), _snapshot(crdiis=1), "empresa")
+
+        # Nomes comparados sem diferenciar maiúsculas
+        self.assertEqual(plan.criar["crdiis"], [])
+        self.assertEqual(plan.criar["processos"], [("C0", "NOVO", TIPO_PADRAO)])
+        self.assertEqual(len(plan.criar["arquivos"]), 1)
+
+    def test_processo_sem_crdii(self):
+        plan = build_plan(_tree("a.pdf", crdii="sem-crdii"), _snapshot(), "empresa")
+
+        self.assertEqual(plan.criar["crdiis"], [])
+        self.assertEqual(plan.criar["processos"], [(None, "P1", TIPO_PADRAO)])
+
+    def test_disco_igual_ao_banco_nao_gera_alteracoes(self):
+        tree = _tree("arquivo0.pdf", crdii="C0", processo="P0")
+        plan = build_plan(tree, _snapshot(crdiis=1), "empresa")
+
+        self.assertTrue(plan.vazio)
+        self.assertEqual(plan.existentes, {"crdiis": 1, "processos": 1, "arquivos": 1})
+
+    def test_remocao_pendente_nao_e_recriada(self):
+        caminho = f"{PREFIX}{TIPO_PADRAO}/Obra A/P1/a.pdf"
+        plan = build_plan(_tree("a.pdf"), _snapshot(remocoes_pendentes=[caminho.upper()]), "empresa")
+
+        self.assertEqual(plan.criar["arquivos"], [])
+
+
+class BuildPlanDeleteTests(SimpleTestCase):
+    def test_remove_arquivo_processo_e_crdii_sem_pasta(self):
+        plan = build_plan(DiskTree(PREFIX), _snapshot(crdiis=1, arquivos_por_processo=2), "empresa")
+
+        self.assertEqual(len(plan.remover["arquivos"]), 2)
+        self.assertEqual(plan.remover["processos"], [(1, "P0")])
+        self.assertEqual(plan.remover["crdiis"], [(1, "C0")])
+
+    def test_arquivo_ausente_com_outros_no_disco_remove_apenas_o_arquivo(self):
+        tree = _tree("arquivo0.pdf", crdii="C0", processo="P0")
+        plan = build_plan(tree, _snapshot(crdiis=1, arquivos_por_processo=2), "empresa")
+
+        self.assertEqual([caminho for _, caminho in plan.remover["arquivos"]], [f"{PREFIX}{TIPO_PADRAO}/C0/P0/arquivo1.pdf"])
+        self.assertEqual(plan.remover["processos"], [])
+        self.assertEqual(plan.remover["crdiis"], [])
+
+    def test_processo_sem_arquivos_no_banco_nao_e_removido(self):
+        # Criado pelo sistema e ainda sem upload: não tem pasta, mas não deve ser apagado
+        plan = build_plan(DiskTree(PREFIX), _snapshot(crdiis=1, arquivos_por_processo=0), "empresa")
+
+        self.assertTrue(plan.vazio)
+
+    def test_crdii_com_processo_mantido_nao_e_removido(self):
+        tree = _tree("arquivo0.pdf", crdii="C0", processo="P0")
+        plan = build_plan(tree, _snapshot(crdiis=1, processos_por_crdii=2), "empresa")
+
+        self.assertEqual(plan.remover["processos"], [(2, "P1")])
+        self.assertEqual(plan.remover["crdiis"], [])
+
+    def test_arquivos_fora_da_pasta_varrida_sao_mantidos(self):
+        snapshot = _snapshot(crdiis=1, arquivos_por_processo=0, extra_arquivos=[("outra/COMPRAS/C0/P0/x.pdf", 1)])
+        plan = build_plan(DiskTree(PREFIX), snapshot, "empresa")
+
+        self.assertTrue(plan.vazio)
+        self.assertEqual(plan.existentes["arquivos"], 0)
+
+    def test_layout_por_ids_mantem_os_arquivos(self):
+        caminho = f"{PREFIX}ids/ab/1/cd/a.pdf"
+        tree = DiskTree(PREFIX)
+        tree.arquivos_ids[caminho] = 10
+        snapshot = _snapshot(crdiis=1, arquivos_por_processo=0, extra_arquivos=[(caminho, 1)])
+
+        self.assertTrue(build_plan(tree, snapshot, "empresa").vazio)
+
+
+class VolumeDesmontadoTests(SimpleTestCase):
+    def test_arvore_vazia_remove_tudo_e_e_recusada(self):
+        snapshot = _snapshot(crdiis=10, processos_por_crdii=5, arquivos_por_processo=4)
+        plan = build_plan(DiskTree(PREFIX), snapshot, "empresa")
+
+        self.assertEqual(plan.resumo()["remover"], {"crdiis": 10, "processos": 50, "arquivos": 200})
+        with self.assertRaises(DeletionLimitExceeded):
+            plan.check_deletions(0.5, min_count=20)
+
+
+class CheckDeletionsTests(SimpleTestCase):
+    def plano(self, remover, existentes, entidade="arquivos"):
+        plan = SyncPlan("empresa")
+        plan.remover[entidade] = [(pk, f"item{pk}") for pk in range(remover)]
+        plan.existentes[entidade] = existentes
+        return plan
+
+    def test_fracao_abaixo_do_limite_e_permitida(self):
+        self.plano(remover=4, existentes=10).check_deletions(0.5)
+
+    def test_fracao_acima_do_limite_e_recusada(self):
+        with self.assertRaisesMessage(DeletionLimitExceeded, "6 de 10 arquivos"):
+            self.plano(remover=6, existentes=10).check_deletions(0.5)
+
+    def test_limite_vale_para_cada_entidade(self):
+        plan = self.plano(remover=6, existentes=10, entidade="processos")
+        plan.existentes["arquivos"] = 1000
+        with self.assertRaisesMessage(DeletionLimitExceeded, "processos"):
+            plan.check_deletions(0.5)
+
+    def test_minimo_de_exclusoes_sempre_permitido(self):
+        # Empresa pequena: remover 3 de 3 passa com min_count=3, mas não com min_count=2
+        self.plano(remover=3, existentes=3).check_deletions(0.5, min_count=3)
+        with self.assertRaises(DeletionLimitExceeded):
+            self.plano(remover=3, existentes=3).check_deletions(0.5, min_count=2)
+
+    def test_minimo_nao_libera_exclusoes_acima_dele(self):
+        with self.assertRaises(DeletionLimitExceeded):
+            self.plano(remover=30, existentes=40).check_deletions(0.5, min_count=20)
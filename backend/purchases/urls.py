@@ -2,11 +2,13 @@ from django.urls import path, include
 from rest_framework import routers
 from .views import (
     DashboardStatsView,
+    CrossTenantDashboardView,
     ComprasPorMesView,
     ProcessoViewSet,
     ArquivoViewSet,
     LogUsoViewSet,
     CRDIIViewSet,
+    StorageUsageView,
 )
 
 router = routers.DefaultRouter()
@@ -20,9 +22,12 @@ urlpatterns = [
     path("", include(router.urls)),
     # --- URL PARA O DASHBOARD ---
     path("dashboard/stats/", DashboardStatsView.as_view(), name="dashboard-stats"),
+    # Resumo de todas as empresas do usuário (não depende do X-Tenant-ID)
+    path("dashboard/empresas/", CrossTenantDashboardView.as_view(), name="dashboard-empresas"),
     path(
         "dashboard/compras-por-mes/",
         ComprasPorMesView.as_view(),
         name="compras-por-mes",
     ),
+    path("storage/usage/", StorageUsageView.as_view(), name="storage-usage"),
 ]
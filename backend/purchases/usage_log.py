@@ -0,0 +1,17 @@
+"""
+Registro de uso (LogUso) em lote: os registros gerados durante uma transação são
+gravados com um único bulk_create após o commit e descartados em caso de rollback.
+"""
+from core.buffers import OnCommitBuffer
+from .models import LogUso
+
+
+def _write_logs(logs):
+    LogUso.objects.bulk_create(logs, batch_size=500)
+
+
+log_buffer = OnCommitBuffer("log_uso", _write_logs)
+
+
+def log_uso(usuario, acao, detalhe=""):
+    log_buffer.add(LogUso(usuario=usuario, acao=acao, detalhe=detalhe))
@@ -4,19 +4,24 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.filters import SearchFilter, OrderingFilter
+import django_filters
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 from django.core.exceptions import PermissionDenied
-from django.db.models import Count, Q, F, Avg
+from django.db import transaction
+from django.db.models import Count, Q
 from django.db.models.functions import TruncMonth
-from django.utils import timezone
 from datetime import datetime, timedelta
 import traceback
 
-from .models import CRDII, Arquivo, LogUso, Processo, StatusHistory
+from .models import CRDII, Arquivo, LogUso, Processo, StatusHistory, UsoArmazenamento
 from users.models import UserPermission
+from core.request_context import forget_user_permissions, get_user_permissions
+from audit.utils import bulk_log
 from .permissions import CanViewStatusHistory, HasPermission
+from . import dashboard, storage_usage
+from .usage_log import log_uso
 
 from .serializers import (
     ProcessoSerializer,
@@ -26,6 +31,16 @@ from .serializers import (
     StatusHistorySerializer,
 )
 
+ALLOWED_DOCUMENT_TYPES = ["processo", "nota_fiscal", "boletos"]
+
+# Mapeamento do tipo de documento para a permissão específica de upload
+UPLOAD_PERMISSION_MAP = {
+    "processo": "can_upload_processo",
+    "nota_fiscal": "can_upload_nota_fiscal",
+    "boletos": "can_upload_boletos",
+}
+
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
@@ -44,7 +59,7 @@ class CRDIIViewSet(viewsets.ModelViewSet):
         if _user.is_superuser or _user.role in ["dev"]:
             return CRDII.objects.all().order_by("nome")
 
-        permissions_dict = UserPermission.get_user_permissions_dict(_user, tenant)
+        permissions_dict = get_user_permissions(_user, tenant)
         allowed_ids = permissions_dict.get('allowed_crdii', [])
         
         if not allowed_ids:
@@ -57,14 +72,19 @@ class CRDIIViewSet(viewsets.ModelViewSet):
         user = self.request.user
         tenant = self.request.tenant
         
-        user_perm, created = UserPermission.objects.get_or_create(user=user, tenant=tenant)
-        
-        if user_perm.allowed_crdii is None:
-            user_perm.allowed_crdii = []
-            
-        if crdii.id not in user_perm.allowed_crdii:
-            user_perm.allowed_crdii.append(crdii.id)
-            user_perm.save()
+        with transaction.atomic():
+            user_perm, created = UserPermission.objects.select_for_update().get_or_create(user=user, tenant=tenant)
+
+            # Parte das permissões resolvidas: com perfil, a liberação vai para os ajustes
+            # do usuário (overrides), já que o campo allowed_crdii deixa de ser usado
+            permitidos = UserPermission.resolve_permissions(user, user_perm).get('allowed_crdii') or []
+            if crdii.id not in permitidos:
+                changed = user_perm.apply_changes({'allowed_crdii': [*permitidos, crdii.id]})
+                if changed:
+                    user_perm.save(update_fields=sorted(changed))
+
+        # As permissões já resolvidas neste request ficaram desatualizadas
+        forget_user_permissions()
 
 
 class ProcessoViewSet(viewsets.ModelViewSet):
@@ -94,7 +114,7 @@ class ProcessoViewSet(viewsets.ModelViewSet):
         if _user.is_superuser or _user.role in ["dev"]:
             return Processo.objects.prefetch_related("arquivos").all().order_by("-data_criacao")
 
-        permissions_dict = UserPermission.get_user_permissions_dict(_user, tenant)
+        permissions_dict = get_user_permissions(_user, tenant)
         allowed_ids = permissions_dict.get('allowed_crdii', [])
 
         queryset = Processo.objects.prefetch_related("arquivos").filter(
@@ -130,16 +150,23 @@ class ProcessoViewSet(viewsets.ModelViewSet):
             if current_order and new_order and new_order < current_order:
                 raise PermissionDenied("Usuários do tipo 'Obra' não podem retroceder o status.")
 
-        response = super().update(request, *args, **kwargs)
+        # Mesmo fluxo do UpdateModelMixin.update, reaproveitando o objeto já carregado
+        # (super().update() faria um segundo get_object())
+        partial = kwargs.pop("partial", False)
+        serializer = self.get_serializer(processo, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        if getattr(processo, "_prefetched_objects_cache", None):
+            processo._prefetched_objects_cache = {}
 
-        if response.status_code == 200 and new_status and new_status != old_status:
+        if new_status and new_status != old_status:
             StatusHistory.objects.create(
                 processo=processo,
                 usuario=request.user,
                 status_anterior=old_status,
                 status_novo=new_status,
             )
-        return response
+        return Response(serializer.data)
 
     def perform_create(self, serializer):
         processo = serializer.save(criado_por=self.request.user)
@@ -154,53 +181,182 @@ class ProcessoViewSet(viewsets.ModelViewSet):
     def upload(self, request, pk=None):
         try:
             processo = self.get_object()
+            # Antes de acessar request.FILES: nenhum byte é gravado se a cota estourar
+            quota_error = storage_usage.check_quota(request)
+            if quota_error:
+                return Response({"detail": quota_error}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
             f = request.FILES.get("file")
             nome = request.data.get("nome") or (f.name if f else "")
             document_type = request.data.get("document_type")
-            allowed_document_types = ["processo", "nota_fiscal", "boletos"]
 
-            if document_type not in allowed_document_types:
+            if document_type not in ALLOWED_DOCUMENT_TYPES:
                 return Response({"detail": "Tipo de documento inválido."}, status=status.HTTP_400_BAD_REQUEST)
             
-            _user = request.user
-            if not (_user.is_superuser or _user.role == 'dev'):
-                permissions_dict = UserPermission.get_user_permissions_dict(_user, request.tenant)
-                
-                # Mapeamento do tipo de documento para a permissão específica
-                permission_map = {
-                    "processo": "can_upload_processo",
-                    "nota_fiscal": "can_upload_nota_fiscal",
-                    "boletos": "can_upload_boletos"
-                }
-                required_perm = permission_map.get(document_type)
-                
-                # Verifica se tem a permissão específica OU a geral (caso queira manter retrocompatibilidade)
-                has_specific = permissions_dict.get(required_perm, False)
-                has_general = permissions_dict.get('can_upload_file', False)
-                
-                if not has_specific and not has_general:
-                    raise PermissionDenied(f"Você não tem permissão para fazer upload de {document_type.replace('_', ' ')}.")
+            permission_error = self._upload_permission_error(
+                self._upload_permissions(request), document_type
+            )
+            if permission_error:
+                raise PermissionDenied(permission_error)
 
             if not f:
                 return Response({"detail": "Nenhum arquivo enviado."}, status=status.HTTP_400_BAD_REQUEST)
             
-            arquivo = Arquivo.objects.create(
+            with transaction.atomic():
+                arquivo = Arquivo.objects.create(
+                    processo=processo,
+                    nome_original=f.name,
+                    nome_atual=nome,
+                    document_type=document_type,
+                    arquivo=f,
+                    tamanho=f.size,
+                    criado_por=request.user,
+                )
+                log_uso(
+                    request.user,
+                    "upload",
+                    f"Upload arquivo {arquivo.nome_atual} no processo {processo.id}",
+                )
+            return Response(ArquivoSerializer(arquivo, context={"request": request}).data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({"detail": f"Erro interno no upload: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _upload_permissions(self, request):
+        """
+        Retorna o dicionário de permissões do usuário, ou None para superusuário/dev.
+        """
+        _user = request.user
+        if _user.is_superuser or _user.role == 'dev':
+            return None
+        return get_user_permissions(_user, request.tenant)
+
+    def _upload_permission_error(self, permissions_dict, document_type):
+        if permissions_dict is None:
+            return None
+        required_perm = UPLOAD_PERMISSION_MAP.get(document_type)
+
+        # Verifica se tem a permissão específica OU a geral (caso queira manter retrocompatibilidade)
+        has_specific = permissions_dict.get(required_perm, False)
+        has_general = permissions_dict.get('can_upload_file', False)
+
+        if not has_specific and not has_general:
+            return f"Você não tem permissão para fazer upload de {document_type.replace('_', ' ')}."
+        return None
+
+    @action(detail=True, methods=["post"], url_path="upload-batch", permission_classes=[IsAuthenticated])
+    def upload_batch(self, request, pk=None):
+        """
+        Upload de vários arquivos em uma única requisição (multipart):
+        - files: os arquivos
+        - document_types / nomes: listas na mesma ordem dos arquivos (opcionais);
+          document_type define o tipo padrão para todos
+        - atomic: "true" para tudo-ou-nada; por padrão, os arquivos válidos são salvos
+          mesmo que outros falhem.
+        """
+        processo = self.get_object()
+        quota_error = storage_usage.check_quota(request)
+        if quota_error:
+            return Response({"detail": quota_error}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        files = request.FILES.getlist("files")
+        if not files:
+            return Response({"detail": "Nenhum arquivo enviado."}, status=status.HTTP_400_BAD_REQUEST)
+
+        default_type = request.data.get("document_type")
+        document_types = request.data.getlist("document_types") if hasattr(request.data, "getlist") else []
+        nomes = request.data.getlist("nomes") if hasattr(request.data, "getlist") else []
+        all_or_nothing = str(request.data.get("atomic", "")).lower() in ("1", "true", "yes")
+
+        permissions_dict = self._upload_permissions(request)
+        results = []
+        candidates = []  # (índice no resultado, arquivo enviado, Arquivo ainda não salvo)
+
+        # 1. Validação (tipo e permissão) de todos os arquivos antes de gravar qualquer byte
+        for index, f in enumerate(files):
+            document_type = document_types[index] if index < len(document_types) else default_type
+            nome = (nomes[index] if index < len(nomes) else "") or f.name
+            result = {"index": index, "nome": nome}
+            results.append(result)
+
+            if document_type not in ALLOWED_DOCUMENT_TYPES:
+                result.update(status="erro", detail="Tipo de documento inválido.")
+                continue
+            permission_error = self._upload_permission_error(permissions_dict, document_type)
+            if permission_error:
+                result.update(status="erro", detail=permission_error)
+                continue
+
+            arquivo = Arquivo(
                 processo=processo,
                 nome_original=f.name,
                 nome_atual=nome,
                 document_type=document_type,
-                arquivo=f,
+                tamanho=f.size,
                 criado_por=request.user,
             )
-            LogUso.objects.create(
-                usuario=request.user,
-                acao="upload",
-                detalhe=f"Upload arquivo {arquivo.nome_atual} no processo {processo.id}",
-            )
-            return Response(ArquivoSerializer(arquivo, context={"request": request}).data, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            traceback.print_exc()
-            return Response({"detail": f"Erro interno no upload: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            candidates.append((index, f, arquivo))
+
+        if all_or_nothing and len(candidates) < len(files):
+            return self._cancel_batch(results, candidates)
+
+        # 2. Grava os arquivos no storage; os registros são inseridos depois, em lote
+        pending = []
+        for index, f, arquivo in candidates:
+            try:
+                arquivo.arquivo.save(f.name, f, save=False)
+            except Exception as e:
+                traceback.print_exc()
+                results[index].update(status="erro", detail=f"Erro ao gravar o arquivo: {str(e)}")
+                continue
+            pending.append((index, arquivo))
+
+        if all_or_nothing and len(pending) < len(candidates):
+            self._discard_stored_files(arquivo for _, arquivo in pending)
+            return self._cancel_batch(results, pending)
+
+        failed = [r for r in results if r.get("status") == "erro"]
+
+        if pending:
+            try:
+                with transaction.atomic():
+                    created = Arquivo.objects.bulk_create([arquivo for _, arquivo in pending])
+                    for arquivo in created:
+                        log_uso(
+                            request.user,
+                            "upload",
+                            f"Upload arquivo {arquivo.nome_atual} no processo {processo.id}",
+                        )
+                    bulk_log(created, "CREATE", user=request.user, ip_address=request.META.get("REMOTE_ADDR"))
+                    storage_usage.record_created(created)
+            except Exception as e:
+                traceback.print_exc()
+                self._discard_stored_files(arquivo for _, arquivo in pending)
+                return Response({"detail": f"Erro interno no upload: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            for (index, _), arquivo in zip(pending, created):
+                results[index].update(
+                    status="ok",
+                    arquivo=ArquivoSerializer(arquivo, context={"request": request}).data,
+                )
+
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif pending:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"results": results}, status=response_status)
+
+    def _cancel_batch(self, results, not_failed):
+        for item in not_failed:
+            results[item[0]].update(status="cancelado", detail="Lote cancelado: outro arquivo falhou.")
+        return Response({"results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+    def _discard_stored_files(self, arquivos):
+        for arquivo in arquivos:
+            try:
+                arquivo.arquivo.delete(save=False)
+            except Exception:
+                traceback.print_exc()
 
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, CanViewStatusHistory])
     def history(self, request, pk=None):
@@ -219,6 +375,12 @@ class ArquivoViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated(), HasPermission('can_delete_file')]
         return [IsAuthenticated()]
 
+    def create(self, request, *args, **kwargs):
+        quota_error = storage_usage.check_quota(request)
+        if quota_error:
+            return Response({"detail": quota_error}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return super().create(request, *args, **kwargs)
+
     @action(detail=True, methods=["post"])
     def rename(self, request, pk=None):
         arquivo = self.get_object()
@@ -226,206 +388,108 @@ class ArquivoViewSet(viewsets.ModelViewSet):
         if not novo_nome:
             return Response({"detail": "Nome vazio"}, status=status.HTTP_400_BAD_REQUEST)
         arquivo.nome_atual = novo_nome
-        arquivo.save()
-        LogUso.objects.create(
-            usuario=request.user, acao="rename", detalhe=f"Renomeou arquivo {arquivo.id} para {novo_nome}"
-        )
+        with transaction.atomic():
+            arquivo.save()
+            log_uso(request.user, "rename", f"Renomeou arquivo {arquivo.id} para {novo_nome}")
         return Response(ArquivoSerializer(arquivo, context={"request": request}).data)
 
 
+class LogUsoPagination(CursorPagination):
+    # Paginação por chave (data_hora): custo constante em qualquer página
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-data_hora', '-id')
+
+
+class LogUsoFilter(django_filters.FilterSet):
+    # ?data_hora_after=2025-01-01&data_hora_before=2025-02-01
+    data_hora = django_filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = LogUso
+        fields = ['usuario', 'acao']
+
+
 class LogUsoViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = LogUso.objects.all().order_by("-data_hora")
+    queryset = LogUso.objects.all()
     serializer_class = LogUsoSerializer
+    pagination_class = LogUsoPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = LogUsoFilter
 
 
 class DashboardStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        # Inicializa variáveis com valores padrão seguros
-        stats = {
-            'total_processos': 0, 'concluidos': 0, 'em_andamento': 0,
-            'parcial': 0, 'arquivados': 0, 'cancelados': 0
-        }
-        tempo_medio_dias = 0
-        top_crdiis = []
-        stagnant_count = 0
-        top_users = []
-        recent_activity = []
-        chart_data = []
-
         try:
-            # 1. Preparação do QuerySet Base
-            year = request.query_params.get('year')
-            month = request.query_params.get('month')
-            crdii_id = request.query_params.get('crdii')
-            tipo = request.query_params.get('tipo')
-            
-            _user = request.user
-            tenant = request.tenant
-            
-            qs = Processo.objects.all()
-
-            if not (_user.is_superuser or _user.role in ["dev"]):
-                permissions_dict = UserPermission.get_user_permissions_dict(_user, tenant)
-                allowed_ids = permissions_dict.get('allowed_crdii', [])
-                qs = qs.filter(Q(crdii__id__in=allowed_ids) | Q(crdii__isnull=True))
-
-            if tipo:
-                qs = qs.filter(tipo=tipo)
-
-            if year:
-                qs = qs.filter(data_criacao__year=year)
-            if month:
-                qs = qs.filter(data_criacao__month=month)
-            if crdii_id:
-                 qs = qs.filter(crdii__id=crdii_id)
-
-            # 2. Estatísticas Gerais (Counts)
-            try:
-                stats = qs.aggregate(
-                    total_processos=Count('id'),
-                    concluidos=Count('id', filter=Q(status='concluido')),
-                    em_andamento=Count('id', filter=Q(status='nao_concluido')),
-                    parcial=Count('id', filter=Q(status='parcial')),
-                    arquivados=Count('id', filter=Q(status='arquivado')),
-                    cancelados=Count('id', filter=Q(status='cancelado'))
-                )
-            except Exception:
-                print("Erro ao calcular stats gerais")
-                traceback.print_exc()
+            filters = {param: request.query_params.get(param) for param in dashboard.FILTER_PARAMS}
+            return Response(dashboard.compute_stats(request.user, request.tenant, **filters))
+        except Exception as e:
+            traceback.print_exc()
+            return Response({'detail': f'Erro crítico no Dashboard: {str(e)}'}, status=400)
 
-            # 3. Tempo Médio
-            try:
-                avg_time_qs = qs.filter(
-                    status=Processo.Status.CONCLUIDO, 
-                    data_concluido__isnull=False
-                )
-                avg_time = avg_time_qs.annotate(
-                    duration=F('data_concluido') - F('data_criacao')
-                ).aggregate(media=Avg('duration'))['media']
-                tempo_medio_dias = avg_time.days if avg_time else 0
-            except Exception:
-                print("Erro ao calcular tempo médio")
-                traceback.print_exc()
 
-            # 4. Top 5 CRDIIs
-            try:
-                top_crdiis_qs = qs.values('crdii__nome').annotate(
-                    total=Count('id')
-                ).order_by('-total')[:5]
-                top_crdiis = [
-                    {'name': item['crdii__nome'] or 'Sem CRDII', 'total': item['total']} 
-                    for item in top_crdiis_qs
-                ]
-            except Exception:
-                print("Erro ao calcular top CRDIIs")
-                traceback.print_exc()
+class CrossTenantDashboardView(APIView):
+    """
+    Resumo do Dashboard de todas as empresas do usuário (ex: diretoria e dev comparando
+    empresas), sem trocar de tenant. Aceita os mesmos filtros do DashboardStatsView e
+    `?atualizar=1` para ignorar o cache. Empresas ainda em cálculo voltam como
+    'pendente' (com `completo: false`); basta consultar de novo.
+    """
+    permission_classes = [IsAuthenticated]
 
-            # 5. Processos Estagnados
-            try:
-                thirty_days_ago = timezone.now() - timedelta(days=30)
-                stagnant_qs = qs.filter(
-                    Q(status=Processo.Status.NAO_CONCLUIDO, data_em_andamento__lt=thirty_days_ago) |
-                    Q(status=Processo.Status.PARCIAL, data_parcial__lt=thirty_days_ago)
-                )
-                stagnant_count = stagnant_qs.count()
-            except Exception:
-                print("Erro ao calcular estagnados")
-                traceback.print_exc()
+    def get(self, request, *args, **kwargs):
+        filters = {param: request.query_params.get(param) for param in dashboard.FILTER_PARAMS}
+        refresh = request.query_params.get('atualizar') in ('1', 'true')
+        return Response(dashboard.cross_tenant_summary(request.user, filters, refresh=refresh))
+
+class StorageUsageView(APIView):
+    """
+    Uso de disco da empresa atual, por CRDII e (opcionalmente) dos maiores processos.
+    Baseado nos contadores de UsoArmazenamento, sem acessar o disco.
+    """
+    permission_classes = [IsAuthenticated]
 
-            # 6. Top Usuários
-            try:
-                top_users_qs = qs.values('criado_por__username').annotate(
-                    total=Count('id')
-                ).order_by('-total')[:5]
-                top_users = [
-                    {'username': item['criado_por__username'] or 'Desconhecido', 'total': item['total']}
-                    for item in top_users_qs
-                ]
-            except Exception:
-                print("Erro ao calcular top usuários")
-                traceback.print_exc()
+    def get(self, request, *args, **kwargs):
+        _user = request.user
+        tenant = request.tenant
+        Escopo = UsoArmazenamento.Escopo
+
+        crdiis_qs = CRDII.objects.all()
+        processos_qs = Processo.objects.all()
+        if not (_user.is_superuser or _user.role in ["dev"]):
+            permissions_dict = get_user_permissions(_user, tenant)
+            allowed_ids = permissions_dict.get('allowed_crdii', [])
+            crdiis_qs = crdiis_qs.filter(id__in=allowed_ids)
+            processos_qs = processos_qs.filter(Q(crdii__id__in=allowed_ids) | Q(crdii__isnull=True))
+
+        crdii_nomes = dict(crdiis_qs.values_list('id', 'nome'))
+        crdiis = [
+            {'id': uso.objeto_id, 'nome': crdii_nomes[uso.objeto_id], 'bytes': uso.bytes, 'arquivos': uso.arquivos}
+            for uso in UsoArmazenamento.objects.filter(escopo=Escopo.CRDII, objeto_id__in=list(crdii_nomes)).order_by('-bytes')
+        ]
 
-            # 7. Atividade Recente
-            try:
-                recent_qs = StatusHistory.objects.filter(processo__in=qs).select_related('usuario', 'processo').order_by('-data_mudanca')[:20]
-                recent_activity = [
-                    {
-                        'id': h.id,
-                        'usuario': h.usuario.username if h.usuario else 'Sistema',
-                        'processo': f"{h.processo.nome}",
-                        'status_novo': h.get_status_novo_display(),
-                        'data': h.data_mudanca
-                    }
-                    for h in recent_qs
-                ]
-            except Exception:
-                print("Erro ao calcular atividade recente")
-                traceback.print_exc()
-            
-            # 8. Gráfico de Evolução
-            try:
-                if year:
-                    evolution_data = (
-                        qs.annotate(month=TruncMonth('data_criacao'))
-                        .values('month')
-                        .annotate(
-                            criados=Count('id'),
-                            concluidos=Count('id', filter=Q(status='concluido'))
-                        )
-                        .order_by('month')
-                    )
-                    chart_data = [
-                        {
-                            "name": item['month'].strftime("%b") if item['month'] else "N/A", 
-                            "criados": item['criados'], 
-                            "concluidos": item['concluidos']
-                        }
-                        for item in evolution_data
-                    ]
-                else:
-                    last_12_months = timezone.now() - timedelta(days=365)
-                    evolution_qs = qs.filter(data_criacao__gte=last_12_months)
-                    evolution_data = (
-                        evolution_qs.annotate(month=TruncMonth('data_criacao'))
-                        .values('month')
-                        .annotate(
-                            criados=Count('id'),
-                            concluidos=Count('id', filter=Q(status='concluido'))
-                        )
-                        .order_by('month')
-                    )
-                    chart_data = [
-                        {
-                            "name": item['month'].strftime("%b/%Y") if item['month'] else "N/A", 
-                            "criados": item['criados'], 
-                            "concluidos": item['concluidos']
-                        }
-                        for item in evolution_data
-                    ]
-            except Exception:
-                print("Erro ao calcular gráfico")
-                traceback.print_exc()
+        try:
+            limit = min(int(request.query_params.get('top', 10)), 100)
+        except ValueError:
+            limit = 10
+        top_usos = list(
+            UsoArmazenamento.objects.filter(
+                escopo=Escopo.PROCESSO, objeto_id__in=processos_qs.values('id')
+            ).order_by('-bytes')[:limit]
+        )
+        processo_nomes = dict(Processo.objects.filter(id__in=[u.objeto_id for u in top_usos]).values_list('id', 'nome'))
+        processos = [
+            {'id': uso.objeto_id, 'nome': processo_nomes.get(uso.objeto_id), 'bytes': uso.bytes, 'arquivos': uso.arquivos}
+            for uso in top_usos
+        ]
 
-            return Response({
-                'stats': stats,
-                'extra_stats': {
-                    'tempo_medio_dias': tempo_medio_dias,
-                    'top_crdiis': top_crdiis,
-                    'stagnant_count': stagnant_count,
-                    'top_users': top_users,
-                    'recent_activity': recent_activity,
-                },
-                'chart_data': chart_data
-            })
+        empresa = storage_usage.get_usage()
+        empresa['cota'] = getattr(tenant, 'cota_armazenamento', None)
+        return Response({'empresa': empresa, 'crdiis': crdiis, 'processos': processos})
 
-        except Exception as e:
-            traceback.print_exc()
-            # Retorna 200 com dados vazios e erro logado para não quebrar o front completamente, 
-            # ou 400 se preferir. 
-            # Vou retornar 400 com mensagem para diagnóstico.
-            return Response({'detail': f'Erro crítico no Dashboard: {str(e)}'}, status=400)
 
 class ComprasPorMesView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1,5 +1,53 @@
-from django.contrib import admin
-from .models import Empresa, Dominio
+from django.contrib import admin, messages
+from .models import Empresa, Dominio, TenantJob
+from .jobs import enqueue_provisioning, retry
+
+
+def _retry_jobs(model_admin, request, jobs):
+    enfileiradas = 0
+    for job in jobs:
+        try:
+            retry(job, request.user)
+            enfileiradas += 1
+        except ValueError as e:
+            model_admin.message_user(request, f"{job.schema_name}: {e}", messages.WARNING)
+    model_admin.message_user(request, f"{enfileiradas} tarefa(s) enfileirada(s) novamente.")
+
+
+@admin.register(Empresa)
+class EmpresaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'schema_name', 'status', 'criado_em')
+    list_filter = ('status',)
+    readonly_fields = ('status',)
+    actions = ['retry_provisioning']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            # O schema é criado pelo worker 'process_tenant_jobs'
+            enqueue_provisioning(obj, request.user)
+
+    @admin.action(description="Criar novamente as empresas com falha")
+    def retry_provisioning(self, request, queryset):
+        ultimas = TenantJob.objects.filter(
+            empresa__in=queryset.filter(status=Empresa.Status.FALHOU),
+            tipo=TenantJob.Tipo.PROVISIONAR,
+            status=TenantJob.Status.FALHOU,
+        ).order_by('empresa_id', '-criado_em').distinct('empresa_id')
+        _retry_jobs(self, request, ultimas)
+
 
-admin.site.register(Empresa)
 admin.site.register(Dominio)
+
+
+@admin.register(TenantJob)
+class TenantJobAdmin(admin.ModelAdmin):
+    list_display = ('schema_name', 'tipo', 'status', 'etapa', 'progresso', 'tentativas', 'criado_em')
+    list_filter = ('tipo', 'status')
+    search_fields = ('schema_name',)
+    readonly_fields = [field.name for field in TenantJob._meta.fields]
+    actions = ['retry_jobs']
+
+    @admin.action(description="Tentar novamente as tarefas com falha")
+    def retry_jobs(self, request, queryset):
+        _retry_jobs(self, request, queryset)
@@ -0,0 +1,382 @@
+"""
+Tarefas de empresa (TenantJob), executadas fora do request pelo worker
+'process_tenant_jobs'.
+
+Criação de empresa:
+1. o schema modelo (TENANT_TEMPLATE_SCHEMA, que não é uma empresa) é criado ou
+   atualizado com as migrations de tenant;
+2. o schema da empresa é clonado do modelo (estrutura + tabela de migrations); se a
+   clonagem falhar, o schema é criado vazio e recebe todas as migrations;
+3. as migrations pendentes são aplicadas e o schema é conferido. Só então a empresa
+   passa a 'pronta' e começa a receber requests.
+
+A criação só roda para empresas 'provisionando' (ou 'falhou', numa nova tentativa) e só
+marca a empresa como pronta se ela continuar em preparação. Excluir a empresa durante a
+criação cancela a tarefa (cancel_provisioning): ela para no próximo passo e remove o
+schema que criou.
+
+Remoção de empresa (a empresa já foi marcada como 'desativada' pela API e não recebe
+mais requests):
+1. a pasta MEDIA_ROOT/<schema>/ é apagada em lotes de arquivos, com progresso;
+2. as tabelas do schema são removidas em lotes (transações curtas) e depois o schema;
+3. o registro da empresa (domínios, permissões) é excluído.
+Cada etapa pode ser retomada: uma nova tentativa continua do ponto em que parou.
+"""
+import os
+import time
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+from django_tenants.clone import CloneSchema
+from django_tenants.utils import get_public_schema_name, schema_context, schema_exists
+
+from core.partitioning import PARTITIONED_MODELS, ensure_partitions, is_partitioned
+from .models import Empresa, TenantJob
+
+
+# Arquivos apagados / tabelas removidas entre duas atualizações de progresso
+MEDIA_BATCH_SIZE = 500
+TABLE_BATCH_SIZE = 10
+
+# Espera da remoção por uma criação cancelada que ainda está rodando (segundos)
+CANCEL_WAIT_TIMEOUT = 600
+CANCEL_WAIT_INTERVAL = 2
+
+
+def enqueue_provisioning(empresa, user=None):
+    return TenantJob.objects.create(
+        empresa=empresa,
+        schema_name=empresa.schema_name,
+        tipo=TenantJob.Tipo.PROVISIONAR,
+        criado_por=user,
+    )
+
+
+def enqueue_teardown(empresa, user=None):
+    return TenantJob.objects.create(
+        empresa=empresa,
+        schema_name=empresa.schema_name,
+        tipo=TenantJob.Tipo.REMOVER,
+        criado_por=user,
+    )
+
+
+class JobCancelled(Exception):
+    """A tarefa foi cancelada (ex: empresa excluída durante a criação)."""
+
+
+def cancel_provisioning(empresa):
+    """
+    Cancela as tarefas de criação pendentes ou em execução da empresa. Uma tarefa em
+    execução para no próximo passo (check_cancelled) e remove o schema que criou.
+    """
+    agora = timezone.now()
+    tarefas = TenantJob.objects.filter(empresa=empresa, tipo=TenantJob.Tipo.PROVISIONAR)
+    canceladas = tarefas.filter(status=TenantJob.Status.PENDENTE).update(
+        status=TenantJob.Status.CANCELADO, etapa="cancelado", atualizado_em=agora, concluido_em=agora
+    )
+    # concluido_em fica vazio até o worker parar a tarefa (ver _wait_cancelled_provisioning)
+    canceladas += tarefas.filter(status=TenantJob.Status.EXECUTANDO).update(
+        status=TenantJob.Status.CANCELADO, atualizado_em=agora
+    )
+    return canceladas
+
+
+def check_cancelled(job):
+    if TenantJob.objects.filter(pk=job.pk, status=TenantJob.Status.CANCELADO).exists():
+        raise JobCancelled()
+
+
+def retry(job, user=None):
+    """
+    Enfileira de novo uma tarefa que esgotou as tentativas. Na criação, a empresa volta
+    de 'falhou' para 'provisionando'. Lança ValueError se a tarefa não puder ser repetida.
+    """
+    if job.status != TenantJob.Status.FALHOU:
+        raise ValueError("Apenas tarefas com falha podem ser repetidas.")
+    with transaction.atomic():
+        if job.tipo == TenantJob.Tipo.PROVISIONAR:
+            atualizadas = Empresa.objects.filter(
+                pk=job.empresa_id, status=Empresa.Status.FALHOU
+            ).update(status=Empresa.Status.PROVISIONANDO)
+            if not atualizadas:
+                raise ValueError("A empresa não está com falha na criação.")
+        elif job.empresa_id and Empresa.objects.filter(pk=job.empresa_id).exclude(
+            status=Empresa.Status.DESATIVADA
+        ).exists():
+            raise ValueError("A empresa não está desativada.")
+        return TenantJob.objects.create(
+            empresa_id=job.empresa_id,
+            schema_name=job.schema_name,
+            tipo=job.tipo,
+            criado_por=user,
+        )
+
+
+def set_progress(job, etapa, progresso, **detalhe):
+    job.etapa = etapa
+    job.progresso = progresso
+    job.detalhe.update(detalhe)
+    job.save(update_fields=['etapa', 'progresso', 'detalhe', 'atualizado_em'])
+
+
+def _create_schema(schema_name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA "{schema_name}"')
+
+
+def _drop_schema(schema_name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE')
+
+
+def _migrate(schema_name):
+    call_command('migrate_schemas', tenant=True, schema_name=schema_name, interactive=False, verbosity=0)
+    connection.set_schema_to_public()
+
+
+def pending_migrations(schema_name):
+    with schema_context(schema_name):
+        executor = MigrationExecutor(connection)
+        return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def update_template():
+    """Cria o schema modelo, se preciso, e aplica nele as migrations pendentes."""
+    template = settings.TENANT_TEMPLATE_SCHEMA
+    if not schema_exists(template):
+        _create_schema(template)
+    _migrate(template)
+
+
+def provision(job):
+    empresa = job.empresa
+    if empresa is None:
+        raise RuntimeError("Empresa removida antes da criação do schema.")
+    # Nova tentativa de uma empresa com falha (ex: pelo admin)
+    Empresa.objects.filter(pk=empresa.pk, status=Empresa.Status.FALHOU).update(
+        status=Empresa.Status.PROVISIONANDO
+    )
+    status_atual = Empresa.objects.filter(pk=empresa.pk).values_list('status', flat=True).first()
+    if status_atual != Empresa.Status.PROVISIONANDO:
+        if status_atual in (None, Empresa.Status.DESATIVADA):
+            # Excluída antes de a tarefa começar
+            raise JobCancelled()
+        # Já pronta: nada a criar
+        return
+    schema_name = empresa.schema_name
+
+    try:
+        _build_schema(job, schema_name)
+
+        # Só passa a pronta se continuar em preparação (não foi excluída nesse meio tempo)
+        if not Empresa.objects.filter(pk=empresa.pk, status=Empresa.Status.PROVISIONANDO).update(
+            status=Empresa.Status.PRONTA
+        ):
+            raise JobCancelled()
+    except JobCancelled:
+        # O schema recém-criado não é de nenhuma empresa ativa (a remoção ignora o que já não existe)
+        connection.set_schema_to_public()
+        _drop_schema(schema_name)
+        raise
+
+
+def _build_schema(job, schema_name):
+    set_progress(job, "schema modelo", 10)
+    update_template()
+    check_cancelled(job)
+
+    # Sobras de uma tentativa anterior (a empresa ainda não está pronta)
+    if schema_exists(schema_name):
+        _drop_schema(schema_name)
+
+    set_progress(job, "clonagem", 30)
+    try:
+        CloneSchema().clone_schema(settings.TENANT_TEMPLATE_SCHEMA, schema_name, "DATA")
+        metodo = "clone"
+        erro_clonagem = None
+    except Exception as e:
+        # Registrado na tarefa (/api/tenant-jobs/<id>/ e admin), não apenas no log do worker
+        traceback.print_exc()
+        erro_clonagem = f"{type(e).__name__}: {e}"
+        connection.set_schema_to_public()
+        _drop_schema(schema_name)
+        _create_schema(schema_name)
+        metodo = "migrations"
+    check_cancelled(job)
+
+    detalhe = {"metodo": metodo}
+    if erro_clonagem:
+        detalhe["erro_clonagem"] = erro_clonagem
+    set_progress(job, "migrations", 60, **detalhe)
+    _migrate(schema_name)
+    check_cancelled(job)
+
+    set_progress(job, "verificação", 90)
+    pendentes = pending_migrations(schema_name)
+    if pendentes:
+        raise RuntimeError(f"{len(pendentes)} migrations não aplicadas no schema {schema_name}.")
+
+    if connection.vendor == 'postgresql':
+        # O modelo pode ter sido criado meses atrás: garante as partições do mês atual
+        with schema_context(schema_name), connection.cursor() as cursor:
+            for label, column in PARTITIONED_MODELS.items():
+                table = apps.get_model(label)._meta.db_table
+                if is_partitioned(cursor, table):
+                    ensure_partitions(cursor, table, column, settings.PARTITION_MONTHS_AHEAD)
+
+
+def _remove_media(job, batch_size):
+    """Apaga a pasta da empresa de baixo para cima, atualizando o progresso a cada lote."""
+    root = os.path.join(settings.MEDIA_ROOT, job.schema_name)
+    if not os.path.isdir(root):
+        return
+
+    if "arquivos_total" not in job.detalhe:
+        total = sum(len(filenames) for _, _, filenames in os.walk(root))
+        set_progress(job, "arquivos", 5, arquivos_total=total, arquivos_removidos=0)
+    total = job.detalhe["arquivos_total"] or 1
+    removidos = job.detalhe.get("arquivos_removidos", 0)
+
+    lote = 0
+    for dirpath, _, filenames in os.walk(root, topdown=False):
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(dirpath, filename))
+            except FileNotFoundError:
+                pass
+            removidos += 1
+            lote += 1
+            if lote >= batch_size:
+                set_progress(job, "arquivos", 5 + min(55, 55 * removidos // total), arquivos_removidos=removidos)
+                lote = 0
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            # Arquivos criados durante a remoção: a próxima tentativa os apaga
+            pass
+    set_progress(job, "arquivos", 60, arquivos_removidos=removidos)
+
+    # Estado do sync_files --incremental
+    try:
+        os.remove(os.path.join(settings.SYNC_STATE_DIR, f"{job.schema_name}.json"))
+    except FileNotFoundError:
+        pass
+
+
+def _drop_tables(job, batch_size):
+    """
+    Remove as tabelas do schema em lotes, cada um em sua própria transação, em vez de
+    um único DROP SCHEMA CASCADE que bloqueia o catálogo por todo o tempo.
+    """
+    schema_name = job.schema_name
+    if not schema_exists(schema_name):
+        return
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        # Partições saem junto com a tabela principal
+        cursor.execute(
+            "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %s AND c.relkind IN ('r', 'p') AND NOT c.relispartition",
+            [schema_name],
+        )
+        tabelas = [row[0] for row in cursor.fetchall()]
+        total = len(tabelas) or 1
+        set_progress(job, "tabelas", 60, tabelas_total=len(tabelas))
+        for inicio in range(0, len(tabelas), batch_size):
+            lote = tabelas[inicio:inicio + batch_size]
+            with transaction.atomic():
+                cursor.execute(
+                    "DROP TABLE IF EXISTS "
+                    + ", ".join(f"{qn(schema_name)}.{qn(tabela)}" for tabela in lote)
+                    + " CASCADE"
+                )
+            removidas = inicio + len(lote)
+            set_progress(job, "tabelas", 60 + 35 * removidas // total, tabelas_removidas=removidas)
+    _drop_schema(schema_name)
+
+
+def _wait_cancelled_provisioning(job, timeout=CANCEL_WAIT_TIMEOUT):
+    """
+    Com mais de um worker, a criação cancelada pode ainda estar rodando (ela só para no
+    próximo passo); a remoção espera para não concorrer com ela pelo mesmo schema.
+    Tarefas sem progresso há mais de 'timeout' segundos são de um worker interrompido.
+    """
+    if not job.empresa_id:
+        return
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        em_andamento = TenantJob.objects.filter(
+            empresa_id=job.empresa_id,
+            tipo=TenantJob.Tipo.PROVISIONAR,
+            status=TenantJob.Status.CANCELADO,
+            concluido_em__isnull=True,
+            atualizado_em__gte=timezone.now() - timedelta(seconds=timeout),
+        ).exists()
+        if not em_andamento:
+            return
+        set_progress(job, "aguardando cancelamento da criação", 0)
+        time.sleep(CANCEL_WAIT_INTERVAL)
+    raise RuntimeError("A criação cancelada da empresa ainda não terminou.")
+
+
+def teardown(job):
+    if job.schema_name in (get_public_schema_name(), settings.TENANT_TEMPLATE_SCHEMA):
+        raise RuntimeError(f"O schema {job.schema_name} não pode ser removido.")
+    if job.empresa_id and Empresa.objects.filter(pk=job.empresa_id).exclude(
+        status=Empresa.Status.DESATIVADA
+    ).exists():
+        raise RuntimeError("A empresa não está desativada.")
+
+    _wait_cancelled_provisioning(job)
+    _remove_media(job, MEDIA_BATCH_SIZE)
+    _drop_tables(job, TABLE_BATCH_SIZE)
+
+    set_progress(job, "registro", 95)
+    if job.empresa_id:
+        # O schema já foi removido; apaga domínios, permissões e vínculos com usuários
+        Empresa.objects.filter(pk=job.empresa_id).delete()
+
+
+def fail(job):
+    """Chamado quando a tarefa esgota as tentativas."""
+    if job.tipo == TenantJob.Tipo.PROVISIONAR and job.empresa_id:
+        # Uma empresa desativada (excluída) durante a criação continua desativada
+        Empresa.objects.filter(pk=job.empresa_id, status=Empresa.Status.PROVISIONANDO).update(
+            status=Empresa.Status.FALHOU
+        )
+
+
+HANDLERS = {
+    TenantJob.Tipo.PROVISIONAR: provision,
+    TenantJob.Tipo.REMOVER: teardown,
+}
+
+
+def run(job):
+    """
+    Executa a tarefa. Em caso de erro a exceção é propagada para o worker decidir
+    entre nova tentativa e falha.
+    """
+    connection.set_schema_to_public()
+    try:
+        HANDLERS[job.tipo](job)
+    except JobCancelled:
+        job.status = TenantJob.Status.CANCELADO
+        job.etapa = "cancelado"
+        job.concluido_em = timezone.now()
+        job.save(update_fields=['status', 'etapa', 'concluido_em', 'atualizado_em'])
+        return
+    finally:
+        connection.set_schema_to_public()
+    job.status = TenantJob.Status.CONCLUIDO
+    job.etapa = "concluído"
+    job.progresso = 100
+    job.concluido_em = timezone.now()
+    job.save(update_fields=['status', 'etapa', 'progresso', 'concluido_em', 'atualizado_em'])
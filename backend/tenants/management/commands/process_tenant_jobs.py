@@ -0,0 +1,87 @@
+import time
+import traceback
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from tenants import jobs
+from tenants.models import TenantJob
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas de empresa (criacao e remocao de schemas) enfileiradas pela API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Processa a fila uma vez e encerra.')
+        parser.add_argument('--interval', type=int, default=5, help='Segundos entre varreduras da fila.')
+        parser.add_argument('--max-attempts', type=int, default=3, help='Tentativas antes de marcar a tarefa como falha.')
+        parser.add_argument(
+            '--stale-after', type=int, default=3600,
+            help='Segundos sem progresso para retomar uma tarefa em execucao (worker interrompido).',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Iniciando o worker de tarefas de empresas...")
+
+        while True:
+            job = self.claim(options['stale_after'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            self.process(job, options['max_attempts'])
+
+        self.stdout.write(self.style.SUCCESS("Worker de tarefas de empresas finalizado."))
+
+    def claim(self, stale_after):
+        limite = timezone.now() - timedelta(seconds=stale_after)
+        with transaction.atomic():
+            # skip_locked permite rodar mais de um worker sem executar a mesma tarefa
+            job = (
+                TenantJob.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=TenantJob.Status.PENDENTE)
+                    | Q(status=TenantJob.Status.EXECUTANDO, atualizado_em__lt=limite)
+                )
+                .order_by('criado_em')
+                .first()
+            )
+            if job is not None:
+                job.status = TenantJob.Status.EXECUTANDO
+                job.tentativas += 1
+                job.erro = ''
+                job.save(update_fields=['status', 'tentativas', 'erro', 'atualizado_em'])
+        return job
+
+    def process(self, job, max_attempts):
+        self.stdout.write(f"[{job.schema_name}] {job.get_tipo_display()} (tentativa {job.tentativas})...")
+        inicio = time.monotonic()
+        try:
+            jobs.run(job)
+        except Exception as e:
+            traceback.print_exc()
+            job.erro = str(e)
+            if TenantJob.objects.filter(pk=job.pk, status=TenantJob.Status.CANCELADO).exists():
+                # Cancelada durante a execução (empresa excluída): não volta para a fila
+                job.status = TenantJob.Status.CANCELADO
+                job.concluido_em = timezone.now()
+                job.save(update_fields=['status', 'erro', 'concluido_em', 'atualizado_em'])
+                self.stderr.write(f"[{job.schema_name}] Tarefa cancelada: {e}")
+                return
+            if job.tentativas >= max_attempts:
+                job.status = TenantJob.Status.FALHOU
+                jobs.fail(job)
+            else:
+                job.status = TenantJob.Status.PENDENTE
+            job.save(update_fields=['status', 'erro', 'atualizado_em'])
+            self.stderr.write(f"[{job.schema_name}] Erro: {e}")
+            return
+
+        if job.status == TenantJob.Status.CANCELADO:
+            self.stdout.write(f"[{job.schema_name}] {job.get_tipo_display()} cancelada.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"[{job.schema_name}] {job.get_tipo_display()} concluída em {time.monotonic() - inicio:.1f}s."
+        ))
@@ -0,0 +1,40 @@
+"""
+Executor de migrations do django-tenants (setting GET_EXECUTOR_FUNCTION).
+
+O 'migrate' / 'migrate_schemas' sem --schema percorre todas as empresas cadastradas, mas
+só as empresas 'prontas' têm schema completo: uma empresa em criação, com falha ou
+desativada (tabelas já removidas) faria o comando falhar no meio do deploy. Essas
+empresas são ignoradas; a criação aplica as migrations no próprio schema (--schema) e
+uma empresa com falha recebe todas ao ser criada de novo.
+"""
+from django_tenants.migration_executors import get_executor
+
+
+def _ready_schemas(executor_class):
+    class ReadyTenantsExecutor(executor_class):
+        def run_migrations(self, tenants=None):
+            return super().run_migrations(tenants=self.skip_unready(tenants))
+
+        def skip_unready(self, tenants):
+            # Schema escolhido explicitamente (criação de empresa, schema modelo)
+            if self.options.get('schema_name'):
+                return tenants
+
+            from .models import Empresa
+
+            tenants = list(tenants or [])
+            nao_prontas = set(
+                Empresa.objects.exclude(status=Empresa.Status.PRONTA)
+                .filter(schema_name__in=tenants)
+                .values_list('schema_name', flat=True)
+            )
+            if nao_prontas:
+                print(f"Empresas sem schema pronto ignoradas: {', '.join(sorted(nao_prontas))}")
+            return [schema for schema in tenants if schema not in nao_prontas]
+
+    ReadyTenantsExecutor.__name__ = f"Ready{executor_class.__name__}"
+    return ReadyTenantsExecutor
+
+
+def get_ready_tenants_executor(codename=None):
+    return _ready_schemas(get_executor(codename))
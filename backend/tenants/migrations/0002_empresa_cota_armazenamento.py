@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="empresa",
+            name="cota_armazenamento",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
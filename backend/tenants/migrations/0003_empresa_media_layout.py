@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0002_empresa_cota_armazenamento"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="empresa",
+            name="media_layout",
+            field=models.CharField(
+                choices=[
+                    ("nomes", "Por nomes (TIPO/CRDII/Processo)"),
+                    ("ids", "Por IDs com fan-out"),
+                ],
+                default="nomes",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0003_empresa_media_layout"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="empresa",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("provisionando", "Em preparação"),
+                    ("pronta", "Pronta"),
+                    ("falhou", "Falha na criação"),
+                ],
+                db_index=True,
+                # Empresas existentes já possuem schema
+                default="pronta",
+                max_length=16,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="empresa",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("provisionando", "Em preparação"),
+                    ("pronta", "Pronta"),
+                    ("falhou", "Falha na criação"),
+                ],
+                db_index=True,
+                default="provisionando",
+                max_length=16,
+            ),
+        ),
+        migrations.CreateModel(
+            name="TenantJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("schema_name", models.CharField(max_length=63)),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("provisionar", "Criação")], max_length=16
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pendente", "Pendente"),
+                            ("executando", "Executando"),
+                            ("concluido", "Concluído"),
+                            ("falhou", "Falhou"),
+                        ],
+                        default="pendente",
+                        max_length=16,
+                    ),
+                ),
+                ("etapa", models.CharField(blank=True, max_length=64)),
+                ("progresso", models.PositiveSmallIntegerField(default=0)),
+                ("detalhe", models.JSONField(blank=True, default=dict)),
+                ("erro", models.TextField(blank=True)),
+                ("tentativas", models.PositiveSmallIntegerField(default=0)),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+                ("concluido_em", models.DateTimeField(blank=True, null=True)),
+                (
+                    "criado_por",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "empresa",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="jobs",
+                        to="tenants.empresa",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tarefa de Empresa",
+                "verbose_name_plural": "Tarefas de Empresas",
+                "ordering": ["-criado_em"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "criado_em"], name="tenantjob_fila_idx"
+                    )
+                ],
+            },
+        ),
+    ]
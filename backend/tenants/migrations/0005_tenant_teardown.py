@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0004_empresa_status_tenantjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="empresa",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("provisionando", "Em preparação"),
+                    ("pronta", "Pronta"),
+                    ("falhou", "Falha na criação"),
+                    ("desativada", "Desativada (em remoção)"),
+                ],
+                db_index=True,
+                default="provisionando",
+                max_length=16,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tenantjob",
+            name="tipo",
+            field=models.CharField(
+                choices=[("provisionar", "Criação"), ("remover", "Remoção")],
+                max_length=16,
+            ),
+        ),
+    ]
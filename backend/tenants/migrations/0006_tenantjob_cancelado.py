@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0005_tenant_teardown"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tenantjob",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pendente", "Pendente"),
+                    ("executando", "Executando"),
+                    ("concluido", "Concluído"),
+                    ("falhou", "Falhou"),
+                    ("cancelado", "Cancelado"),
+                ],
+                default="pendente",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -1,17 +1,78 @@
+from django.conf import settings
 from django.db import models
 from django_tenants.models import TenantMixin, DomainMixin
+from purchases.media_layout import LAYOUT_CHOICES, LAYOUT_NOMES
 
 class Empresa(TenantMixin):
-    
+    class Status(models.TextChoices):
+        PROVISIONANDO = "provisionando", "Em preparação"
+        PRONTA = "pronta", "Pronta"
+        FALHOU = "falhou", "Falha na criação"
+        # Exclusão solicitada: sai do ar na hora; schema e arquivos são removidos pelo worker
+        DESATIVADA = "desativada", "Desativada (em remoção)"
+
     nome = models.CharField(max_length=100, unique=True)
     criado_em = models.DateField(auto_now_add=True)
+    # Cota de armazenamento (soft) em bytes. Vazio = sem limite.
+    cota_armazenamento = models.BigIntegerField(null=True, blank=True)
+    # Organização dos arquivos no disco. Para trocar, use o comando 'migrate_media_layout'.
+    media_layout = models.CharField(max_length=16, choices=LAYOUT_CHOICES, default=LAYOUT_NOMES)
+    # Apenas empresas prontas recebem requests e são processadas pelos workers
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PROVISIONANDO, db_index=True)
 
-    # auto_create_schema é True por padrão, o que cria o schema do tenant automaticamente.
-    auto_create_schema = True
+    # O schema não é criado no save(): a criação (clonagem do schema modelo) é feita
+    # em segundo plano pelo worker 'process_tenant_jobs' (ver tenants/jobs.py).
+    auto_create_schema = False
 
     def __str__(self):
         return self.nome
 
+    @property
+    def is_ready(self):
+        return self.status == self.Status.PRONTA
+
 class Dominio(DomainMixin):
     
     pass
+
+
+class TenantJob(models.Model):
+    """
+    Tarefa de longa duração sobre o schema de uma empresa, executada fora do request
+    pelo worker 'process_tenant_jobs'. O frontend acompanha o progresso pelo id.
+    """
+    class Tipo(models.TextChoices):
+        PROVISIONAR = "provisionar", "Criação"
+        REMOVER = "remover", "Remoção"
+
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        EXECUTANDO = "executando", "Executando"
+        CONCLUIDO = "concluido", "Concluído"
+        FALHOU = "falhou", "Falhou"
+        # Criação interrompida porque a empresa foi excluída antes de ficar pronta
+        CANCELADO = "cancelado", "Cancelado"
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs")
+    # Guardado na tarefa para identificar o schema mesmo após a exclusão da empresa
+    schema_name = models.CharField(max_length=63)
+    tipo = models.CharField(max_length=16, choices=Tipo.choices)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDENTE)
+    etapa = models.CharField(max_length=64, blank=True)
+    progresso = models.PositiveSmallIntegerField(default=0)
+    detalhe = models.JSONField(default=dict, blank=True)
+    erro = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    criado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-criado_em']
+        indexes = [models.Index(fields=['status', 'criado_em'], name='tenantjob_fila_idx')]
+        verbose_name = "Tarefa de Empresa"
+        verbose_name_plural = "Tarefas de Empresas"
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.schema_name} ({self.get_status_display()})"
@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Empresa, Dominio
+from .models import Empresa, Dominio, TenantJob
 import re
 
 class TenantSerializer(serializers.ModelSerializer):
@@ -13,8 +14,8 @@ class TenantSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Empresa
-        fields = ['id', 'nome', 'schema_name', 'domain_url', 'domain', 'criado_em']
-        read_only_fields = ['id', 'criado_em', 'domain']
+        fields = ['id', 'nome', 'schema_name', 'domain_url', 'domain', 'criado_em', 'cota_armazenamento', 'media_layout', 'status']
+        read_only_fields = ['id', 'criado_em', 'domain', 'media_layout', 'status']
 
     def get_domain(self, obj):
         """
@@ -35,6 +36,9 @@ class TenantSerializer(serializers.ModelSerializer):
         if not re.match(r'^[a-z0-9_]+$', value):
             raise serializers.ValidationError("O schema deve ter apenas letras minúsculas, números e underlines.")
         
+        if value == settings.TENANT_TEMPLATE_SCHEMA:
+            raise serializers.ValidationError("Este nome de schema é reservado.")
+
         if Empresa.objects.filter(schema_name=value).exists():
             raise serializers.ValidationError("Este nome de schema já está em uso.")
         return value
@@ -55,4 +59,16 @@ class TenantSerializer(serializers.ModelSerializer):
             is_primary=True
         )
         
-        return empresa
\ No newline at end of file
+        return empresa
+
+
+class TenantJobSerializer(serializers.ModelSerializer):
+    empresa_nome = serializers.CharField(source='empresa.nome', read_only=True, allow_null=True)
+
+    class Meta:
+        model = TenantJob
+        fields = [
+            'id', 'empresa', 'empresa_nome', 'schema_name', 'tipo', 'status', 'etapa',
+            'progresso', 'detalhe', 'erro', 'tentativas', 'criado_em', 'atualizado_em', 'concluido_em',
+        ]
+        read_only_fields = fields
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TenantViewSet
+from .views import TenantViewSet, TenantJobViewSet
 
 router = DefaultRouter()
 router.register(r'tenants', TenantViewSet, basename='tenant')
+router.register(r'tenant-jobs', TenantJobViewSet, basename='tenant-job')
 
 urlpatterns = [
     path('', include(router.urls)),
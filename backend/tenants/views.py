@@ -1,14 +1,16 @@
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import APIException
 from django.db import transaction
-from django.db.models import Prefetch
-from django_tenants.utils import schema_context
+from django.db.models import Prefetch, Q
+from django_tenants.utils import get_public_schema_name, schema_context
 
-from .models import Empresa, Dominio
-from .serializers import TenantSerializer
+from .models import Empresa, Dominio, TenantJob
+from .serializers import TenantSerializer, TenantJobSerializer
 from .permissions import CanCreateDeleteTenants
+from .jobs import cancel_provisioning, enqueue_provisioning, enqueue_teardown, retry
 
 class TenantViewSet(viewsets.ModelViewSet):
     serializer_class = TenantSerializer
@@ -32,12 +34,15 @@ class TenantViewSet(viewsets.ModelViewSet):
                 to_attr='primary_domain_list' # Armazena o resultado em um novo atributo
             )
 
+            # Empresas em remoção não aparecem mais (o progresso fica em /api/tenant-jobs/)
+            ativas = ~Q(status=Empresa.Status.DESATIVADA)
+
             # Superusuários (como 'dev') podem ver todas as empresas.
             if user.is_superuser:
-                return Empresa.objects.prefetch_related(domain_prefetch).all().order_by('-criado_em')
+                return Empresa.objects.prefetch_related(domain_prefetch).filter(ativas).order_by('-criado_em')
             
             # Usuários normais só podem ver as empresas a que pertencem.
-            return user.tenants.prefetch_related(domain_prefetch).order_by('-criado_em')
+            return user.tenants.prefetch_related(domain_prefetch).filter(ativas).order_by('-criado_em')
 
         except Exception as e:
             # Captura qualquer exceção e a levanta como um erro DRF formatado.
@@ -53,7 +58,6 @@ class TenantViewSet(viewsets.ModelViewSet):
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
         # Força a operação de criação a acontecer no schema público
         with schema_context('public'):
@@ -61,15 +65,20 @@ class TenantViewSet(viewsets.ModelViewSet):
             serializer.is_valid(raise_exception=True)
 
             try:
-                empresa = serializer.save()
+                with transaction.atomic():
+                    empresa = serializer.save()
+
+                    # Adiciona o usuário que criou a empresa à própria empresa.
+                    empresa.users.add(request.user)
 
-                # Adiciona o usuário que criou a empresa à própria empresa.
-                empresa.users.add(request.user)
+                    # O schema é criado em segundo plano (worker 'process_tenant_jobs');
+                    # o frontend acompanha a tarefa em /api/tenant-jobs/<id>/
+                    job = enqueue_provisioning(empresa, request.user)
 
                 headers = self.get_success_headers(serializer.data)
                 return Response(
-                    serializer.data, 
-                    status=status.HTTP_201_CREATED, 
+                    {**serializer.data, "job": TenantJobSerializer(job).data},
+                    status=status.HTTP_202_ACCEPTED,
                     headers=headers
                 )
             except Exception as e:
@@ -81,5 +90,43 @@ class TenantViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         with schema_context('public'):
             instance = self.get_object()
-            self.perform_destroy(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+            if instance.schema_name == get_public_schema_name():
+                return Response({"detail": "O schema público não pode ser excluído."}, status=status.HTTP_400_BAD_REQUEST)
+
+            # A empresa sai do ar imediatamente (o middleware só atende empresas prontas);
+            # schema e arquivos são removidos em segundo plano pelo 'process_tenant_jobs'.
+            # Uma criação ainda na fila ou em andamento é cancelada antes.
+            with transaction.atomic():
+                Empresa.objects.filter(pk=instance.pk).update(status=Empresa.Status.DESATIVADA)
+                cancel_provisioning(instance)
+                job = enqueue_teardown(instance, request.user)
+        return Response(TenantJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class TenantJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Acompanhamento das tarefas de criação de empresas (progresso e erros) e nova
+    tentativa das que falharam.
+    """
+    serializer_class = TenantJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = TenantJob.objects.select_related('empresa')
+        if self.request.user.is_superuser:
+            return queryset
+        return queryset.filter(criado_por=self.request.user)
+
+    @action(detail=True, methods=['post'], permission_classes=[CanCreateDeleteTenants])
+    def retry(self, request, pk=None):
+        """
+        Enfileira de novo uma tarefa que esgotou as tentativas (ex: empresa com falha na
+        criação volta a 'provisionando').
+        """
+        job = self.get_object()
+        with schema_context('public'):
+            try:
+                novo = retry(job, request.user)
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(TenantJobSerializer(novo).data, status=status.HTTP_202_ACCEPTED)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, UserPermission
+from .models import CustomUser, PermissionProfile, UserPermission
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -19,3 +19,9 @@ admin.site.register(CustomUser, CustomUserAdmin)
 class UserPermissionAdmin(admin.ModelAdmin):
     list_display = ('user',)
     search_fields = ('user__username',)
+
+@admin.register(PermissionProfile)
+class PermissionProfileAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'tenant', 'versao', 'atualizado_em')
+    list_filter = ('tenant',)
+    search_fields = ('nome',)
@@ -0,0 +1,83 @@
+import statistics
+import time
+import uuid
+from django.contrib.auth.hashers import check_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from tenants.models import Empresa
+from users.models import CustomUser
+from users.serializers import MyTokenObtainPairSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o login (MyTokenObtainPairSerializer) com um usuario temporario, separando o tempo '
+        'do hash da senha, o tempo das consultas e o restante (tokens, serializer). '
+        'Nada e gravado: tudo roda em uma transacao desfeita ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Logins medidos por cenario.')
+        parser.add_argument('--tenants', type=int, default=3, help='Empresas prontas vinculadas ao usuario temporario.')
+
+    def handle(self, *args, **options):
+        empresas = list(
+            Empresa.objects.filter(status=Empresa.Status.PRONTA)
+            .exclude(schema_name='public')
+            .order_by('schema_name')[:options['tenants']]
+        )
+        if len(empresas) < 2:
+            raise CommandError("Sao necessarias ao menos 2 empresas prontas para medir a escolha de empresa.")
+
+        try:
+            with transaction.atomic():
+                self.run(empresas, options['iterations'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, empresas, iterations):
+        senha = uuid.uuid4().hex
+        user = CustomUser(username=f"benchmark_login_{uuid.uuid4().hex[:8]}", role="compras")
+        user.set_password(senha)
+        user.save()
+
+        # Custo isolado do hash (PBKDF2 com as iteracoes do hasher configurado)
+        tempos_hash = []
+        for _ in range(iterations):
+            inicio = time.perf_counter()
+            check_password(senha, user.password)
+            tempos_hash.append(time.perf_counter() - inicio)
+        hash_ms = statistics.median(tempos_hash) * 1000
+        self.stdout.write(f"Hash da senha: {hash_ms:.1f} ms (mediana de {iterations}).")
+
+        cenarios = [
+            ("uma empresa", empresas[:1], {}),
+            ("escolha de empresa", empresas, {}),
+            ("empresa escolhida", empresas, {'tenant_schema_name': empresas[-1].schema_name}),
+        ]
+        for nome, vinculadas, extra in cenarios:
+            user.tenants.set(vinculadas)
+            dados = {'username': user.username, 'password': senha, **extra}
+            totais, consultas, quantidades = [], [], []
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    serializer = MyTokenObtainPairSerializer(data=dados)
+                    serializer.is_valid(raise_exception=True)
+                    totais.append(time.perf_counter() - inicio)
+                consultas.append(sum(float(q['time']) for q in ctx.captured_queries))
+                quantidades.append(len(ctx.captured_queries))
+
+            total_ms = statistics.median(totais) * 1000
+            consultas_ms = statistics.median(consultas) * 1000
+            self.stdout.write(self.style.SUCCESS(
+                f"{nome}: total {total_ms:.1f} ms | hash ~{hash_ms:.1f} ms | "
+                f"consultas {consultas_ms:.1f} ms ({max(quantidades)} consultas) | "
+                f"restante {max(total_ms - hash_ms - consultas_ms, 0):.1f} ms"
+            ))
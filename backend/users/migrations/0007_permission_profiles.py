@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenants", "0005_tenant_teardown"),
+        ("users", "0006_userpermission_can_download_boletos_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userpermission",
+            name="overrides",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name="PermissionProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("nome", models.CharField(max_length=100)),
+                ("descricao", models.CharField(blank=True, default="", max_length=255)),
+                ("permissoes", models.JSONField(blank=True, default=dict)),
+                ("versao", models.PositiveIntegerField(default=1, editable=False)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="permission_profiles",
+                        to="tenants.empresa",
+                        verbose_name="Empresa",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Perfil de Permissões",
+                "verbose_name_plural": "Perfis de Permissões",
+                "ordering": ["nome"],
+                "unique_together": {("tenant", "nome")},
+            },
+        ),
+        migrations.AddField(
+            model_name="userpermission",
+            name="profile",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="members",
+                to="users.permissionprofile",
+                verbose_name="Perfil",
+            ),
+        ),
+    ]
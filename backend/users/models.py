@@ -1,7 +1,30 @@
+import copy
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F
+
+from core import cache, request_context
+from core.models import FieldTrackerMixin
+
+# Campos de permissão que são dicionários: perfis e ajustes por usuário mesclam as chaves
+DICT_PERMISSION_FIELDS = ("gerenciar", "relatorios", "status_limits")
+# Valor de `profile` em apply_changes que mantém o perfil atual
+KEEP_PROFILE = object()
 
-class CustomUser(AbstractUser):
+
+def merge_permissions(base, changes):
+    """Aplica `changes` sobre o dicionário completo `base` (in place), ignorando chaves desconhecidas."""
+    for key, value in (changes or {}).items():
+        if key not in base:
+            continue
+        if key in DICT_PERMISSION_FIELDS and isinstance(value, dict):
+            base[key] = {**(base[key] or {}), **value}
+        else:
+            base[key] = value
+    return base
+
+class CustomUser(FieldTrackerMixin, AbstractUser):
     ROLE_CHOICES = (
         ("administrador", "Administrador"),
         ("gestor", "Gestor"),
@@ -11,6 +34,9 @@ class CustomUser(AbstractUser):
         ("financeiro", "Financeiro"),
         ("dev", "Desenvolvedor"),
     )
+    # A senha é rastreada apenas para registrar que mudou (o valor é mascarado na auditoria)
+    tracked_fields = ("username", "email", "first_name", "last_name", "role", "is_active", "password")
+
     role = models.CharField(
        max_length=15, choices=ROLE_CHOICES, default="dev", verbose_name="Papel"
     )
@@ -54,6 +80,77 @@ class CustomUser(AbstractUser):
         ]
 
 
+class PermissionProfile(models.Model):
+    """
+    Perfil de permissões nomeado de uma empresa (ex: "Compras"). Os usuários que o
+    referenciam (UserPermission.profile) recebem as permissões do perfil, mais os seus
+    ajustes individuais (UserPermission.overrides). Alterar o perfil é uma única escrita
+    que vale para todos os membros no próximo request.
+
+    A forma compilada (padrões + permissões do perfil) fica em cache com a versão do
+    perfil na chave: cada save() incrementa `versao`, então não há invalidação a fazer.
+    """
+    tenant = models.ForeignKey(
+        "tenants.Empresa",
+        on_delete=models.CASCADE,
+        related_name="permission_profiles",
+        verbose_name="Empresa",
+    )
+    nome = models.CharField(max_length=100)
+    descricao = models.CharField(max_length=255, blank=True, default="")
+    # Mesmo formato de get_default_permissions(); chaves omitidas usam o padrão
+    permissoes = models.JSONField(default=dict, blank=True)
+    versao = models.PositiveIntegerField(default=1, editable=False)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("tenant", "nome")
+        ordering = ["nome"]
+        verbose_name = "Perfil de Permissões"
+        verbose_name_plural = "Perfis de Permissões"
+
+    def __str__(self):
+        return f"{self.nome} ({self.tenant_id})"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not kwargs.get("force_insert"):
+            # Incremento no banco: dois saves simultâneos nunca ficam com a mesma versão
+            self.versao = F("versao") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "versao", "atualizado_em"}
+        super().save(*args, **kwargs)
+        if not isinstance(self.versao, int):
+            self.refresh_from_db(fields=["versao"])
+
+    @staticmethod
+    def compile(permissoes):
+        """Permissões completas: os padrões sobrepostos pelas chaves conhecidas de `permissoes`."""
+        return merge_permissions(UserPermission.get_default_permissions(), permissoes)
+
+    @staticmethod
+    def cache_key(profile_id, versao):
+        return f"perfil:{profile_id}:v{versao}"
+
+    @staticmethod
+    def compiled_permissions(profile_id, versao=None):
+        """
+        Forma compilada do perfil, em cache por (id, versão). Sem a versão (ex: registro
+        carregado sem a anotação profile_versao), lê o perfil do banco.
+        """
+        if versao is not None:
+            compiled = cache.get(PermissionProfile.cache_key(profile_id, versao))
+            if compiled is not None:
+                return compiled
+
+        profile = PermissionProfile.objects.only("versao", "permissoes").get(pk=profile_id)
+        key = PermissionProfile.cache_key(profile_id, profile.versao)
+        compiled = cache.get(key) if versao is None else None
+        if compiled is None:
+            compiled = PermissionProfile.compile(profile.permissoes)
+            cache.set(key, compiled)
+        return compiled
+
+
 class UserPermission(models.Model):
     # Alterado de OneToOne para ForeignKey para permitir múltiplas configurações por usuário (uma por empresa)
     user = models.ForeignKey(
@@ -68,6 +165,18 @@ class UserPermission(models.Model):
         verbose_name="Empresa"
     )
 
+    # Com perfil, as permissões vêm do perfil mais os ajustes em `overrides` (apenas as
+    # chaves que diferem do perfil); os campos de permissão abaixo deixam de ser usados.
+    profile = models.ForeignKey(
+        PermissionProfile,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="members",
+        verbose_name="Perfil",
+    )
+    overrides = models.JSONField(default=dict, blank=True)
+
     # Permissões de Página
     page_dashboard = models.BooleanField(default=True)
     page_compras = models.BooleanField(default=True)
@@ -118,7 +227,7 @@ class UserPermission(models.Model):
         return {
             "page_dashboard": True,
             "page_compras": True,
-            "gerenciar": {"usuarios": False, "empresas": False, "crdiis": False},
+            "gerenciar": {"usuarios": False, "empresas": False, "crdiis": False, "auditoria": False},
             "relatorios": {
                 "geral": False,
                 "financeiro": False,
@@ -149,6 +258,26 @@ class UserPermission(models.Model):
         Retorna um dicionário com as permissões de um usuário no contexto de um tenant.
         Se o usuário for superusuário, concede todas as permissões.
         """
+        if user.is_superuser:
+            return UserPermission.resolve_permissions(user, None)
+
+        try:
+            # A versão do perfil vem no mesmo SELECT (chave do perfil compilado em cache)
+            permissions = UserPermission.objects.annotate(
+                profile_versao=F("profile__versao")
+            ).get(user=user, tenant=tenant)
+            return UserPermission.resolve_permissions(user, permissions)
+        except (UserPermission.DoesNotExist, AttributeError):
+            # O AttributeError vai pegar o caso onde colunas novas ainda não existem no DB
+            return UserPermission.get_default_permissions()
+
+    @staticmethod
+    def resolve_permissions(user, permissions):
+        """
+        Dicionário completo de permissões a partir do registro já carregado (ou None, se
+        o usuário não tiver registro na empresa). Não consulta o banco: usado também pela
+        matriz de permissões, que carrega os registros de vários usuários de uma vez.
+        """
         if user.is_superuser:
             all_permissions = UserPermission.get_default_permissions()
             all_permissions["can_delete_user"] = True  # Superuser pode deletar
@@ -168,6 +297,7 @@ class UserPermission(models.Model):
                         "usuarios": True,
                         "empresas": True,
                         "crdiis": True,
+                        "auditoria": True,
                     }
                 elif key == "relatorios":
                     all_permissions[key] = {
@@ -178,74 +308,139 @@ class UserPermission(models.Model):
                     all_permissions[key] = []
             return all_permissions
 
-        try:
-            permissions = UserPermission.objects.get(user=user, tenant=tenant)
-            
-            # Começa com os padrões para garantir a estrutura completa
-            perms_data = UserPermission.get_default_permissions()
-
-            # Atualiza com os valores salvos no banco
-            saved_data = {
-                "page_dashboard": permissions.page_dashboard,
-                "page_compras": permissions.page_compras,
-                "can_create_processo": permissions.can_create_processo,
-                "can_edit_processo": permissions.can_edit_processo,
-                "can_delete_processo": permissions.can_delete_processo,
-                "can_change_status": permissions.can_change_status,
-                "can_upload_file": permissions.can_upload_file,
-                "can_download_file": permissions.can_download_file,
-                "can_delete_file": permissions.can_delete_file,
-                "can_upload_processo": permissions.can_upload_processo,
-                "can_upload_nota_fiscal": permissions.can_upload_nota_fiscal,
-                "can_upload_boletos": permissions.can_upload_boletos,
-                "can_download_processo": permissions.can_download_processo,
-                "can_download_nota_fiscal": permissions.can_download_nota_fiscal,
-                "can_download_boletos": permissions.can_download_boletos,
-                "can_edit_user": permissions.can_edit_user,
-                "can_delete_user": permissions.can_delete_user,
-                "view_status_history": permissions.view_status_history,
-                "allowed_crdii": permissions.allowed_crdii,
-            }
-            
-            # Lida com JSONFields de forma segura, mesclando com os padrões
-            if hasattr(permissions, 'gerenciar') and isinstance(permissions.gerenciar, dict):
-                perms_data['gerenciar'].update(permissions.gerenciar)
-                saved_data['gerenciar'] = perms_data['gerenciar']
-
-            if hasattr(permissions, 'relatorios') and isinstance(permissions.relatorios, dict):
-                perms_data['relatorios'].update(permissions.relatorios)
-                saved_data['relatorios'] = perms_data['relatorios']
-            
-            if hasattr(permissions, 'status_limits') and isinstance(permissions.status_limits, dict):
-                perms_data['status_limits'].update(permissions.status_limits)
-                saved_data['status_limits'] = perms_data['status_limits']
-
-            # Atualiza o dicionário principal com todos os valores salvos
-            perms_data.update(saved_data)
-
-            return perms_data
-
-        except (UserPermission.DoesNotExist, AttributeError):
-            # O AttributeError vai pegar o caso onde colunas novas ainda não existem no DB
+        if permissions is None:
             return UserPermission.get_default_permissions()
 
+        if permissions.profile_id is not None:
+            compiled = PermissionProfile.compiled_permissions(
+                permissions.profile_id, getattr(permissions, "profile_versao", None)
+            )
+            return merge_permissions(copy.deepcopy(compiled), permissions.overrides)
+
+        # Começa com os padrões para garantir a estrutura completa
+        perms_data = UserPermission.get_default_permissions()
+
+        # Atualiza com os valores salvos no banco
+        saved_data = {
+            "page_dashboard": permissions.page_dashboard,
+            "page_compras": permissions.page_compras,
+            "can_create_processo": permissions.can_create_processo,
+            "can_edit_processo": permissions.can_edit_processo,
+            "can_delete_processo": permissions.can_delete_processo,
+            "can_change_status": permissions.can_change_status,
+            "can_upload_file": permissions.can_upload_file,
+            "can_download_file": permissions.can_download_file,
+            "can_delete_file": permissions.can_delete_file,
+            "can_upload_processo": permissions.can_upload_processo,
+            "can_upload_nota_fiscal": permissions.can_upload_nota_fiscal,
+            "can_upload_boletos": permissions.can_upload_boletos,
+            "can_download_processo": permissions.can_download_processo,
+            "can_download_nota_fiscal": permissions.can_download_nota_fiscal,
+            "can_download_boletos": permissions.can_download_boletos,
+            "can_edit_user": permissions.can_edit_user,
+            "can_delete_user": permissions.can_delete_user,
+            "view_status_history": permissions.view_status_history,
+            "allowed_crdii": permissions.allowed_crdii,
+        }
+        
+        # Lida com JSONFields de forma segura, mesclando com os padrões
+        if hasattr(permissions, 'gerenciar') and isinstance(permissions.gerenciar, dict):
+            perms_data['gerenciar'].update(permissions.gerenciar)
+            saved_data['gerenciar'] = perms_data['gerenciar']
+
+        if hasattr(permissions, 'relatorios') and isinstance(permissions.relatorios, dict):
+            perms_data['relatorios'].update(permissions.relatorios)
+            saved_data['relatorios'] = perms_data['relatorios']
+        
+        if hasattr(permissions, 'status_limits') and isinstance(permissions.status_limits, dict):
+            perms_data['status_limits'].update(permissions.status_limits)
+            saved_data['status_limits'] = perms_data['status_limits']
+
+        # Atualiza o dicionário principal com todos os valores salvos
+        perms_data.update(saved_data)
+
+        return perms_data
+
     @staticmethod
-    def update_user_permissions(user, tenant, permissions_data):
+    def clean_permissions_data(permissions_data):
         """
-        Atualiza ou cria as permissões de um usuário para um tenant específico.
+        Mantém apenas as chaves que são campos editáveis do modelo (ignora 'user',
+        'tenant', 'id' e chaves desconhecidas).
         """
-        defaults = {}
-        # Prepara os dados para atualização, ignorando chaves que não são campos do modelo
         model_fields = [f.name for f in UserPermission._meta.get_fields()]
-        
-        for key, value in permissions_data.items():
-            if key in model_fields and key not in ['user', 'tenant', 'id']:
-                defaults[key] = value
-
-        # update_or_create lida com a existência ou não do registro
-        obj, created = UserPermission.objects.update_or_create(
-            user=user,
-            tenant=tenant,
-            defaults=defaults
+        return {
+            key: value for key, value in permissions_data.items()
+            if key in model_fields and key not in ['user', 'tenant', 'id', 'profile', 'overrides']
+        }
+
+    def apply_changes(self, permissions_data, profile=KEEP_PROFILE):
+        """
+        Aplica as permissões enviadas no registro (sem salvar) e retorna os campos
+        alterados. Sem perfil, grava nos campos do registro. Com perfil, guarda em
+        `overrides` apenas o que difere do perfil (nos campos de dicionário, apenas as
+        sub-chaves diferentes). Trocar de perfil descarta os ajustes;
+        remover o perfil grava as permissões resolvidas nos campos do registro.
+        """
+        changed = set()
+        if profile is not KEEP_PROFILE and getattr(profile, "pk", None) != self.profile_id:
+            if self.profile_id is not None and profile is None:
+                # Sem perfil, o usuário mantém as permissões que tinha (gravadas nos campos)
+                compiled = PermissionProfile.compiled_permissions(
+                    self.profile_id, getattr(self, "profile_versao", None)
+                )
+                resolved = merge_permissions(copy.deepcopy(compiled), self.overrides)
+                for key, value in UserPermission.clean_permissions_data(resolved).items():
+                    setattr(self, key, value)
+                    changed.add(key)
+            self.profile = profile
+            self.profile_versao = getattr(profile, "versao", None)
+            self.overrides = {}
+            changed.update(["profile", "overrides"])
+
+        fields = UserPermission.clean_permissions_data(permissions_data)
+        if self.profile_id is None:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            return changed | fields.keys()
+
+        compiled = PermissionProfile.compiled_permissions(
+            self.profile_id, getattr(self, "profile_versao", None)
         )
+        overrides = dict(self.overrides or {})
+        for key, value in fields.items():
+            if key not in compiled:
+                continue
+            if key in DICT_PERMISSION_FIELDS and isinstance(value, dict):
+                # Sub-chave a sub-chave (merge_permissions também combina assim): uma
+                # sub-chave igual à do perfil acompanha as alterações futuras do perfil
+                base = compiled[key] or {}
+                atual = overrides.get(key) if isinstance(overrides.get(key), dict) else {}
+                diferentes = {
+                    sub: sub_value for sub, sub_value in {**atual, **value}.items()
+                    if base.get(sub) != sub_value
+                }
+                if diferentes:
+                    overrides[key] = diferentes
+                else:
+                    overrides.pop(key, None)
+            elif value == compiled[key]:
+                overrides.pop(key, None)
+            else:
+                overrides[key] = value
+        if overrides != self.overrides:
+            self.overrides = overrides
+            changed.add("overrides")
+        return changed
+
+    @staticmethod
+    def update_user_permissions(user, tenant, permissions_data, profile=KEEP_PROFILE):
+        """
+        Atualiza ou cria as permissões de um usuário para um tenant específico.
+        `profile`: PermissionProfile (ou None, para remover o perfil); omitido mantém o atual.
+        """
+        obj, created = UserPermission.objects.get_or_create(user=user, tenant=tenant)
+        changed = obj.apply_changes(permissions_data, profile)
+        if changed:
+            obj.save(update_fields=sorted(changed))
+            request_context.forget_user_permissions()
         return obj
\ No newline at end of file
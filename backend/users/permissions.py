@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission
-from .models import UserPermission
+from core.request_context import get_user_permissions
 
 # Hierarquia numérica (Deve bater com o frontend)
 ROLE_HIERARCHY = {
@@ -22,7 +22,7 @@ class IsAdminUser(BasePermission):
 
         # Verifica a permissão de página no nosso sistema customizado
         # Importante: Passamos o request.tenant para saber de qual empresa estamos falando
-        perms = UserPermission.get_user_permissions_dict(request.user, request.tenant)
+        perms = get_user_permissions(request.user, request.tenant)
         
         # A permissão para ver a página de usuários agora é controlada pela sub-chave 'usuarios'
         # dentro do campo JSON 'gerenciar'.
@@ -44,7 +44,7 @@ class CanManageUser(BasePermission):
         if request.user.role == "dev":
             return True
             
-        perms = UserPermission.get_user_permissions_dict(request.user, request.tenant)
+        perms = get_user_permissions(request.user, request.tenant)
         if not perms.get("can_edit_user", False):
             return False
 
@@ -81,9 +81,40 @@ class CanManageUser(BasePermission):
             return False
 
         # REGRA 4: Verifica a permissão específica da ação (Editar vs Excluir)
-        perms = UserPermission.get_user_permissions_dict(requesting_user, request.tenant)
+        perms = get_user_permissions(requesting_user, request.tenant)
         if view.action == 'destroy':
             return perms.get("can_delete_user", False)
         
         # Para outras ações como 'update', 'partial_update'
-        return perms.get("can_edit_user", False)
\ No newline at end of file
+        return perms.get("can_edit_user", False)
+
+def can_manage_profile(user, profile):
+    """
+    O perfil vale para todos os membros: só pode alterá-lo, excluí-lo ou atribuí-lo quem
+    poderia gerenciar cada um deles (mesmas regras de CanManageUser: ninguém além do dev
+    mexe no 'dev', nem em cargos acima do seu).
+    """
+    if user.is_superuser or user.role == "dev":
+        return True
+    requesting_user_level = ROLE_HIERARCHY.get(user.role, 0)
+    protected_roles = ["dev"] + [
+        role for role, level in ROLE_HIERARCHY.items() if level > requesting_user_level
+    ]
+    return not profile.members.filter(user__role__in=protected_roles).exists()
+
+
+class CanManagePermissionProfiles(BasePermission):
+    """
+    Define quem pode CRIAR, EDITAR ou EXCLUIR perfis de permissões (mesma permissão de
+    edição de usuários, já que o perfil altera as permissões de todos os membros).
+    """
+    message = "O perfil é usado por usuários que você não pode gerenciar."
+
+    def has_permission(self, request, view):
+        if request.user.is_superuser or request.user.role == "dev":
+            return True
+        perms = get_user_permissions(request.user, request.tenant)
+        return perms.get("can_edit_user", False)
+
+    def has_object_permission(self, request, view, obj):
+        return can_manage_profile(request.user, obj)
@@ -1,10 +1,14 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from django.contrib.auth.models import Group
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenObtainSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from django.contrib.auth.models import Group, update_last_login
 from django.contrib.auth.hashers import make_password
-from .models import CustomUser, UserPermission
+from .models import CustomUser, PermissionProfile, UserPermission
 from tenants.models import Empresa
 from tenants.serializers import TenantSerializer
+from .tokens import RefreshToken, allowed_tenant, bind_tenant
 
 # ---------------------------------------------------------------------
 #                >>> LÓGICA DE LOGIN INTELIGENTE <<<
@@ -12,6 +16,7 @@ from tenants.serializers import TenantSerializer
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     # Tornamos opcional, pois no primeiro passo (apenas user+senha) ele não é enviado
     tenant_schema_name = serializers.CharField(write_only=True, required=False)
+    token_class = RefreshToken
 
     @classmethod
     def get_token(cls, user):
@@ -22,61 +27,68 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
 
     def validate(self, attrs):
         # 1. Autentica Usuário e Senha (padrão JWT)
-        # Se a senha estiver errada, o 'super().validate' já lança erro 401 aqui.
-        data = super().validate(attrs)
+        # Se a senha estiver errada, o TokenObtainSerializer já lança erro 401 aqui.
+        # Os tokens são gerados uma única vez, ao final, já com a empresa escolhida.
+        TokenObtainSerializer.validate(self, attrs)
 
         # 2. Verifica se o frontend enviou uma empresa específica
         tenant_schema_name = attrs.get('tenant_schema_name')
         
-        # 3. Carrega as empresas vinculadas a este usuário
-        user_tenants = self.user.tenants.all()
-        tenant_count = user_tenants.count()
+        # 3. Carrega as empresas vinculadas a este usuário (apenas as prontas) em uma
+        # única consulta, reaproveitada por todos os cenários abaixo
+        user_tenants = list(
+            Empresa.objects.filter(users=self.user, status=Empresa.Status.PRONTA)
+            .order_by('nome')
+            .values_list('schema_name', 'nome', named=True)
+        )
         selected_tenant = None
 
         if tenant_schema_name:
             # --- PASSO 2: Login com Empresa Selecionada ---
-            try:
-                # Tenta buscar na lista de permitidas do usuário
-                selected_tenant = user_tenants.get(schema_name=tenant_schema_name)
-            except Empresa.DoesNotExist:
+            # Tenta buscar na lista de permitidas do usuário
+            selected_tenant = next((t for t in user_tenants if t.schema_name == tenant_schema_name), None)
+            if selected_tenant is None:
                 # Se for superusuário (Dev), permite acessar qualquer uma ou o Public
-                if self.user.is_superuser:
-                    try:
-                        selected_tenant = Empresa.objects.get(schema_name=tenant_schema_name)
-                    except Empresa.DoesNotExist:
-                         raise serializers.ValidationError({"detail": "Empresa não encontrada."})
-                else:
+                if not self.user.is_superuser:
                     raise serializers.ValidationError({"detail": "Você não tem permissão nesta empresa."})
+                selected_tenant = allowed_tenant(self.user, tenant_schema_name)
+                if selected_tenant is None:
+                    raise serializers.ValidationError({"detail": "Empresa não encontrada."})
         
         else:
             # --- PASSO 1: Login Inicial (Só User + Senha) ---
             
-            if tenant_count == 0:
+            if not user_tenants:
                 # Se for Dev sem empresa, tentamos conectar no 'public' para ele não ficar trancado fora
                 if self.user.is_superuser:
-                    try:
-                        selected_tenant = Empresa.objects.get(schema_name='public')
-                    except Empresa.DoesNotExist:
-                        pass # Segue sem tenant (modo global restrito)
+                    selected_tenant = Empresa.objects.filter(schema_name='public').only('schema_name', 'nome').first()
+                    # Sem o public, segue sem tenant (modo global restrito)
                 else:
                     raise serializers.ValidationError({"detail": "Seu usuário não está vinculado a nenhuma empresa."})
 
-            elif tenant_count == 1:
+            elif len(user_tenants) == 1:
                 # CENÁRIO PERFEITO: Só tem uma empresa, entra direto!
-                selected_tenant = user_tenants.first()
+                selected_tenant = user_tenants[0]
             
             else:
                 # CENÁRIO MÚLTIPLAS: Retorna a lista para o frontend abrir o modal
-                # Note que NÃO retornamos 'access' nem 'refresh' aqui, pois o login não terminou.
+                # Não retornamos 'access' aqui, pois o login não terminou. O refresh (sem
+                # empresa) permite concluir a escolha em /auth/switch-tenant/ sem reenviar a senha.
                 return {
-                    'action': 'select_tenant', 
+                    'action': 'select_tenant',
+                    'refresh': str(self.get_token(self.user)),
                     'tenants': [
                         {'schema_name': t.schema_name, 'nome': t.nome} 
                         for t in user_tenants
                     ]
                 }
 
-        # 4. Se definimos um tenant (login concluído), adicionamos info extra
+        # 4. Login concluído: os tokens são vinculados à empresa escolhida (se houver)
+        refresh = bind_tenant(self.get_token(self.user), selected_tenant)
+        data = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+
         if selected_tenant:
             data['tenant'] = {
                 'schema_name': selected_tenant.schema_name,
@@ -85,6 +97,50 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         
         return data
 
+
+class TenantSwitchSerializer(serializers.Serializer):
+    """
+    Troca um refresh token válido por um novo par de tokens vinculado a outra empresa
+    do usuário, sem nova autenticação por senha.
+    """
+    refresh = serializers.CharField(write_only=True)
+    tenant_schema_name = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        try:
+            old_refresh = RefreshToken(attrs['refresh'])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        user_id = old_refresh.get(jwt_settings.USER_ID_CLAIM)
+        user = CustomUser.objects.filter(
+            **{jwt_settings.USER_ID_FIELD: user_id}, is_active=True
+        ).first()
+        if user is None:
+            raise InvalidToken("Usuário não encontrado ou inativo.")
+
+        tenant = allowed_tenant(user, attrs['tenant_schema_name'])
+        if tenant is None:
+            raise serializers.ValidationError({"detail": "Você não tem permissão nesta empresa."})
+
+        if jwt_settings.ROTATE_REFRESH_TOKENS and jwt_settings.BLACKLIST_AFTER_ROTATION:
+            try:
+                old_refresh.blacklist()
+            except TokenError as e:
+                raise InvalidToken(e.args[0])
+
+        refresh = bind_tenant(MyTokenObtainPairSerializer.get_token(user), tenant)
+        return {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'tenant': {'schema_name': tenant.schema_name, 'nome': tenant.nome},
+        }
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Renovação que rejeita tokens revogados e revoga o token usado (rotação)."""
+    token_class = RefreshToken
+
+
 # ... (Mantenha o restante dos serializers LoggedInUserSerializer, UserSerializer, etc. iguais) ...
 # Copie o resto do arquivo original aqui abaixo se não houver mudanças neles.
 class LoggedInUserSerializer(serializers.ModelSerializer):
@@ -127,6 +183,39 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["is_staff", "is_superuser", "groups", "tenants"]
 
+class PermissionProfileSerializer(serializers.ModelSerializer):
+    membros = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PermissionProfile
+        fields = ["id", "nome", "descricao", "permissoes", "versao", "atualizado_em", "membros"]
+        read_only_fields = ["versao", "atualizado_em"]
+
+    def get_membros(self, obj):
+        # A listagem já traz a contagem anotada (PermissionProfileViewSet.get_queryset)
+        if hasattr(obj, "num_membros"):
+            return obj.num_membros
+        return obj.members.count()
+
+    def validate_nome(self, value):
+        tenant = self.context["request"].tenant
+        duplicados = PermissionProfile.objects.filter(tenant=tenant, nome=value)
+        if self.instance is not None:
+            duplicados = duplicados.exclude(pk=self.instance.pk)
+        if duplicados.exists():
+            raise serializers.ValidationError("Já existe um perfil com este nome nesta empresa.")
+        return value
+
+    def validate_permissoes(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Informe um objeto com as permissões.")
+        conhecidas = UserPermission.get_default_permissions()
+        desconhecidas = sorted(set(value) - set(conhecidas))
+        if desconhecidas:
+            raise serializers.ValidationError(f"Permissões desconhecidas: {desconhecidas}")
+        return value
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
@@ -0,0 +1,156 @@
+"""
+Perfis de permissões (users/models.py): resolução perfil + ajustes, gravação esparsa
+dos ajustes e remoção do perfil. O perfil compilado vem do cache (LocMemCache dos
+testes); o banco não é usado.
+"""
+from unittest import mock
+
+from django.core.cache import cache as django_cache
+from django.test import SimpleTestCase
+
+from core import cache
+from users.models import KEEP_PROFILE, PermissionProfile, UserPermission, merge_permissions
+
+PERFIL_ID = 7
+VERSAO = 3
+PERMISSOES_PERFIL = {
+    "can_create_processo": True,
+    "gerenciar": {"usuarios": True},
+    "status_limits": {"parcial": True, "concluido": True},
+}
+
+
+def _registro(overrides=None):
+    perm = UserPermission(profile_id=PERFIL_ID, overrides=overrides or {})
+    perm.profile_versao = VERSAO
+    return perm
+
+
+class MergePermissionsTests(SimpleTestCase):
+    def test_dicionarios_sao_combinados_por_sub_chave(self):
+        base = UserPermission.get_default_permissions()
+        merge_permissions(base, {"gerenciar": {"crdiis": True}, "can_edit_user": True})
+
+        self.assertEqual(
+            base["gerenciar"], {"usuarios": False, "empresas": False, "crdiis": True, "auditoria": False}
+        )
+        self.assertTrue(base["can_edit_user"])
+
+    def test_chaves_desconhecidas_sao_ignoradas(self):
+        base = UserPermission.get_default_permissions()
+        merge_permissions(base, {"inexistente": True, "profile": 1})
+
+        self.assertEqual(base, UserPermission.get_default_permissions())
+
+
+class CompiledPermissionsTests(SimpleTestCase):
+    def setUp(self):
+        django_cache.clear()
+
+    def test_perfil_compilado_sobre_os_padroes(self):
+        compiled = PermissionProfile.compile(PERMISSOES_PERFIL)
+
+        self.assertTrue(compiled["can_create_processo"])
+        self.assertFalse(compiled["can_edit_processo"])
+        self.assertEqual(compiled["gerenciar"]["usuarios"], True)
+        self.assertEqual(compiled["gerenciar"]["empresas"], False)
+
+    def test_com_a_versao_usa_o_cache_sem_o_banco(self):
+        compiled = PermissionProfile.compile(PERMISSOES_PERFIL)
+        cache.set(PermissionProfile.cache_key(PERFIL_ID, VERSAO), compiled)
+
+        with mock.patch.object(PermissionProfile.objects, "only") as only:
+            self.assertEqual(PermissionProfile.compiled_permissions(PERFIL_ID, VERSAO), compiled)
+        only.assert_not_called()
+
+    def test_sem_cache_le_o_perfil_e_guarda_pela_versao_do_banco(self):
+        perfil = PermissionProfile(pk=PERFIL_ID, versao=VERSAO + 1, permissoes=PERMISSOES_PERFIL)
+        with mock.patch.object(PermissionProfile.objects, "only") as only:
+            only.return_value.get.return_value = perfil
+            compiled = PermissionProfile.compiled_permissions(PERFIL_ID, VERSAO)
+
+        self.assertTrue(compiled["can_create_processo"])
+        self.assertEqual(cache.get(PermissionProfile.cache_key(PERFIL_ID, VERSAO + 1)), compiled)
+
+
+class ApplyChangesTests(SimpleTestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.compiled = PermissionProfile.compile(PERMISSOES_PERFIL)
+        cache.set(PermissionProfile.cache_key(PERFIL_ID, VERSAO), self.compiled)
+
+    def test_resolucao_perfil_mais_ajustes(self):
+        perm = _registro({"can_edit_user": True, "gerenciar": {"crdiis": True}})
+        resolved = UserPermission.resolve_permissions(mock.Mock(is_superuser=False), perm)
+
+        self.assertTrue(resolved["can_create_processo"])
+        self.assertTrue(resolved["can_edit_user"])
+        self.assertEqual(resolved["gerenciar"]["usuarios"], True)
+        self.assertEqual(resolved["gerenciar"]["crdiis"], True)
+        # O perfil em cache não é alterado pelos ajustes
+        self.assertFalse(self.compiled["gerenciar"]["crdiis"])
+
+    def test_ajuste_igual_ao_perfil_nao_e_guardado(self):
+        perm = _registro({"can_create_processo": False})
+        changed = perm.apply_changes({"can_create_processo": True, "can_edit_user": True})
+
+        self.assertEqual(changed, {"overrides"})
+        self.assertEqual(perm.overrides, {"can_edit_user": True})
+
+    def test_dicionario_guarda_apenas_as_sub_chaves_diferentes(self):
+        perm = _registro()
+        # O frontend envia o dicionário inteiro
+        perm.apply_changes({"gerenciar": {**self.compiled["gerenciar"], "crdiis": True}})
+
+        self.assertEqual(perm.overrides, {"gerenciar": {"crdiis": True}})
+
+    def test_sub_chave_igual_ao_perfil_remove_o_ajuste(self):
+        perm = _registro({"status_limits": {"parcial": False, "cancelado": True}})
+        perm.apply_changes({"status_limits": {"parcial": True, "concluido": True, "cancelado": True}})
+        self.assertEqual(perm.overrides, {"status_limits": {"cancelado": True}})
+
+        perm.apply_changes({"can_create_processo": True, "gerenciar": {"usuarios": True}})
+        self.assertEqual(perm.overrides, {"status_limits": {"cancelado": True}})
+
+    def test_sub_chave_nao_ajustada_acompanha_o_perfil(self):
+        perm = _registro()
+        perm.apply_changes({"gerenciar": {**self.compiled["gerenciar"], "crdiis": True}})
+
+        # Nova versão do perfil tira 'usuarios': o membro deixa de ter, pois não o ajustou
+        novo = PermissionProfile.compile({**PERMISSOES_PERFIL, "gerenciar": {"usuarios": False}})
+        cache.set(PermissionProfile.cache_key(PERFIL_ID, VERSAO + 1), novo)
+        perm.profile_versao = VERSAO + 1
+        resolved = UserPermission.resolve_permissions(mock.Mock(is_superuser=False), perm)
+
+        self.assertFalse(resolved["gerenciar"]["usuarios"])
+        self.assertTrue(resolved["gerenciar"]["crdiis"])
+
+    def test_manter_o_perfil(self):
+        perm = _registro({"can_edit_user": True})
+        changed = perm.apply_changes({}, KEEP_PROFILE)
+
+        self.assertEqual(changed, set())
+        self.assertEqual(perm.profile_id, PERFIL_ID)
+
+    def test_remover_o_perfil_grava_as_permissoes_resolvidas(self):
+        perm = _registro({"can_edit_user": True, "gerenciar": {"crdiis": True}})
+        changed = perm.apply_changes({"can_delete_user": True}, profile=None)
+
+        self.assertIsNone(perm.profile_id)
+        self.assertEqual(perm.overrides, {})
+        self.assertTrue(perm.can_create_processo)
+        self.assertTrue(perm.can_edit_user)
+        self.assertTrue(perm.can_delete_user)
+        self.assertEqual(perm.gerenciar["usuarios"], True)
+        self.assertEqual(perm.gerenciar["crdiis"], True)
+        self.assertTrue({"profile", "overrides", "can_create_processo", "can_delete_user"} <= changed)
+
+    def test_trocar_de_perfil_descarta_os_ajustes(self):
+        outro = PermissionProfile(pk=PERFIL_ID + 1, versao=1, permissoes={})
+        cache.set(PermissionProfile.cache_key(outro.pk, 1), PermissionProfile.compile({}))
+        perm = _registro({"can_edit_user": True})
+        changed = perm.apply_changes({}, outro)
+
+        self.assertEqual(perm.profile_id, outro.pk)
+        self.assertEqual(perm.overrides, {})
+        self.assertEqual(changed, {"profile", "overrides"})
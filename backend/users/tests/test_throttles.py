@@ -0,0 +1,119 @@
+"""
+Throttles com contadores no Redis (users/throttles.py).
+
+Usam o fakeredis (com suporte a Lua) no lugar do Redis; sem ele, os testes que
+precisam do Redis são ignorados. Não usam o banco.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from users import throttles
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  (necessário para o EVALSHA do fakeredis)
+except ImportError:
+    fakeredis = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+LIMITE = 10
+
+
+class _IPThrottle(throttles.IPRateThrottle):
+    scope = "teste"
+    rate = f"{LIMITE}/hour"
+
+
+def _request(ip="10.0.0.1", data=None):
+    factory_request = APIRequestFactory().post("/api/auth/login/", data or {}, format="json", REMOTE_ADDR=ip)
+    return APIView().initialize_request(factory_request)
+
+
+class ThrottleTestCase(SimpleTestCase):
+    def setUp(self):
+        throttles._script = None
+        cache.clear()
+
+    def allow(self, throttle_class=_IPThrottle, **kwargs):
+        # Uma instância por chamada, como o DRF faz em cada request
+        return throttle_class().allow_request(_request(**kwargs), None)
+
+
+@skipUnless(fakeredis is not None, "fakeredis[lua] não instalado")
+class SlidingWindowRedisTests(ThrottleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        patcher = mock.patch.object(throttles, "get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_chamadas_concorrentes_admitem_exatamente_o_limite(self):
+        total = 80
+        barreira = threading.Barrier(16)
+
+        def chamar(_):
+            if _ < 16:
+                barreira.wait()
+            return self.allow()
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            resultados = list(executor.map(chamar, range(total)))
+
+        self.assertEqual(sum(resultados), LIMITE)
+        # Tudo foi contado no Redis (nenhuma chamada caiu no cache local)
+        self.assertTrue(self.redis.keys("throttle:teste:10.0.0.1:*"))
+
+    def test_chaves_independentes(self):
+        for _ in range(LIMITE):
+            self.assertTrue(self.allow(ip="10.0.0.1"))
+        self.assertFalse(self.allow(ip="10.0.0.1"))
+        self.assertTrue(self.allow(ip="10.0.0.2"))
+
+    def test_wait_informa_o_tempo_ate_liberar(self):
+        for _ in range(LIMITE):
+            self.allow()
+        throttle = _IPThrottle()
+        self.assertFalse(throttle.allow_request(_request(), None))
+        self.assertGreater(throttle.wait(), 0)
+
+    def test_login_separa_usuarios_do_mesmo_ip(self):
+        with mock.patch.object(throttles.LoginRateThrottle, "rate", "2/hour", create=True):
+            for _ in range(2):
+                self.assertTrue(self.allow(throttles.LoginRateThrottle, data={"username": "ana"}))
+            self.assertFalse(self.allow(throttles.LoginRateThrottle, data={"username": "Ana "}))
+            self.assertTrue(self.allow(throttles.LoginRateThrottle, data={"username": "bruno"}))
+
+
+class SlidingWindowFallbackTests(ThrottleTestCase):
+    def test_sem_redis_usa_o_cache_local(self):
+        with mock.patch.object(throttles, "get_redis", return_value=None):
+            resultados = [self.allow() for _ in range(LIMITE + 5)]
+        self.assertEqual(sum(resultados), LIMITE)
+        self.assertFalse(resultados[-1])
+
+    @skipUnless(redis is not None, "pacote redis não instalado")
+    def test_erro_do_redis_cai_no_cache_local(self):
+        client = mock.Mock()
+        client.register_script.return_value = mock.Mock(side_effect=redis.ConnectionError("fora do ar"))
+        with mock.patch.object(throttles, "get_redis", return_value=client), \
+                mock.patch.object(throttles, "mark_unavailable") as mark_unavailable:
+            resultados = [self.allow() for _ in range(LIMITE + 5)]
+
+        self.assertEqual(sum(resultados), LIMITE)
+        mark_unavailable.assert_called()
+
+    def test_logout_nao_tem_throttle(self):
+        from users.views import LogoutView
+
+        self.assertEqual(LogoutView().get_throttles(), [])
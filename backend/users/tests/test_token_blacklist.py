@@ -0,0 +1,77 @@
+"""
+Lista de tokens revogados (users/token_blacklist.py) com o Redis fora do ar: a
+renovação é recusada (503) em vez de aceitar um token possivelmente revogado. Não usa
+o banco.
+"""
+import json
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from users import token_blacklist
+from users.token_blacklist import BlacklistUnavailable, RedisBlacklist
+from users.tokens import RefreshToken
+from users.views import CookieTokenRefreshView, LogoutView
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class _FailingRedis:
+    def exists(self, *args):
+        raise redis.ConnectionError("conexão recusada")
+
+    def set(self, *args, **kwargs):
+        raise redis.ConnectionError("conexão recusada")
+
+
+@skipUnless(redis, "pacote redis não instalado")
+@override_settings(
+    REDIS_URL="redis://indisponivel:6379/0",
+    TOKEN_BLACKLIST_BACKEND="users.token_blacklist.RedisBlacklist",
+)
+class RedisUnavailableTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(token_blacklist, "get_redis", return_value=_FailingRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(token_blacklist, "mark_unavailable")
+        self.mark_unavailable = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_consulta_e_revogacao_falham_fechado(self):
+        blacklist = RedisBlacklist()
+        with self.assertLogs("users.token_blacklist", level="ERROR"):
+            with self.assertRaises(BlacklistUnavailable):
+                blacklist.is_revoked("abc")
+        with self.assertLogs("users.token_blacklist", level="ERROR"):
+            with self.assertRaises(BlacklistUnavailable):
+                blacklist.revoke("abc", 60)
+        self.assertEqual(self.mark_unavailable.call_count, 2)
+
+    def test_redis_suspenso_tambem_recusa(self):
+        with mock.patch.object(token_blacklist, "get_redis", return_value=None):
+            with self.assertLogs("users.token_blacklist", level="ERROR"):
+                with self.assertRaises(BlacklistUnavailable):
+                    RedisBlacklist().is_revoked("abc")
+
+    def test_renovacao_recusada_com_503(self):
+        token = str(RefreshToken())
+        request = APIRequestFactory().post("/api/auth/token/refresh/", {"refresh": token}, format="json")
+        view = CookieTokenRefreshView.as_view(throttle_classes=[])
+        with self.assertLogs("users.token_blacklist", level="ERROR"):
+            response = view(request)
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn("access_token", response.cookies)
+
+    def test_logout_remove_os_cookies_mesmo_assim(self):
+        token = str(RefreshToken())
+        request = APIRequestFactory().post("/api/auth/logout/", {"refresh": token}, format="json")
+        with self.assertLogs("users.token_blacklist", level="ERROR"):
+            response = LogoutView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies["refresh_token"].value, "")
+        self.assertEqual(json.loads(response.rendered_content), {"message": "Logged out successfully"})
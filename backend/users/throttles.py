@@ -1,8 +1,176 @@
-from rest_framework.throttling import AnonRateThrottle
+"""
+Throttles compartilhados entre workers e servidores.
+
+Os contadores ficam no Redis (core/redis_client.py) e usam uma janela deslizante
+aproximada: a contagem da janela atual somada à da janela anterior, ponderada pela
+fração dela que ainda está dentro do período. A verificação e o incremento rodam em um
+único script Lua (atômico), com o relógio do próprio Redis, então N workers gunicorn
+respeitam o mesmo limite e os contadores sobrevivem a deploys.
+
+Sem Redis, os throttles voltam ao comportamento padrão do DRF (cache local de cada
+processo).
+
+Nenhum throttle é global: cada view declara os seus (login, renovação de token, troca
+de empresa). O logout não tem limite.
+"""
+import math
+
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from core.redis_client import errors, get_redis, mark_unavailable
+
+SLIDING_WINDOW_SCRIPT = """
+local duracao = tonumber(ARGV[2])
+local limite = tonumber(ARGV[1])
+local agora = redis.call('TIME')
+local agora_ms = tonumber(agora[1]) * 1000 + math.floor(tonumber(agora[2]) / 1000)
+local janela = math.floor(agora_ms / duracao)
+local decorrido = agora_ms - janela * duracao
+local chave_atual = KEYS[1] .. ':' .. janela
+local atual = tonumber(redis.call('GET', chave_atual) or '0')
+local anterior = tonumber(redis.call('GET', KEYS[1] .. ':' .. (janela - 1)) or '0')
+local estimado = anterior * (duracao - decorrido) / duracao + atual
+if estimado + 1 > limite then
+    return {0, duracao - decorrido}
+end
+redis.call('INCR', chave_atual)
+redis.call('PEXPIRE', chave_atual, duracao * 2)
+return {1, 0}
+"""
+
+_script = None
+
+
+def _sliding_window(client):
+    # O script é enviado por EVALSHA (e recarregado automaticamente se o Redis reiniciar)
+    global _script
+    if _script is None or _script.registered_client is not client:
+        _script = client.register_script(SLIDING_WINDOW_SCRIPT)
+    return _script
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Base dos throttles do projeto. As subclasses definem `scope` e `get_cache_key`,
+    como nos throttles do DRF.
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+    wait_seconds = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        client = get_redis()
+        if client is None:
+            return super().allow_request(request, view)
+        try:
+            permitido, espera_ms = _sliding_window(client)(
+                keys=[self.key], args=[self.num_requests, int(self.duration * 1000)]
+            )
+        except errors() as e:
+            mark_unavailable(e)
+            return super().allow_request(request, view)
+
+        self.wait_seconds = math.ceil(espera_ms / 1000) if not permitido else None
+        return bool(permitido)
+
+    def wait(self):
+        if self.wait_seconds is not None:
+            return self.wait_seconds
+        # Fallback local: o DRF calcula a partir do histórico em cache
+        if hasattr(self, 'history'):
+            return super().wait()
+        return None
+
+
+class IPRateThrottle(SlidingWindowRateThrottle):
+    """Requests por IP."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginRateThrottle(SlidingWindowRateThrottle):
+    """
+    Tentativas de login (credenciais) por IP e usuário informado: usuários diferentes
+    atrás do mesmo IP (NAT do escritório) não dividem o limite.
+    """
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request, 'data') else None
+        ident = self.get_ident(request)
+        if isinstance(username, str) and username.strip():
+            ident = f"{ident}:{username.strip().lower()}"
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginIPRateThrottle(IPRateThrottle):
+    """Limite mais alto, por IP, para tentativas de login com vários usuários diferentes."""
+    scope = 'login_ip'
+
+
+class RefreshTokenRateThrottle(SlidingWindowRateThrottle):
+    """
+    Renovações de token por usuário (claim user_id do refresh token do cookie ou do
+    corpo). Um token inválido é contado pelo IP, sem consultar a lista de revogados.
+    """
+    scope = 'token_refresh'
+
+    def get_cache_key(self, request, view):
+        raw_token = request.COOKIES.get('refresh_token')
+        if not raw_token and hasattr(request, 'data'):
+            raw_token = request.data.get('refresh')
+        ident = None
+        if isinstance(raw_token, str) and raw_token:
+            try:
+                user_id = UntypedToken(raw_token).get(jwt_settings.USER_ID_CLAIM)
+            except TokenError:
+                user_id = None
+            if user_id is not None:
+                ident = f"user:{user_id}"
+        if ident is None:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class TenantSwitchRateThrottle(RefreshTokenRateThrottle):
+    """Trocas de empresa por usuário (mesma identificação da renovação de token)."""
+    scope = 'tenant_switch'
+
+
+class AnonRateThrottle(IPRateThrottle):
+    """Requests anônimos, por IP (usuários autenticados não são limitados aqui)."""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
 
 class CheckTenantThrottle(AnonRateThrottle):
+    scope = 'check_tenant'
     rate = '5/min' # Permite apenas 5 tentativas por minuto por IP
 
-class LoginRateThrottle(AnonRateThrottle):
-    scope = 'login'
-    rate = '5/min'
+
+class TenantUserRateThrottle(SlidingWindowRateThrottle):
+    """
+    Requests autenticados, por usuário e empresa: o mesmo usuário tem um limite
+    independente em cada empresa. Não é aplicado por padrão (use em throttle_classes).
+    """
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        tenant = getattr(request, 'tenant', None)
+        schema_name = getattr(tenant, 'schema_name', None) or '-'
+        return self.cache_format % {'scope': self.scope, 'ident': f"{schema_name}:{request.user.pk}"}
@@ -0,0 +1,147 @@
+"""
+Lista de refresh tokens revogados (JTI), sem tabela no banco.
+
+Com ROTATE_REFRESH_TOKENS, cada renovação (ou troca de empresa) revoga o refresh token
+usado, e o logout revoga o token do cookie. Cada JTI fica guardado apenas pelo tempo
+de vida que restava ao token (depois disso o próprio token já é rejeitado pela
+validade), então a lista não cresce.
+
+Backends (TOKEN_BLACKLIST_BACKEND):
+- RedisBlacklist (padrão): compartilhado por todos os workers. Não falha aberto: com o
+  Redis configurado (REDIS_URL) mas fora do ar, a lista não pode ser consultada nem
+  alterada e renovações e trocas de empresa são recusadas (503, BlacklistUnavailable,
+  registrado no log como erro) em vez de aceitar tokens que outro worker já revogou.
+  Sem REDIS_URL (desenvolvimento, um processo) usa uma MemoryBlacklist local.
+- MemoryBlacklist: em memória, por processo; substituto para testes e desenvolvimento.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.test.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.redis_client import errors, get_redis, mark_unavailable
+
+
+logger = logging.getLogger(__name__)
+
+
+class BlacklistUnavailable(APIException):
+    """A lista de tokens revogados não pôde ser consultada ou alterada."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Serviço de autenticação temporariamente indisponível. Tente novamente."
+    default_code = "blacklist_unavailable"
+
+
+def _remaining(token):
+    """Segundos até o token expirar (0 se já expirou)."""
+    return max(int(token["exp"] - time.time()), 0)
+
+
+class MemoryBlacklist:
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        for jti in [jti for jti, expira in self._revoked.items() if expira <= now]:
+            del self._revoked[jti]
+
+    def revoke(self, jti, ttl):
+        """Revoga o JTI; retorna False se ele já estava revogado."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            if jti in self._revoked:
+                return False
+            self._revoked[jti] = now + ttl
+            return True
+
+    def is_revoked(self, jti):
+        with self._lock:
+            expira = self._revoked.get(jti)
+            return expira is not None and expira > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+
+
+class RedisBlacklist:
+    key_format = "jwt:revogado:{}"
+
+    def __init__(self):
+        # Sem REDIS_URL não há outros workers com quem compartilhar a lista
+        self.local = None if settings.REDIS_URL else MemoryBlacklist()
+
+    def _unavailable(self, error):
+        logger.error("Lista de tokens revogados indisponível (Redis): %s", error)
+        return BlacklistUnavailable()
+
+    def _client(self):
+        client = get_redis()
+        if client is None:
+            # Redis suspenso após uma falha recente (REDIS_RETRY_INTERVAL)
+            raise self._unavailable("sem conexão")
+        return client
+
+    def revoke(self, jti, ttl):
+        if self.local is not None:
+            return self.local.revoke(jti, ttl)
+        client = self._client()
+        try:
+            # SET NX: verificação e revogação atômicas entre workers
+            return bool(client.set(self.key_format.format(jti), 1, ex=ttl, nx=True))
+        except errors() as e:
+            mark_unavailable(e)
+            raise self._unavailable(e)
+
+    def is_revoked(self, jti):
+        if self.local is not None:
+            return self.local.is_revoked(jti)
+        client = self._client()
+        try:
+            return bool(client.exists(self.key_format.format(jti)))
+        except errors() as e:
+            mark_unavailable(e)
+            raise self._unavailable(e)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_blacklist():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.TOKEN_BLACKLIST_BACKEND)()
+        return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    # Permite trocar o backend em testes com override_settings
+    global _backend
+    if setting == "TOKEN_BLACKLIST_BACKEND":
+        _backend = None
+
+
+def revoke(token):
+    """
+    Revoga o refresh token pelo tempo de vida restante. Retorna False se ele já estava
+    revogado (ex: a mesma renovação enviada duas vezes).
+    """
+    ttl = _remaining(token)
+    if not ttl:
+        return True
+    return get_blacklist().revoke(token["jti"], ttl)
+
+
+def is_revoked(token):
+    return get_blacklist().is_revoked(token["jti"])
@@ -0,0 +1,76 @@
+"""
+Tokens JWT vinculados a uma empresa.
+
+O schema da empresa escolhida vai no claim 'tenant' do refresh token e é copiado para
+os access tokens gerados a partir dele (inclusive na renovação). O
+TenantIdentificationMiddleware usa esse claim em vez do header X-Tenant-ID.
+Trocar de empresa não exige nova senha: o refresh token atual é trocado por um novo
+par de tokens vinculado à outra empresa (TenantSwitchView).
+
+Refresh tokens são revogáveis (users/token_blacklist.py): o token usado numa renovação
+ou troca de empresa é revogado (BLACKLIST_AFTER_ROTATION), assim como o do logout.
+"""
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tenants.models import Empresa
+from . import token_blacklist
+
+TENANT_CLAIM = "tenant"
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    Refresh token com a mesma interface do token_blacklist do simplejwt (blacklist() e a
+    verificação na validação), mas guardando os JTIs revogados em token_blacklist.
+    """
+
+    def verify(self):
+        super().verify()
+        if token_blacklist.is_revoked(self):
+            raise TokenError("Token revogado.")
+
+    def blacklist(self):
+        # Revogação atômica: duas renovações simultâneas com o mesmo token não passam
+        if not token_blacklist.revoke(self):
+            raise TokenError("Token já utilizado.")
+
+
+def bind_tenant(refresh, tenant):
+    """Vincula o refresh token (e os access tokens derivados) à empresa."""
+    if tenant is not None:
+        refresh[TENANT_CLAIM] = tenant.schema_name
+    return refresh
+
+
+def allowed_tenant(user, schema_name):
+    """
+    Empresa pronta `schema_name` que o usuário pode acessar, ou None. Uma única
+    consulta: o schema_name é único e o vínculo usuário/empresa usa o índice único da
+    tabela intermediária.
+    """
+    tenants = Empresa.objects.filter(schema_name=schema_name, status=Empresa.Status.PRONTA)
+    if not user.is_superuser:
+        tenants = tenants.filter(users=user)
+    return tenants.only("id", "schema_name", "nome").first()
+
+
+def tenant_from_request(request):
+    """
+    Schema vinculado ao access token do request (header Authorization ou cookie), sem
+    consultar o banco. Retorna None se não houver token válido ou se ele não tiver o claim.
+    """
+    header = request.META.get(api_settings.AUTH_HEADER_NAME, "")
+    parts = header.split()
+    if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+        raw_token = parts[1]
+    else:
+        raw_token = request.COOKIES.get("access_token")
+    if not raw_token:
+        return None
+    try:
+        return AccessToken(raw_token).get(TENANT_CLAIM)
+    except TokenError:
+        return None
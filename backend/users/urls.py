@@ -1,14 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CookieTokenObtainPairView, UserManagementViewSet, CurrentUserView, LogoutView
+from .views import CookieTokenObtainPairView, PermissionProfileViewSet, UserManagementViewSet, CurrentUserView, LogoutView, TenantSwitchView
 
 router = DefaultRouter()
 router.register(r"users", UserManagementViewSet, basename="users")
+router.register(r"permission-profiles", PermissionProfileViewSet, basename="permission-profiles")
 
 urlpatterns = [
     # A rota principal de login
     path("login/", CookieTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("logout/", LogoutView.as_view(), name="logout"),
+    # Troca de empresa com o refresh token atual (sem reenviar a senha)
+    path("switch-tenant/", TenantSwitchView.as_view(), name="switch-tenant"),
     path("me/", CurrentUserView.as_view(), name="current-user"),
     path("", include(router.urls)),
 ]
\ No newline at end of file
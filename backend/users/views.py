@@ -1,98 +1,134 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, ProtectedError
+from core.request_context import forget_user_permissions
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.conf import settings
 
-from .models import CustomUser, UserPermission
-from .permissions import CanManageUser, IsAdminUser, ROLE_HIERARCHY
+from .models import KEEP_PROFILE, CustomUser, PermissionProfile, UserPermission
+from .permissions import CanManageUser, CanManagePermissionProfiles, IsAdminUser, ROLE_HIERARCHY, can_manage_profile
 from .serializers import (
     UserSerializer,
     UserCreateSerializer,
     LoggedInUserSerializer,
     MyTokenObtainPairSerializer,
+    PermissionProfileSerializer,
+    TenantSwitchSerializer,
+    TokenRefreshSerializer,
 )
-from .throttles import LoginRateThrottle
+from .throttles import LoginIPRateThrottle, LoginRateThrottle, RefreshTokenRateThrottle, TenantSwitchRateThrottle
+from .token_blacklist import BlacklistUnavailable
+from .tokens import RefreshToken
+
+def _set_auth_cookies(response):
+    """Grava os tokens retornados na resposta nos cookies HttpOnly."""
+    access_token = response.data.get('access')
+    refresh_token = response.data.get('refresh')  # Pode vir se ROTATE_REFRESH_TOKENS=True
+
+    if access_token:
+        response.set_cookie(
+            'access_token',
+            access_token,
+            httponly=True,
+            secure=not settings.DEBUG,
+            samesite='Lax',
+            max_age=int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
+        )
+    if refresh_token:
+        response.set_cookie(
+            'refresh_token',
+            refresh_token,
+            httponly=True,
+            secure=not settings.DEBUG,
+            samesite='Lax',
+            max_age=int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
+        )
+    return response
+
+
+def _refresh_from_cookie(request):
+    """Usa o refresh token do cookie quando ele não vem no corpo da requisição."""
+    refresh_token = request.COOKIES.get('refresh_token')
+
+    if refresh_token and 'refresh' not in request.data:
+        # Se for JSON dict, é mutável. Se for QueryDict, precisamos forçar.
+        if hasattr(request.data, '_mutable'):
+            request.data._mutable = True
+            request.data['refresh'] = refresh_token
+            request.data._mutable = False
+        else:
+            request.data['refresh'] = refresh_token
+
 
 class CookieTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
-    throttle_classes = [LoginRateThrottle]
+    throttle_classes = [LoginRateThrottle, LoginIPRateThrottle]
 
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
         if response.status_code == 200:
-            access_token = response.data.get('access')
-            refresh_token = response.data.get('refresh')
-            
-            if access_token:
-                response.set_cookie(
-                    'access_token',
-                    access_token,
-                    httponly=True,
-                    secure=not settings.DEBUG,
-                    samesite='Lax',
-                    max_age=int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
-                )
-            if refresh_token:
-                response.set_cookie(
-                    'refresh_token',
-                    refresh_token,
-                    httponly=True,
-                    secure=not settings.DEBUG,
-                    samesite='Lax',
-                    max_age=int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
-                )
+            _set_auth_cookies(response)
         return response
 
 class CookieTokenRefreshView(TokenRefreshView):
-    throttle_classes = [LoginRateThrottle]
+    serializer_class = TokenRefreshSerializer
+    throttle_classes = [RefreshTokenRateThrottle]
     
     def post(self, request, *args, **kwargs):
-        refresh_token = request.COOKIES.get('refresh_token')
-        
-        if refresh_token and 'refresh' not in request.data:
-            # Se for JSON dict, é mutável. Se for QueryDict, precisamos forçar.
-            if hasattr(request.data, '_mutable'):
-                request.data._mutable = True
-                request.data['refresh'] = refresh_token
-                request.data._mutable = False
-            else:
-                request.data['refresh'] = refresh_token
-
+        _refresh_from_cookie(request)
         response = super().post(request, *args, **kwargs)
-        
         if response.status_code == 200:
-            access_token = response.data.get('access')
-            refresh_token = response.data.get('refresh') # Pode vir se ROTATE_REFRESH_TOKENS=True
-
-            if access_token:
-                response.set_cookie(
-                    'access_token',
-                    access_token,
-                    httponly=True,
-                    secure=not settings.DEBUG,
-                    samesite='Lax',
-                    max_age=int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
-                )
-            
-            if refresh_token:
-                response.set_cookie(
-                    'refresh_token',
-                    refresh_token,
-                    httponly=True,
-                    secure=not settings.DEBUG,
-                    samesite='Lax',
-                    max_age=int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
-                )
+            _set_auth_cookies(response)
         return response
 
+
+class TenantSwitchView(APIView):
+    """
+    Troca de empresa sem novo login: recebe `tenant_schema_name` e usa o refresh token
+    do cookie (ou do corpo) para emitir tokens vinculados à nova empresa.
+    """
+    permission_classes = []
+    authentication_classes = []
+    throttle_classes = [TenantSwitchRateThrottle]
+
+    def post(self, request):
+        _refresh_from_cookie(request)
+        serializer = TenantSwitchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return _set_auth_cookies(Response(serializer.validated_data))
+
 class LogoutView(APIView):
+    """
+    Remove os cookies e revoga o refresh token, que deixa de poder gerar novos access
+    tokens. Não exige um access token válido (ele pode já ter expirado).
+    """
     permission_classes = [] 
+    authentication_classes = []
+    # Sair nunca deve ser bloqueado (vários usuários atrás do mesmo IP)
+    throttle_classes = []
 
     def post(self, request):
+        raw_refresh = request.COOKIES.get('refresh_token') or request.data.get('refresh')
+        if raw_refresh:
+            try:
+                RefreshToken(raw_refresh).blacklist()
+            except TokenError:
+                # Token inválido, expirado ou já revogado: nada a revogar
+                pass
+            except BlacklistUnavailable:
+                # Sair não é bloqueado: os cookies são removidos mesmo sem revogar o token
+                # (o erro já foi registrado no log)
+                pass
+
         response = Response({"message": "Logged out successfully"})
         response.delete_cookie('access_token')
         response.delete_cookie('refresh_token')
@@ -107,14 +143,60 @@ class CurrentUserView(APIView):
         serializer = LoggedInUserSerializer(user, context={'request': request})
         return Response(serializer.data)
 
+def _profiles_from(items, request):
+    """
+    Perfis da empresa indicados em 'profile' nos dados enviados, numa única consulta.
+    Um id inexistente (ou de outra empresa) é um erro de validação; um perfil usado por
+    quem o usuário não pode gerenciar não pode ser atribuído.
+    """
+    ids = {
+        item["profile"] for item in items
+        if isinstance(item, dict) and item.get("profile") is not None
+    }
+    if not ids:
+        return {}
+    if not all(isinstance(profile_id, int) for profile_id in ids):
+        raise ValidationError({"profile": "Informe o id do perfil ou null."})
+    profiles = {profile.pk: profile for profile in PermissionProfile.objects.filter(tenant=request.tenant, pk__in=ids)}
+    missing = sorted(ids - set(profiles))
+    if missing:
+        raise ValidationError({"profile": f"Perfis não encontrados: {missing}"})
+    for profile in profiles.values():
+        if not can_manage_profile(request.user, profile):
+            raise PermissionDenied(f"O perfil '{profile.nome}' é usado por usuários que você não pode gerenciar.")
+    return profiles
+
+
+def _profile_for(data, profiles):
+    # Sem a chave 'profile' o perfil atual é mantido; null remove o perfil
+    if "profile" not in data:
+        return KEEP_PROFILE
+    return profiles.get(data["profile"])
+
+
+class PermissionMatrixPagination(CursorPagination):
+    # Paginação por chave (username é único): sem o COUNT(*) da paginação por página
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('username',)
+
+
+# Campos do usuário devolvidos em cada linha da matriz de permissões
+MATRIX_USER_FIELDS = ("id", "username", "first_name", "last_name", "role", "is_active", "is_superuser", "can_create_tenant")
+
+
 class UserManagementViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         """
         Define permissões dinamicamente com base na ação.
         - Ações de leitura ('list', 'retrieve') exigem apenas acesso à página.
         - Ações de escrita ('create', 'update', etc.) exigem permissões de gerenciamento.
+        - A matriz de permissões é leitura no GET e escrita no PUT.
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve'] or (
+            self.action == 'permissions_matrix' and self.request.method == 'GET'
+        ):
             self.permission_classes = [IsAdminUser]
         else:
             self.permission_classes = [IsAdminUser, CanManageUser]
@@ -168,11 +250,17 @@ class UserManagementViewSet(viewsets.ModelViewSet):
             # 2. Adiciona permissões globais do próprio usuário
             permissions_data['can_create_tenant'] = user.can_create_tenant
             permissions_data['allowed_tenants'] = list(user.tenants.all().values_list('id', flat=True))
+            permissions_data['profile'] = (
+                UserPermission.objects.filter(user=user, tenant=tenant)
+                .values_list('profile_id', flat=True).first()
+            )
             return Response(permissions_data)
 
         elif request.method == "PUT":
             data_to_update = request.data.get("permissions", request.data)
-            
+            # Valida o perfil antes de alterar qualquer coisa
+            profiles = _profiles_from([data_to_update], request)
+
             # 1. Checa e atualiza a permissão global 'can_create_tenant' no usuário
             if 'can_create_tenant' in data_to_update:
                 can_create = data_to_update.pop('can_create_tenant')
@@ -188,15 +276,177 @@ class UserManagementViewSet(viewsets.ModelViewSet):
                     user.tenants.set(tenant_ids)
 
             # 3. Atualiza o resto das permissões (que são específicas por tenant)
-            UserPermission.update_user_permissions(user, tenant, data_to_update)
+            UserPermission.update_user_permissions(
+                user, tenant, data_to_update, _profile_for(data_to_update, profiles)
+            )
             
             return Response(
                 {"status": "permissions updated"}, status=status.HTTP_200_OK
             )
 
+    @action(detail=False, methods=["get", "put"], url_path="permissions-matrix")
+    def permissions_matrix(self, request):
+        """
+        Matriz de permissões da empresa atual.
+
+        GET: usuários visíveis (mesmas regras da listagem), paginados por cursor, cada um
+        com as permissões resolvidas na empresa atual e os ids das empresas a que tem
+        acesso. Duas consultas no total: usuários (com as empresas numa subconsulta) e os
+        registros de UserPermission da página.
+
+        PUT: {"usuarios": [{"id": 1, "permissions": {...}}, ...]} aplica as alterações de
+        vários usuários numa única transação (bulk_update dos registros existentes e
+        upsert dos novos). Como no PUT por usuário, as chaves omitidas não mudam,
+        'permissions.profile' define o perfil (id ou null) e 'allowed_tenants' deve ser
+        alterado pelo endpoint de cada usuário.
+        """
+        if request.method == "PUT":
+            return self._bulk_update_permissions(request)
+
+        tenant_ids = ArraySubquery(
+            CustomUser.tenants.through.objects
+            .filter(customuser_id=OuterRef("pk"))
+            .order_by("empresa_id")
+            .values("empresa_id")
+        )
+        users = (
+            self.get_queryset()
+            .prefetch_related(None)
+            .only(*MATRIX_USER_FIELDS)
+            .annotate(allowed_tenants=tenant_ids)
+        )
+        paginator = PermissionMatrixPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
+
+        rows = {
+            perm.user_id: perm
+            for perm in UserPermission.objects.filter(
+                tenant=request.tenant, user_id__in=[user.pk for user in page]
+            ).annotate(profile_versao=F("profile__versao"))
+        }
+        data = [
+            {
+                **{field: getattr(user, field) for field in MATRIX_USER_FIELDS},
+                "allowed_tenants": user.allowed_tenants,
+                "profile": getattr(rows.get(user.pk), "profile_id", None),
+                "permissions": UserPermission.resolve_permissions(user, rows.get(user.pk)),
+            }
+            for user in page
+        ]
+        return paginator.get_paginated_response(data)
+
+    def _bulk_update_permissions(self, request):
+        items = request.data.get("usuarios")
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"usuarios": "Informe uma lista de {id, permissions}."})
+
+        changes = {}
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("id"), int) or not isinstance(item.get("permissions"), dict):
+                raise ValidationError({"usuarios": "Cada item deve ter 'id' (inteiro) e 'permissions' (objeto)."})
+            changes[item["id"]] = item["permissions"]
+
+        # Mesmas regras do PUT por usuário: só usuários visíveis e que posso gerenciar
+        targets = {
+            user.pk: user
+            for user in self.get_queryset().prefetch_related(None).filter(pk__in=changes)
+        }
+        missing = sorted(set(changes) - set(targets))
+        if missing:
+            raise ValidationError({"usuarios": f"Usuários não encontrados: {missing}"})
+        for user in targets.values():
+            self.check_object_permissions(request, user)
+
+        tenant = request.tenant
+        profiles = _profiles_from(changes.values(), request)
+        with transaction.atomic():
+            existing = {
+                perm.user_id: perm
+                for perm in UserPermission.objects.select_for_update(of=("self",)).filter(
+                    tenant=tenant, user_id__in=changes
+                ).annotate(profile_versao=F("profile__versao"))
+            }
+            to_update, to_create, users_to_update = [], [], []
+            update_fields, create_fields = set(), set()
+
+            for user_id, data in changes.items():
+                user = targets[user_id]
+                can_create = data.get("can_create_tenant")
+                if isinstance(can_create, bool) and can_create != user.can_create_tenant:
+                    user.can_create_tenant = can_create
+                    users_to_update.append(user)
+
+                perm = existing.get(user_id)
+                is_new = perm is None
+                if is_new:
+                    perm = UserPermission(user=user, tenant=tenant)
+                fields = perm.apply_changes(data, _profile_for(data, profiles))
+                if not fields:
+                    continue
+                if is_new:
+                    to_create.append(perm)
+                    create_fields.update(fields)
+                else:
+                    to_update.append(perm)
+                    update_fields.update(fields)
+
+            if to_update:
+                UserPermission.objects.bulk_update(to_update, sorted(update_fields))
+            if to_create:
+                # Upsert: um registro criado em paralelo para o mesmo usuário/empresa é atualizado
+                UserPermission.objects.bulk_create(
+                    to_create,
+                    update_conflicts=True,
+                    unique_fields=["user", "tenant"],
+                    update_fields=sorted(create_fields),
+                )
+            if users_to_update:
+                CustomUser.objects.bulk_update(users_to_update, ["can_create_tenant"])
+        forget_user_permissions()
+
+        return Response(
+            {"status": "permissions updated", "usuarios": len(changes)},
+            status=status.HTTP_200_OK,
+        )
+
     def perform_create(self, serializer):
         user = serializer.save()
         # Associa o novo usuário ao tenant do admin que o criou
         user.tenants.add(self.request.tenant)
 
     http_method_names = ["get", "post", "put", "patch", "delete", "head", "options"]
+
+
+class PermissionProfileViewSet(viewsets.ModelViewSet):
+    """
+    Perfis de permissões da empresa atual. Alterar um perfil vale imediatamente para
+    todos os usuários que o referenciam (UserPermission.profile).
+    """
+    serializer_class = PermissionProfileSerializer
+    pagination_class = None
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            self.permission_classes = [IsAdminUser]
+        else:
+            self.permission_classes = [IsAdminUser, CanManagePermissionProfiles]
+        return super().get_permissions()
+
+    def get_queryset(self):
+        return (
+            PermissionProfile.objects.filter(tenant=self.request.tenant)
+            .annotate(num_membros=Count("members"))
+            .order_by("nome")
+        )
+
+    def perform_create(self, serializer):
+        serializer.save(tenant=self.request.tenant)
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {"detail": "Perfil em uso: remova-o dos usuários antes de excluir."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
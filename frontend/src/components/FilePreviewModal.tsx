@@ -16,6 +16,8 @@ interface FilePreviewModalProps {
   isOpen: boolean;
   onClose: () => void;
   fileUrl: string;
+  // Prévia reduzida gerada no backend (null enquanto não estiver pronta)
+  previewUrl?: string | null;
   fileName: string;
   canDownload: boolean;
 }
@@ -24,6 +26,7 @@ const FilePreviewModal: React.FC<FilePreviewModalProps> = ({
   isOpen,
   onClose,
   fileUrl,
+  previewUrl,
   fileName,
   canDownload,
 }) => {
@@ -74,7 +77,7 @@ const FilePreviewModal: React.FC<FilePreviewModalProps> = ({
             </div>
             <div className="image-container">
               <img
-                src={fileUrl}
+                src={previewUrl || fileUrl}
                 alt={fileName}
                 className="file-preview-image"
                 style={{ transform: `rotate(${rotation}deg)` }} // Apply rotation style
@@ -124,7 +127,13 @@ const FilePreviewModal: React.FC<FilePreviewModalProps> = ({
                 <Document
                     file={fileUrl}
                     onLoadSuccess={onDocumentLoadSuccess}
-                    loading={<div className="pdf-loading">Carregando PDF...</div>}
+                    loading={
+                      previewUrl ? (
+                        <img src={previewUrl} alt={fileName} className="file-preview-image" />
+                      ) : (
+                        <div className="pdf-loading">Carregando PDF...</div>
+                      )
+                    }
                     error={<div className="pdf-error">Erro ao carregar o arquivo PDF.</div>}
                     className="pdf-document"
                 >
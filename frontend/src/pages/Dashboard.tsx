@@ -15,6 +15,7 @@ import {
   XCircle,
   Filter,
   X,
+  HardDrive,
 } from "lucide-react";
 import {
   ResponsiveContainer,
@@ -60,8 +61,14 @@ interface ExtraStatsData {
     status_novo: string;
     data: string;
   }[];
+  storage?: { bytes: number; arquivos: number; cota: number | null };
 }
 
+const formatBytes = (bytes: number) => {
+  if (bytes >= 1024 ** 3) return `${(bytes / 1024 ** 3).toFixed(1)} GB`;
+  return `${(bytes / 1024 ** 2).toFixed(1)} MB`;
+};
+
 interface ChartDataPoint {
     name: string;
     criados: number;
@@ -372,6 +379,23 @@ const Dashboard: React.FC<DashboardProps> = ({ context = 'COMPRAS' }) => {
                   colorClass={extraStats.tempo_medio_dias > 30 ? "red" : "green"}
                 />
 
+                {extraStats.storage && (
+                  <StatCard
+                    title={
+                      extraStats.storage.cota
+                        ? `Armazenamento (de ${formatBytes(extraStats.storage.cota)})`
+                        : `Armazenamento (${extraStats.storage.arquivos} arquivos)`
+                    }
+                    value={formatBytes(extraStats.storage.bytes)}
+                    icon={<HardDrive size={24} color="white" />}
+                    colorClass={
+                      extraStats.storage.cota && extraStats.storage.bytes > extraStats.storage.cota * 0.9
+                        ? "red"
+                        : "blue"
+                    }
+                  />
+                )}
+
                 {extraStats.stagnant_count > 0 && (
                   <StatCard
                     title="Processos Parados (>30d)"
@@ -85,10 +85,8 @@ const Login: React.FC = () => {
   const handleTenantSelection = async (schema_name: string) => {
     setIsLoading(true);
     try {
-      // 3. Reenvia as credenciais COM a empresa escolhida
-      const response = await api.post("/auth/login/", {
-        username,
-        password,
+      // 3. Conclui o login na empresa escolhida com o refresh token (cookie) do passo 1
+      const response = await api.post("/auth/switch-tenant/", {
         tenant_schema_name: schema_name,
       });
 
@@ -33,10 +33,21 @@ interface Arquivo {
   criado_por: string;
   criado_por_role: string;
   arquivo_url: string;
+  thumbnail_url?: string | null;
+  preview_url?: string | null;
+  preview_status?: string;
   data_upload: string;
   document_type: string;
 }
 
+interface UploadResult {
+  index: number;
+  nome: string;
+  status: "ok" | "erro" | "cancelado";
+  detail?: string;
+  arquivo?: Arquivo;
+}
+
 interface Processo {
   id: number;
   nome: string;
@@ -139,7 +150,7 @@ const ProcessoDetail: React.FC = () => {
   const navigate = useNavigate();
   const [processo, setProcesso] = useState<Processo | null>(null);
   const [loading, setLoading] = useState(true);
-  const [selectedFile, setSelectedFile] = useState<File | null>(null);
+  const [selectedFiles, setSelectedFiles] = useState<File[]>([]);
   const [uploading, setUploading] = useState(false);
   const [updatingStatus, setUpdatingStatus] = useState(false);
   const [fileToDelete, setFileToDelete] = useState<Arquivo | null>(null);
@@ -200,46 +211,66 @@ const ProcessoDetail: React.FC = () => {
   }, [id]);
 
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
-    if (e.target.files && e.target.files[0]) {
-      const file = e.target.files[0];
+    if (e.target.files && e.target.files.length > 0) {
+      const files = Array.from(e.target.files);
 
-      if (file.size > MAX_FILE_SIZE) {
+      if (files.some((file) => file.size > MAX_FILE_SIZE)) {
         toast.error(
-          "O arquivo excede o limite de 10MB e não pode ser enviado."
+          "Um ou mais arquivos excedem o limite de 10MB e não podem ser enviados."
         );
-        setSelectedFile(null);
+        setSelectedFiles([]);
         e.target.value = "";
         return;
       }
 
-      setSelectedFile(file);
+      setSelectedFiles(files);
     }
   };
 
   const handleUpload = async (e: React.FormEvent) => {
     e.preventDefault();
-    if (!selectedFile) {
+    if (selectedFiles.length === 0) {
       toast.error("Por favor, selecione um arquivo.");
       return;
     }
 
     setUploading(true);
 
+    // Todos os arquivos vão em uma única requisição para o endpoint de lote
     const formData = new FormData();
-    formData.append("file", selectedFile);
+    selectedFiles.forEach((file) => formData.append("files", file));
     formData.append("document_type", documentType);
 
     try {
-      const res = await api.post<Arquivo>(`/processos/${id}/upload/`, formData);
-      setProcesso((prev) =>
-        prev ? { ...prev, arquivos: [...prev.arquivos, res.data] } : null
+      const res = await api.post<{ results: UploadResult[] }>(
+        `/processos/${id}/upload-batch/`,
+        formData,
+        { validateStatus: (status) => status < 500 && status !== 413 }
       );
-      toast.success("Arquivo enviado com sucesso!");
-      setSelectedFile(null);
-      notifyUpdate();
+      const results = res.data.results || [];
+      const enviados = results.filter((r) => r.status === "ok" && r.arquivo).map((r) => r.arquivo as Arquivo);
+      const falhas = results.filter((r) => r.status !== "ok");
+
+      if (enviados.length > 0) {
+        setProcesso((prev) =>
+          prev ? { ...prev, arquivos: [...prev.arquivos, ...enviados] } : null
+        );
+        toast.success(
+          enviados.length === 1
+            ? "Arquivo enviado com sucesso!"
+            : `${enviados.length} arquivos enviados com sucesso!`
+        );
+        notifyUpdate();
+      }
+      falhas.forEach((r) => toast.error(`${r.nome}: ${r.detail || "Falha no upload."}`));
+      if (falhas.length === 0 && res.status >= 400) {
+        toast.error("Falha no upload. Tente novamente.");
+      }
+      setSelectedFiles([]);
     } catch (err: any) {
       if (err.response && err.response.status === 413) {
-        toast.error("O arquivo é muito grande. O limite é 10MB.");
+        // 413 também é usado quando a cota de armazenamento da empresa estoura
+        toast.error(err.response.data?.detail || "O arquivo é muito grande. O limite é 10MB.");
       } else {
         toast.error("Falha no upload. Tente novamente.");
       }
@@ -540,19 +571,24 @@ const ProcessoDetail: React.FC = () => {
                   <label htmlFor="file-upload" className="upload-form__label">
                     <Upload size={18} />
                     <span>
-                      {selectedFile ? selectedFile.name : "Escolher arquivo"}
+                      {selectedFiles.length === 0
+                        ? "Escolher arquivos"
+                        : selectedFiles.length === 1
+                        ? selectedFiles[0].name
+                        : `${selectedFiles.length} arquivos selecionados`}
                     </span>
                   </label>
                   <input
                     id="file-upload"
                     type="file"
+                    multiple
                     onChange={handleFileChange}
                     disabled={uploading}
                   />
                   <button
                     type="submit"
                     className="upload-form__submit"
-                    disabled={!selectedFile || uploading}
+                    disabled={selectedFiles.length === 0 || uploading}
                   >
                     {uploading ? "Enviando..." : "Enviar"}
                   </button>
@@ -677,6 +713,7 @@ const ProcessoDetail: React.FC = () => {
           isOpen={!!previewFile}
           onClose={() => setPreviewFile(null)}
           fileUrl={previewFile.arquivo_url}
+          previewUrl={previewFile.preview_status === "pronto" ? previewFile.preview_url : null}
           fileName={previewFile.nome_atual}
           canDownload={getCanDownloadFile(previewFile.document_type)}
         />